@@ -0,0 +1,88 @@
+import os
+import sys
+import tempfile
+import time
+from datetime import (
+    date,
+    timedelta
+)
+from decimal import Decimal
+
+# runs offline against a throwaway SQLite file unless DB_CONNECTION_STRING points somewhere else
+os.environ.setdefault("DB_CONNECTION_STRING", f"sqlite:///{tempfile.mkdtemp()}/benchmark.sqlite")
+os.environ.setdefault("LOAN_TABLE_NAME", "loan")
+os.environ.setdefault("LOAN_CALCULATION_RESULT_TABLE_NAME", "daily_loan_calculation_result")
+os.environ.setdefault("BASE_INTEREST_RATE_VERSION_TABLE_NAME", "base_interest_rate_version")
+os.environ.setdefault("BASE_INTEREST_RATE_CHANGE_TABLE_NAME", "base_interest_rate_change")
+os.environ.setdefault("BASE_INTEREST_RATE_PERIOD_TABLE_NAME", "base_interest_rate_period")
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.schema import (
+    create_schema,
+    engine
+)
+from db.unit_of_work import UnitOfWork
+from db.data_repositories.loan_repository import (
+    CreateDailyLoanCalculationResultSchema,
+    CreateLoanSchema,
+    LoanRepository,
+    ROWS_SCHEDULE_STORAGE,
+    PACKED_SCHEDULE_STORAGE
+)
+
+LOAN_LENGTHS_IN_DAYS = [30, 365, 3650]
+LOANS_PER_RUN = 20
+
+
+def build_loan(days: int) -> CreateLoanSchema:
+    start_date = date(2022, 1, 3)
+    return CreateLoanSchema(
+        amount=Decimal(1000000), currency="USD", annual_margin=Decimal("0.025"),
+        start_date=start_date, end_date=start_date + timedelta(days=days - 1),
+        total_interest=Decimal(days),
+        calculation_results=[
+            CreateDailyLoanCalculationResultSchema(
+                date=start_date + timedelta(days=i),
+                interest_accrual_amount=Decimal("1.23456789"),
+                interest_accrual_amount_without_margin=Decimal("0.98765432"),
+                days_elapsed_since_loan_start_date=i
+            ) for i in range(days)
+        ]
+    )
+
+
+def time_writes(
+        bulk_write: bool, loan: CreateLoanSchema, loans: int, schedule_storage: str = ROWS_SCHEDULE_STORAGE
+) -> float:
+    started = time.perf_counter()
+    for _ in range(loans):
+        with UnitOfWork(engine) as unit_of_work:
+            new_loan = LoanRepository(
+                session=unit_of_work.session, bulk_write=bulk_write, schedule_storage=schedule_storage
+            ).add(loan)
+            unit_of_work.commit()
+            loan_id = new_loan.id
+        with UnitOfWork(engine) as unit_of_work:
+            LoanRepository(
+                session=unit_of_work.session, bulk_write=bulk_write, schedule_storage=schedule_storage
+            ).update(loan_id, loan)
+            unit_of_work.commit()
+    return time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    create_schema()
+    print(f"{'days':>6} {'orm rows/s':>12} {'bulk rows/s':>12} {'speedup':>8} {'packed days/s':>14} {'speedup':>8}")
+    for days in LOAN_LENGTHS_IN_DAYS:
+        loan = build_loan(days)
+        rows = 2 * days * LOANS_PER_RUN
+        orm_seconds = time_writes(bulk_write=False, loan=loan, loans=LOANS_PER_RUN)
+        bulk_seconds = time_writes(bulk_write=True, loan=loan, loans=LOANS_PER_RUN)
+        packed_seconds = time_writes(
+            bulk_write=True, loan=loan, loans=LOANS_PER_RUN, schedule_storage=PACKED_SCHEDULE_STORAGE
+        )
+        print(
+            f"{days:>6} {rows / orm_seconds:>12.0f} {rows / bulk_seconds:>12.0f} {orm_seconds / bulk_seconds:>7.1f}x"
+            f" {rows / packed_seconds:>14.0f} {orm_seconds / packed_seconds:>7.1f}x"
+        )
@@ -0,0 +1,288 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import (
+    date,
+    datetime,
+    timedelta
+)
+from decimal import Decimal
+from typing import (
+    Callable,
+    Dict,
+    List
+)
+
+# runs offline against a throwaway SQLite file unless DB_CONNECTION_STRING points somewhere else
+os.environ.setdefault("DB_CONNECTION_STRING", f"sqlite:///{tempfile.mkdtemp()}/benchmark.sqlite")
+os.environ.setdefault("LOAN_TABLE_NAME", "loan")
+os.environ.setdefault("LOAN_CALCULATION_RESULT_TABLE_NAME", "daily_loan_calculation_result")
+os.environ.setdefault("BASE_INTEREST_RATE_VERSION_TABLE_NAME", "base_interest_rate_version")
+os.environ.setdefault("BASE_INTEREST_RATE_CHANGE_TABLE_NAME", "base_interest_rate_change")
+os.environ.setdefault("BASE_INTEREST_RATE_PERIOD_TABLE_NAME", "base_interest_rate_period")
+os.environ.setdefault("LOANS_PERIOD_START", "2022")
+os.environ.setdefault("LOANS_PERIOD_END", "2032")
+os.environ.setdefault("LOAN_CURRENCIES", "USD,GBP,EUR")
+os.environ.setdefault("MAXIMUM_LOAN_AMOUNT", "1000000000000")
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculator.loan import calculate_loan
+from calculator.rate_index import BaseInterestRateIndex
+from calculator.vectorized_loan import calculate_loan_vectorized
+from db.schema import (
+    create_schema,
+    engine
+)
+from db.unit_of_work import UnitOfWork
+from db.data_repositories.base_interest_rate_repository import (
+    BaseInterestRateRepository,
+    CreateBaseInterestRateSchema
+)
+from db.data_repositories.loan_repository import (
+    CreateDailyLoanCalculationResultSchema,
+    CreateLoanSchema,
+    LoanRepository
+)
+from web_api.app import create_app
+
+# number of one year loans in the table while the repositories and endpoints are timed
+BENCHMARK_LOANS = int(os.environ.get("BENCHMARK_LOANS", "1000"))
+LOAN_LENGTHS_IN_DAYS = [30, 90, 365, 1825, 3650]
+# early enough for the longest loan to end within the populated rates
+CALCULATOR_START_DATE = date(2022, 1, 10)
+LOAN_START_DATE = date(2023, 1, 10)
+# 2024-01-09, a business day one year later
+LOAN_END_DATE = date(2024, 1, 9)
+CURRENCIES = ["USD", "GBP", "EUR"]
+
+
+def populate_base_interest_rates():
+    days = (date(2032, 12, 31) - date(2022, 1, 1)).days + 1
+    with UnitOfWork(engine) as unit_of_work:
+        repository = BaseInterestRateRepository(session=unit_of_work.session)
+        repository.record_changes(repository.upsert(
+            CreateBaseInterestRateSchema(
+                currency=currency,
+                date=date(2022, 1, 1) + timedelta(days=i),
+                interest_rate=Decimal("0.0001") + Decimal(i % 7) / Decimal(1000000)
+            ) for currency in CURRENCIES for i in range(days)
+        ))
+        unit_of_work.commit()
+
+
+def get_base_interest_rate_index(currency: str = "USD"):
+    with UnitOfWork(engine) as unit_of_work:
+        return BaseInterestRateRepository(session=unit_of_work.session).get_index(currency)
+
+
+def build_loan(base_interest_rate_index) -> CreateLoanSchema:
+    return CreateLoanSchema(
+        amount=Decimal(1000000), currency="USD", annual_margin=Decimal("0.025"),
+        start_date=LOAN_START_DATE, end_date=LOAN_END_DATE,
+        total_interest=Decimal(0),
+        calculation_results=[
+            CreateDailyLoanCalculationResultSchema(
+                date=result.date,
+                interest_accrual_amount=result.interest_accrual_amount,
+                interest_accrual_amount_without_margin=result.interest_accrual_amount_without_margin,
+                days_elapsed_since_loan_start_date=result.days_elapsed_since_loan_start_date
+            ) for result in calculate_loan(
+                start_date=LOAN_START_DATE, end_date=LOAN_END_DATE,
+                loan_amount=Decimal(1000000), currency="USD", annual_margin=Decimal("0.025"),
+                base_interest_rates=base_interest_rate_index
+            )
+        ]
+    )
+
+
+def populate_loans(loan: CreateLoanSchema, loans: int) -> List[int]:
+    with UnitOfWork(engine) as unit_of_work:
+        new_loans = LoanRepository(session=unit_of_work.session).add_many([loan] * loans)
+        unit_of_work.commit()
+        return [new_loan.id for new_loan in new_loans]
+
+
+def measure(function: Callable, repeat: int) -> Dict[str, float]:
+    # one warm-up call, then the median of repeat timed calls is what comparisons look at
+    function()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return {
+        "median_seconds": statistics.median(timings),
+        "min_seconds": min(timings),
+        "mean_seconds": statistics.mean(timings),
+        "repeat": repeat,
+    }
+
+
+def build_monthly_base_interest_rate_index(base_interest_rate_index) -> BaseInterestRateIndex:
+    # one rate per month like central bank rates, the populated ones change every day
+    return BaseInterestRateIndex.from_rates(currency=base_interest_rate_index.currency, rates=[
+        (rate_date, base_interest_rate_index[(base_interest_rate_index.currency, rate_date.replace(day=1))])
+        for rate_date in (
+            base_interest_rate_index.start_date + timedelta(days=i) for i in range(len(base_interest_rate_index))
+        )
+    ])
+
+
+def calculator_cases(base_interest_rate_index) -> Dict[str, Callable]:
+    cases = {}
+    monthly_base_interest_rate_index = build_monthly_base_interest_rate_index(base_interest_rate_index)
+    for days in LOAN_LENGTHS_IN_DAYS:
+        parameters = dict(
+            start_date=CALCULATOR_START_DATE, end_date=CALCULATOR_START_DATE + timedelta(days=days - 1),
+            loan_amount=Decimal(1000000), currency="USD", annual_margin=Decimal("0.025"),
+            base_interest_rates=base_interest_rate_index
+        )
+        cases[f"calculator.calculate_loan[{days}d]"] = lambda parameters=parameters: calculate_loan(**parameters)
+        cases[f"calculator.calculate_loan[{days}d,monthly_rates]"] = (
+            lambda parameters=dict(parameters, base_interest_rates=monthly_base_interest_rate_index): calculate_loan(
+                **parameters
+            )
+        )
+        cases[f"calculator.calculate_loan_vectorized[{days}d]"] = (
+            lambda parameters=parameters: calculate_loan_vectorized(**parameters)
+        )
+    return cases
+
+
+def repository_cases(loan: CreateLoanSchema, loan_ids: List[int], deletable_ids: List[int]) -> Dict[str, Callable]:
+
+    def add():
+        with UnitOfWork(engine) as unit_of_work:
+            LoanRepository(session=unit_of_work.session).add(loan)
+            unit_of_work.commit()
+
+    def get():
+        with UnitOfWork(engine) as unit_of_work:
+            LoanRepository(session=unit_of_work.session).get(loan_ids[len(loan_ids) // 2])
+
+    def update():
+        with UnitOfWork(engine) as unit_of_work:
+            LoanRepository(session=unit_of_work.session).update(loan_ids[len(loan_ids) // 3], loan)
+            unit_of_work.commit()
+
+    def delete():
+        with UnitOfWork(engine) as unit_of_work:
+            LoanRepository(session=unit_of_work.session).delete(deletable_ids.pop())
+            unit_of_work.commit()
+
+    def get_base_interest_rates():
+        with UnitOfWork(engine) as unit_of_work:
+            BaseInterestRateRepository(session=unit_of_work.session).get(
+                start_date=LOAN_START_DATE, end_date=LOAN_END_DATE, currency="USD"
+            )
+
+    def get_base_interest_rate_index():
+        with UnitOfWork(engine) as unit_of_work:
+            BaseInterestRateRepository(session=unit_of_work.session).get_index("USD")
+
+    return {
+        "repository.loan.add[365d]": add,
+        "repository.loan.get[365d]": get,
+        "repository.loan.update[365d]": update,
+        "repository.loan.delete[365d]": delete,
+        "repository.base_interest_rate.get[365d]": get_base_interest_rates,
+        "repository.base_interest_rate.get_index": get_base_interest_rate_index,
+    }
+
+
+def endpoint_cases(loan_ids: List[int]) -> Dict[str, Callable]:
+    client = create_app(
+        api_title="loans", api_version="v1", openapi_version="3.0.2",
+        db_connection_string=os.environ["DB_CONNECTION_STRING"]
+    ).test_client()
+    create_loan_parameters = {
+        "amount": 1000000, "currency": "USD", "annual_margin_in_percent": 2.5,
+        "start_date": LOAN_START_DATE.isoformat(), "end_date": LOAN_END_DATE.isoformat()
+    }
+
+    def request(method: str, url: str, **kwargs) -> Callable:
+        def send():
+            response = client.open(url, method=method, **kwargs)
+            assert response.status_code == 200, response.data
+        return send
+
+    return {
+        "endpoint.POST /api/loans[365d]": request("POST", "/api/loans", json=create_loan_parameters),
+        "endpoint.GET /api/loans?limit=100": request("GET", "/api/loans?limit=100"),
+        "endpoint.GET /api/loan/<id>[365d]": request("GET", f"/api/loan/{loan_ids[len(loan_ids) // 2]}"),
+        "endpoint.PUT /api/loan/<id>[365d]": request(
+            "PUT", f"/api/loan/{loan_ids[len(loan_ids) // 4]}", json=create_loan_parameters
+        ),
+    }
+
+
+def run(repeat: int, name_filter: str) -> Dict:
+    create_schema()
+    populate_base_interest_rates()
+    base_interest_rate_index = get_base_interest_rate_index()
+    loan = build_loan(base_interest_rate_index)
+    loan_ids = populate_loans(loan, BENCHMARK_LOANS)
+    cases = {
+        **calculator_cases(base_interest_rate_index),
+        # one loan for the warm-up call of the delete case and one for each timed call
+        **repository_cases(loan, loan_ids, deletable_ids=populate_loans(loan, repeat + 1)),
+        **endpoint_cases(loan_ids),
+    }
+    results = {}
+    for name, function in cases.items():
+        if name_filter in name:
+            results[name] = measure(function, repeat=repeat)
+            print(f"{name:<50} {results[name]['median_seconds'] * 1000:>10.3f} ms")
+    return {
+        "created_on": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"repeat": repeat, "loans": BENCHMARK_LOANS, "filter": name_filter},
+        "results": results,
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    # a case regresses when its median got slower than the baseline's by more than threshold (0.1 = 10%)
+    regressions = []
+    print(f"{'case':<50} {'baseline ms':>12} {'current ms':>12} {'change':>8}")
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            print(f"{name:<50} {'-':>12} {result['median_seconds'] * 1000:>12.3f} {'new':>8}")
+            continue
+        baseline_seconds = baseline["results"][name]["median_seconds"]
+        change = result["median_seconds"] / baseline_seconds - 1
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print(
+            f"{name:<50} {baseline_seconds * 1000:>12.3f} {result['median_seconds'] * 1000:>12.3f}"
+            f" {change:>+8.1%}{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times the calculator, the repositories and the endpoints.")
+    parser.add_argument("--output", default="benchmark_results.json", help="where the results are written")
+    parser.add_argument("--compare", help="baseline results file to flag regressions against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown of a median, 0.2 = 20%%")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", default="", help="only runs cases whose name contains this")
+    arguments = parser.parse_args()
+
+    current = run(repeat=arguments.repeat, name_filter=arguments.filter)
+    with open(arguments.output, "w") as output:
+        json.dump(current, output, indent=2, sort_keys=True)
+    if arguments.compare:
+        with open(arguments.compare) as baseline_file:
+            regressions = compare(baseline=json.load(baseline_file), current=current, threshold=arguments.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
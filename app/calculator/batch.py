@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+from collections import namedtuple
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor
+)
+from threading import Lock
+from typing import (
+    List,
+    Optional,
+    Union
+)
+
+from calculator.loan import (
+    calculate_loan_totals,
+    BaseInterestRateNotFound
+)
+from calculator.engines import calculate_loan_with_engine
+
+
+THREAD_EXECUTOR = "thread"
+PROCESS_EXECUTOR = "process"
+# the decimal engine holds the GIL so only a process pool calculates loans truly in parallel
+LOAN_BATCH_EXECUTOR = os.environ.get("LOAN_BATCH_EXECUTOR", PROCESS_EXECUTOR)
+LOAN_BATCH_WORKERS = int(os.environ.get("LOAN_BATCH_WORKERS", str(os.cpu_count() or 1)))
+LOAN_BATCH_CHUNK_SIZE = int(os.environ.get("LOAN_BATCH_CHUNK_SIZE", "16"))
+# how the process pool starts its workers: forking a multi-threaded web worker could copy locks held by its
+# other threads, "forkserver" and "spawn" start them from a clean process instead
+LOAN_BATCH_START_METHOD = os.environ.get("LOAN_BATCH_START_METHOD", "forkserver")
+
+LoanCalculationRequest = namedtuple("LoanCalculationRequest", [
+    "start_date",
+    "end_date",
+    "loan_amount",
+    "currency",
+    "annual_margin",
+    # BaseInterestRateIndex covering just [start_date, end_date], see BaseInterestRateIndex.between
+    "base_interest_rate_index",
+    "with_calculation_results"
+])
+
+LoanCalculation = namedtuple("LoanCalculation", [
+    "totals",
+    "calculation_results"
+])
+
+_executor: Optional[Executor] = None
+_executor_lock = Lock()
+
+
+def get_loan_batch_executor() -> Executor:
+    # created on first use so every (forked) web worker gets its own pool, the lock keeps concurrent first
+    # requests of a threaded worker from creating one each
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if LOAN_BATCH_EXECUTOR == PROCESS_EXECUTOR:
+                _executor = ProcessPoolExecutor(
+                    max_workers=LOAN_BATCH_WORKERS, mp_context=multiprocessing.get_context(LOAN_BATCH_START_METHOD)
+                )
+            else:
+                _executor = ThreadPoolExecutor(max_workers=LOAN_BATCH_WORKERS)
+        return _executor
+
+
+def calculate_loan_request(request: LoanCalculationRequest) -> Union[LoanCalculation, BaseInterestRateNotFound]:
+    # errors are returned instead of raised so one failing loan doesn't abort the rest of its chunk
+    try:
+        calculation_results = []
+        if request.with_calculation_results:
+            calculation_results = calculate_loan_with_engine(
+                base_interest_rates=request.base_interest_rate_index,
+                start_date=request.start_date, end_date=request.end_date,
+                loan_amount=request.loan_amount, currency=request.currency,
+                annual_margin=request.annual_margin
+            )
+        totals = calculate_loan_totals(
+            start_date=request.start_date, end_date=request.end_date,
+            loan_amount=request.loan_amount, annual_margin=request.annual_margin,
+            base_interest_rate_index=request.base_interest_rate_index
+        )
+    except BaseInterestRateNotFound as error:
+        return error
+    return LoanCalculation(totals, calculation_results)
+
+
+def calculate_loans(
+        requests: List[LoanCalculationRequest], executor: Optional[Executor] = None
+) -> List[Union[LoanCalculation, BaseInterestRateNotFound]]:
+    if len(requests) <= 1:
+        return [calculate_loan_request(request) for request in requests]
+    executor = executor or get_loan_batch_executor()
+    return list(executor.map(calculate_loan_request, requests, chunksize=LOAN_BATCH_CHUNK_SIZE))
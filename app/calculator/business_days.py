@@ -0,0 +1,85 @@
+from datetime import date
+from typing import (
+    Dict,
+    Iterable
+)
+
+import holidays
+import numpy as np
+
+UK_CALENDAR = "UK"
+US_CALENDAR = "US"
+# the TARGET2 settlement calendar of the ECB
+TARGET_CALENDAR = "TARGET"
+HOLIDAY_CALENDARS = {
+    UK_CALENDAR: holidays.UnitedKingdom,
+    US_CALENDAR: holidays.UnitedStates,
+    TARGET_CALENDAR: holidays.ECB,
+}
+DEFAULT_CURRENCY_CALENDARS = {"GBP": UK_CALENDAR, "USD": US_CALENDAR, "EUR": TARGET_CALENDAR}
+
+
+class UnknownHolidayCalendarError(Exception):
+    pass
+
+
+class DateOutsideCalendarError(Exception):
+    pass
+
+
+class BusinessDayCalendar:
+    # Holidays and business days of one calendar as bitsets over a fixed date range, a day is checked with one
+    # byte lookup.
+
+    def __init__(self, name: str, start_date: date, end_date: date, holiday_dates: Iterable[date]):
+        self.name = name
+        self.start_date = start_date
+        self.end_date = end_date
+        days = (end_date - start_date).days + 1
+        holiday_mask = np.zeros(days, dtype=bool)
+        for holiday_date in holiday_dates:
+            if start_date <= holiday_date <= end_date:
+                holiday_mask[(holiday_date - start_date).days] = True
+        # weekday of every day in the range, 5 and 6 are the weekend
+        weekdays = (np.arange(days) + start_date.weekday()) % 7
+        business_day_mask = ~holiday_mask & (weekdays < 5)
+        self._holidays = np.packbits(holiday_mask).tobytes()
+        self._business_days = np.packbits(business_day_mask).tobytes()
+
+    @classmethod
+    def for_years(cls, name: str, start_year: int, end_year: int) -> "BusinessDayCalendar":
+        if name not in HOLIDAY_CALENDARS:
+            raise UnknownHolidayCalendarError(f"Holiday calendar has to be one of: {list(HOLIDAY_CALENDARS)}.")
+        return cls(
+            name=name, start_date=date(start_year, 1, 1), end_date=date(end_year, 12, 31),
+            holiday_dates=HOLIDAY_CALENDARS[name](years=range(start_year, end_year + 1))
+        )
+
+    def _position(self, day: date) -> int:
+        position = (day - self.start_date).days
+        if not 0 <= position <= (self.end_date - self.start_date).days:
+            raise DateOutsideCalendarError(
+                f"'{day}' is outside the {self.name} calendar of {self.start_date} - {self.end_date}."
+            )
+        return position
+
+    @staticmethod
+    def _bit(bitset: bytes, position: int) -> bool:
+        return bool(bitset[position >> 3] & (0x80 >> (position & 7)))
+
+    def is_holiday(self, day: date) -> bool:
+        return self._bit(self._holidays, self._position(day))
+
+    def is_business_day(self, day: date) -> bool:
+        return self._bit(self._business_days, self._position(day))
+
+
+def build_currency_calendars(
+        currency_calendars: Dict[str, str], start_year: int, end_year: int
+) -> Dict[str, BusinessDayCalendar]:
+    # one BusinessDayCalendar per calendar name, shared by the currencies settling on it
+    calendars = {
+        name: BusinessDayCalendar.for_years(name=name, start_year=start_year, end_year=end_year)
+        for name in set(currency_calendars.values())
+    }
+    return {currency: calendars[name] for currency, name in currency_calendars.items()}
@@ -0,0 +1,92 @@
+import os
+from datetime import date
+from decimal import Decimal
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Tuple
+)
+
+from calculator.loan import (
+    calculate_loan,
+    LoanDailyCalculationResult,
+    Currency,
+    BaseInterestRate
+)
+from calculator.vectorized_loan import calculate_loan_vectorized
+
+
+DECIMAL_ENGINE = "decimal"
+VECTORIZED_ENGINE = "vectorized"
+
+LoanCalculationEngine = Callable[..., List[LoanDailyCalculationResult]]
+
+LOAN_CALCULATION_ENGINES: Dict[str, LoanCalculationEngine] = {
+    DECIMAL_ENGINE: calculate_loan,
+    VECTORIZED_ENGINE: calculate_loan_vectorized,
+}
+
+LOAN_CALCULATION_ENGINE = os.environ.get("LOAN_CALCULATION_ENGINE", DECIMAL_ENGINE)
+# maximum absolute difference per daily amount allowed between an engine and the decimal engine
+LOAN_CALCULATION_ENGINE_TOLERANCE = Decimal(os.environ.get("LOAN_CALCULATION_ENGINE_TOLERANCE", "0.000001"))
+# when enabled every calculation is also run on the decimal engine and compared (slow, meant for rollouts)
+LOAN_CALCULATION_ENGINE_VERIFY = os.environ.get("LOAN_CALCULATION_ENGINE_VERIFY", "false").lower() == "true"
+
+
+class UnknownLoanCalculationEngineError(Exception):
+    pass
+
+
+class LoanCalculationEnginesMismatchError(Exception):
+    pass
+
+
+def get_loan_calculation_engine(name: str = LOAN_CALCULATION_ENGINE) -> LoanCalculationEngine:
+    try:
+        return LOAN_CALCULATION_ENGINES[name]
+    except KeyError:
+        raise UnknownLoanCalculationEngineError(
+            f"Loan calculation engine '{name}' is unknown, has to be one of: {list(LOAN_CALCULATION_ENGINES)}."
+        )
+
+
+def verify_loan_calculation_results(
+        expected: List[LoanDailyCalculationResult],
+        actual: List[LoanDailyCalculationResult],
+        tolerance: Decimal = LOAN_CALCULATION_ENGINE_TOLERANCE
+):
+    if len(expected) != len(actual):
+        raise LoanCalculationEnginesMismatchError(
+            f"Expected {len(expected)} daily calculation results, got {len(actual)}."
+        )
+    for expected_result, actual_result in zip(expected, actual):
+        if expected_result.date != actual_result.date:
+            raise LoanCalculationEnginesMismatchError(
+                f"Expected daily calculation result for {expected_result.date}, got {actual_result.date}."
+            )
+        for field in ("interest_accrual_amount", "interest_accrual_amount_without_margin"):
+            difference = abs(Decimal(getattr(expected_result, field)) - Decimal(getattr(actual_result, field)))
+            if difference > tolerance:
+                raise LoanCalculationEnginesMismatchError(
+                    f"'{field}' on {expected_result.date} differs by {difference} which exceeds 'tolerance'={tolerance}."
+                )
+
+
+def calculate_loan_with_engine(
+        start_date: date, end_date: date,
+        loan_amount: Decimal, currency: str,
+        annual_margin: Decimal, base_interest_rates: Mapping[Tuple[Currency, date], BaseInterestRate],
+        engine: str = LOAN_CALCULATION_ENGINE,
+        verify: bool = LOAN_CALCULATION_ENGINE_VERIFY
+) -> List[LoanDailyCalculationResult]:
+    calculation_parameters = dict(
+        start_date=start_date, end_date=end_date,
+        loan_amount=loan_amount, currency=currency,
+        annual_margin=annual_margin, base_interest_rates=base_interest_rates
+    )
+    results = get_loan_calculation_engine(engine)(**calculation_parameters)
+    if verify and engine != DECIMAL_ENGINE:
+        verify_loan_calculation_results(expected=calculate_loan(**calculation_parameters), actual=results)
+    return results
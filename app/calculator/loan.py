@@ -2,7 +2,8 @@ from collections import namedtuple
 from typing import (
     List,
     Dict,
-    Tuple
+    Tuple,
+    TYPE_CHECKING
 )
 from datetime import (
     date,
@@ -10,14 +11,31 @@ from datetime import (
 )
 from decimal import Decimal
 
+if TYPE_CHECKING:
+    from calculator.rate_index import BaseInterestRateIndex
 
-LoanDailyCalculationResult = namedtuple("daily_loan_data", [
+
+LoanDailyCalculationResult = namedtuple("LoanDailyCalculationResult", [
     "interest_accrual_amount",
     "days_elapsed_since_loan_start_date",
     "interest_accrual_amount_without_margin",
     "date"
 ])
 
+ONE_DAY = timedelta(days=1)
+
+# a run of days sharing one base interest rate, both dates included
+BaseInterestRatePeriod = namedtuple("BaseInterestRatePeriod", [
+    "valid_from",
+    "valid_to",
+    "interest_rate"
+])
+
+LoanTotals = namedtuple("LoanTotals", [
+    "total_interest",
+    "total_interest_without_margin"
+])
+
 Currency = str
 BaseInterestRate = Decimal
 
@@ -36,10 +54,55 @@ def calculate_loan(
         loan_amount: Decimal, currency: str,
         annual_margin: Decimal, base_interest_rates: Dict[Tuple[Currency, date], BaseInterestRate]
 ) -> List[LoanDailyCalculationResult]:
-
+    # every day of a constant rate run in the same year accrues the same amounts, so they are calculated once
+    # per run and year and repeated for its days
     daily_loan_data = []
-    current_date = start_date
+    daily_margins = {}
     days_elapsed = 0
+    for run_start_date, valid_to, bi in get_base_interest_rate_periods(
+            base_interest_rates, currency=currency, start_date=start_date, end_date=end_date
+    ):
+        while True:
+            year = run_start_date.year
+            run_end_date = valid_to if valid_to.year == year else date(year, 12, 31)
+            if year not in daily_margins:
+                daily_margins[year] = calculate_daily_margin_from_annual(year=year, annual_margin=annual_margin)
+            daily_interest_accrual_amount = calculate_interest_accrual_amount(
+                p=loan_amount, bi=bi, m=daily_margins[year], n=Decimal(1)
+            )
+            daily_interest_accrual_amount_without_margin = calculate_interest_accrual_amount_without_margin(
+                p=loan_amount, bi=bi, n=Decimal(1)
+            )
+            current_date = run_start_date
+            while current_date <= run_end_date:
+                daily_loan_data.append(
+                    LoanDailyCalculationResult(
+                        daily_interest_accrual_amount, days_elapsed,
+                        daily_interest_accrual_amount_without_margin,
+                        current_date
+                    )
+                )
+                days_elapsed += 1
+                current_date += ONE_DAY
+            if run_end_date == valid_to:
+                break
+            run_start_date = date(year + 1, 1, 1)
+    return daily_loan_data
+
+
+def get_base_interest_rate_periods(
+        base_interest_rates: Dict[Tuple[Currency, date], BaseInterestRate], currency: str,
+        start_date: date, end_date: date
+) -> List[BaseInterestRatePeriod]:
+    # a BaseInterestRateIndex keeps its runs, any other mapping is read day by day and merged into runs
+    if end_date < start_date:
+        return []
+    if hasattr(base_interest_rates, "periods_between"):
+        if base_interest_rates.currency != currency:
+            raise BaseInterestRateNotFound(f"Base interest rates are not available for: 'currency'={currency}.")
+        return base_interest_rates.periods_between(start_date=start_date, end_date=end_date)
+    periods = []
+    current_date = start_date
     while current_date <= end_date:
         try:
             bi = base_interest_rates[(currency, current_date)]
@@ -47,23 +110,30 @@ def calculate_loan(
             raise BaseInterestRateNotFound(
                 f"Base interest rate is not available for: 'currency'={currency}, 'date'={current_date}."
             )
-        daily_margin = calculate_daily_margin_from_annual(year=current_date.year, annual_margin=annual_margin)
-        daily_interest_accrual_amount = calculate_interest_accrual_amount(
-            p=loan_amount, bi=bi, m=daily_margin, n=Decimal(1)
-        )
-        daily_interest_accrual_amount_without_margin = calculate_interest_accrual_amount_without_margin(
-            p=loan_amount, bi=bi, n=Decimal(1)
-        )
-        daily_loan_data.append(
-            LoanDailyCalculationResult(
-                daily_interest_accrual_amount, days_elapsed,
-                daily_interest_accrual_amount_without_margin,
-                current_date
-            )
-        )
-        days_elapsed += 1
-        current_date = start_date + timedelta(days=days_elapsed)
-    return daily_loan_data
+        if periods and periods[-1].interest_rate == bi:
+            periods[-1] = periods[-1]._replace(valid_to=current_date)
+        else:
+            periods.append(BaseInterestRatePeriod(valid_from=current_date, valid_to=current_date, interest_rate=bi))
+        current_date += timedelta(days=1)
+    return periods
+
+
+def calculate_loan_totals(
+        start_date: date, end_date: date,
+        loan_amount: Decimal, annual_margin: Decimal,
+        base_interest_rate_index: "BaseInterestRateIndex"
+) -> LoanTotals:
+    # interest is linear in the base rate and the margin so the totals only need the sum of base rates
+    # over the loan period and the number of loan days falling into each year (for the daily margin)
+    base_interest_rate_sum = base_interest_rate_index.sum_between(start_date=start_date, end_date=end_date)
+    margin_sum = Decimal(0)
+    for year in range(start_date.year, end_date.year + 1):
+        days_in_year = (min(end_date, date(year, 12, 31)) - max(start_date, date(year, 1, 1))).days + 1
+        margin_sum += calculate_daily_margin_from_annual(year=year, annual_margin=annual_margin) * days_in_year
+    return LoanTotals(
+        calculate_interest_accrual_amount(p=loan_amount, bi=base_interest_rate_sum, m=margin_sum, n=Decimal(1)),
+        calculate_interest_accrual_amount_without_margin(p=loan_amount, bi=base_interest_rate_sum, n=Decimal(1))
+    )
 
 
 def calculate_interest_accrual_amount(p: Decimal, bi: Decimal, m: Decimal, n: Decimal):
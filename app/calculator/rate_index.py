@@ -0,0 +1,207 @@
+from bisect import (
+    bisect_left,
+    bisect_right
+)
+from copy import copy
+from datetime import (
+    date,
+    timedelta
+)
+from decimal import Decimal
+from typing import (
+    Iterable,
+    List,
+    Optional,
+    Tuple
+)
+
+import numpy as np
+
+from calculator.loan import (
+    BaseInterestRateNotFound,
+    BaseInterestRatePeriod,
+    Currency,
+    BaseInterestRate
+)
+
+ONE_DAY = timedelta(days=1)
+
+
+def merge_periods(periods: Iterable[BaseInterestRatePeriod]) -> List[BaseInterestRatePeriod]:
+    # periods ordered by valid_from and not overlapping, neighbours with the same rate become one period
+    merged = []
+    for period in periods:
+        if merged and merged[-1].interest_rate == period.interest_rate and (
+                merged[-1].valid_to + ONE_DAY == period.valid_from
+        ):
+            merged[-1] = merged[-1]._replace(valid_to=period.valid_to)
+        else:
+            merged.append(BaseInterestRatePeriod(*period))
+    return merged
+
+
+def periods_from_rates(rates: Iterable[Tuple[date, Optional[BaseInterestRate]]]) -> List[BaseInterestRatePeriod]:
+    # daily rates in any order merged into runs, a day given twice keeps its last rate
+    return merge_periods(
+        BaseInterestRatePeriod(rate_date, rate_date, rate) for rate_date, rate in sorted(dict(rates).items())
+    )
+
+
+def overlay_periods(
+        periods: List[BaseInterestRatePeriod], changes: List[BaseInterestRatePeriod]
+) -> List[BaseInterestRatePeriod]:
+    # both ordered by valid_from and not overlapping: the days of a change take its rate, or lose theirs when
+    # the change has none, every other day of periods keeps its rate
+    change_ends = [change.valid_to for change in changes]
+    pieces = []
+    for period in periods:
+        valid_from = period.valid_from
+        position = bisect_left(change_ends, valid_from)
+        while position < len(changes) and changes[position].valid_from <= period.valid_to:
+            if changes[position].valid_from > valid_from:
+                pieces.append(period._replace(valid_from=valid_from, valid_to=changes[position].valid_from - ONE_DAY))
+            valid_from = max(valid_from, changes[position].valid_to + ONE_DAY)
+            position += 1
+        if valid_from <= period.valid_to:
+            pieces.append(period._replace(valid_from=valid_from))
+    pieces.extend(change for change in changes if change.interest_rate is not None)
+    return merge_periods(sorted(pieces, key=lambda piece: piece.valid_from))
+
+
+class BaseInterestRateIndex:
+    # Base interest rates of one currency as its constant rate runs, with the running sums at the start of every
+    # run so the sum of rates over any date range is two bisections. Days between two periods have no rate, they
+    # are kept as runs without one and counted in missing_prefix_counts. Memory and building time follow the
+    # number of runs, not the number of days.
+
+    def __init__(self, currency: Currency, periods: Iterable[BaseInterestRatePeriod]):
+        self.currency = currency
+        self.periods = merge_periods(periods)
+        self._build_runs()
+
+    @classmethod
+    def from_rates(cls, currency: Currency, rates: Iterable[Tuple[date, BaseInterestRate]]) -> "BaseInterestRateIndex":
+        return cls(currency=currency, periods=periods_from_rates(rates))
+
+    @classmethod
+    def from_periods(
+            cls, currency: Currency, periods: Iterable[BaseInterestRatePeriod]
+    ) -> "BaseInterestRateIndex":
+        # periods (anything with valid_from, valid_to and interest_rate) ordered by valid_from and not overlapping
+        return cls(
+            currency=currency,
+            periods=(BaseInterestRatePeriod(period.valid_from, period.valid_to, period.interest_rate)
+                     for period in periods)
+        )
+
+    @property
+    def start_date(self) -> date:
+        return self.periods[0].valid_from if self.periods else date.min
+
+    @property
+    def end_date(self) -> date:
+        return self.periods[-1].valid_to if self.periods else date.min
+
+    def __len__(self) -> int:
+        return (self.end_date - self.start_date).days + 1 if self.periods else 0
+
+    def __getitem__(self, key: Tuple[Currency, date]) -> BaseInterestRate:
+        # lets the index stand in for the {(currency, date): rate} mapping calculate_loan expects
+        currency, rate_date = key
+        run = bisect_right(self.run_starts, rate_date) - 1
+        if currency != self.currency or run < 0 or rate_date > self.end_date or self.run_rates[run] is None:
+            raise KeyError(key)
+        return self.run_rates[run]
+
+    def sum_between(self, start_date: date, end_date: date) -> Decimal:
+        self._check_range(start_date=start_date, end_date=end_date)
+        return self._prefix_sum(end_date + ONE_DAY) - self._prefix_sum(start_date)
+
+    def between(self, start_date: date, end_date: date) -> "BaseInterestRateIndex":
+        # a standalone index of just the given range, small enough to ship to a worker process
+        return BaseInterestRateIndex(
+            currency=self.currency, periods=self.periods_between(start_date=start_date, end_date=end_date)
+        )
+
+    def rates_between(self, start_date: date, end_date: date) -> np.ndarray:
+        # float64 rate of every day of the range, repeated out of its runs
+        periods = self.periods_between(start_date=start_date, end_date=end_date)
+        return np.repeat(
+            np.array([float(period.interest_rate) for period in periods], dtype=np.float64),
+            [(period.valid_to - period.valid_from).days + 1 for period in periods]
+        )
+
+    def periods_between(self, start_date: date, end_date: date) -> List[BaseInterestRatePeriod]:
+        self._check_range(start_date=start_date, end_date=end_date)
+        periods = self.periods[bisect_right(self.run_starts, start_date) - 1:bisect_right(self.run_starts, end_date)]
+        # the first and last runs are cut to the range
+        periods[0] = periods[0]._replace(valid_from=start_date)
+        periods[-1] = periods[-1]._replace(valid_to=end_date)
+        return periods
+
+    def _check_range(self, start_date: date, end_date: date):
+        if not self.periods or start_date < self.start_date or end_date > self.end_date or (
+                self._missing_prefix_count(end_date + ONE_DAY) - self._missing_prefix_count(start_date)
+        ):
+            raise BaseInterestRateNotFound(
+                f"Base interest rates are not available for every day of: "
+                f"'currency'={self.currency}, 'start_date'={start_date}, 'end_date'={end_date}."
+            )
+
+    def _prefix_sum(self, rate_date: date) -> Decimal:
+        # sum of the rates before rate_date, which is at most the day after end_date
+        run = bisect_right(self.run_starts, rate_date) - 1
+        return self.prefix_sums[run] + (self.run_rates[run] or Decimal(0)) * (rate_date - self.run_starts[run]).days
+
+    def _missing_prefix_count(self, rate_date: date) -> int:
+        run = bisect_right(self.run_starts, rate_date) - 1
+        return self.missing_prefix_counts[run] + (
+            (rate_date - self.run_starts[run]).days if self.run_rates[run] is None else 0
+        )
+
+    def copy(self) -> "BaseInterestRateIndex":
+        # set_rates and set_periods change the index in place, a copy is what gets changed while readers keep
+        # the original. They replace the run lists rather than changing them, so the copy can share them.
+        return copy(self)
+
+    def set_rates(self, rates: Iterable[Tuple[date, Optional[BaseInterestRate]]]):
+        # daily rates, a day without a rate is deleted
+        self._overlay(periods_from_rates(rates))
+
+    def set_periods(self, date_from: date, date_to: date, periods: Iterable[BaseInterestRatePeriod]):
+        # the days of [date_from, date_to] take the rates of periods (anything with valid_from, valid_to and
+        # interest_rate), days they don't cover are deleted
+        self._overlay([BaseInterestRatePeriod(date_from, date_to, None)])
+        self._overlay([
+            BaseInterestRatePeriod(
+                max(period.valid_from, date_from), min(period.valid_to, date_to), period.interest_rate
+            ) for period in periods if period.valid_to >= date_from and period.valid_from <= date_to
+        ])
+
+    def _overlay(self, changes: List[BaseInterestRatePeriod]):
+        self.periods = overlay_periods(
+            [period for period in self.periods if period.interest_rate is not None], changes
+        )
+        self._build_runs()
+
+    def _build_runs(self):
+        # the days between two periods become a run without a rate, so the runs cover start_date..end_date
+        periods = [period for period in self.periods if period.interest_rate is not None]
+        self.periods = []
+        for period in periods:
+            if self.periods and self.periods[-1].valid_to + ONE_DAY < period.valid_from:
+                self.periods.append(
+                    BaseInterestRatePeriod(self.periods[-1].valid_to + ONE_DAY, period.valid_from - ONE_DAY, None)
+                )
+            self.periods.append(period)
+        self.run_starts = [period.valid_from for period in self.periods]
+        self.run_rates = [period.interest_rate for period in self.periods]
+        # prefix_sums[i] is the sum of the rates before the i-th run, missing_prefix_counts[i] the days without one
+        self.prefix_sums = [Decimal(0)]
+        self.missing_prefix_counts = [0]
+        for period in self.periods:
+            days = (period.valid_to - period.valid_from).days + 1
+            self.prefix_sums.append(self.prefix_sums[-1] + (period.interest_rate or Decimal(0)) * days)
+            self.missing_prefix_counts.append(
+                self.missing_prefix_counts[-1] + (days if period.interest_rate is None else 0)
+            )
@@ -0,0 +1,156 @@
+from collections import namedtuple
+from typing import (
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple
+)
+from datetime import (
+    date,
+    timedelta
+)
+from decimal import Decimal
+
+import numpy as np
+
+from calculator.loan import (
+    LoanDailyCalculationResult,
+    BaseInterestRateNotFound,
+    Currency,
+    BaseInterestRate
+)
+from calculator.rate_index import BaseInterestRateIndex
+
+
+LoanGridCalculation = namedtuple("LoanGridCalculation", [
+    "date_axis",
+    # amounts x margins
+    "total_interest",
+    # one per amount, the margin doesn't change it
+    "total_interest_without_margin",
+    # amounts x margins x days and amounts x days, None unless requested
+    "interest_accrual_amounts",
+    "interest_accrual_amounts_without_margin"
+])
+
+
+def build_date_axis(start_date: date, end_date: date) -> np.ndarray:
+    return np.arange(
+        np.datetime64(start_date, "D"), np.datetime64(end_date + timedelta(days=1), "D"), dtype="datetime64[D]"
+    )
+
+
+def build_days_in_year_array(date_axis: np.ndarray) -> np.ndarray:
+    years = date_axis.astype("datetime64[Y]").astype(np.int64) + 1970
+    is_leapyear = (years % 4 == 0) & ((years % 100 != 0) | (years % 400 == 0))
+    return np.where(is_leapyear, 366.0, 365.0)
+
+
+def build_base_interest_rate_array(
+        start_date: date, days: int, currency: Currency,
+        base_interest_rates: Mapping[Tuple[Currency, date], BaseInterestRate]
+) -> np.ndarray:
+    try:
+        rates = [base_interest_rates[(currency, start_date + timedelta(days=i))] for i in range(days)]
+    except KeyError as error:
+        _, current_date = error.args[0]
+        raise BaseInterestRateNotFound(
+            f"Base interest rate is not available for: 'currency'={currency}, 'date'={current_date}."
+        )
+    return np.array(rates, dtype=np.float64)
+
+
+def calculate_loan_columns(
+        start_date: date, end_date: date,
+        loan_amount: Decimal, annual_margin: Decimal,
+        base_interest_rates: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    date_axis = build_date_axis(start_date=start_date, end_date=end_date)
+    if len(base_interest_rates) != len(date_axis):
+        raise ValueError(
+            f"Expected {len(date_axis)} base interest rates for {start_date}..{end_date}, "
+            f"got {len(base_interest_rates)}."
+        )
+    daily_margins = float(annual_margin) / build_days_in_year_array(date_axis)
+    interest_accrual_amounts = float(loan_amount) * (base_interest_rates + daily_margins)
+    interest_accrual_amounts_without_margin = float(loan_amount) * base_interest_rates
+    return date_axis, interest_accrual_amounts, interest_accrual_amounts_without_margin
+
+
+def calculate_loan_from_rate_array(
+        start_date: date, end_date: date,
+        loan_amount: Decimal, annual_margin: Decimal,
+        base_interest_rates: np.ndarray
+) -> List[LoanDailyCalculationResult]:
+    date_axis, interest_accrual_amounts, interest_accrual_amounts_without_margin = calculate_loan_columns(
+        start_date=start_date, end_date=end_date,
+        loan_amount=loan_amount, annual_margin=annual_margin,
+        base_interest_rates=base_interest_rates
+    )
+    # amounts stay python floats, converting thousands of them to Decimal costs more than the calculation itself
+    return list(map(
+        LoanDailyCalculationResult,
+        interest_accrual_amounts.tolist(),
+        range(len(date_axis)),
+        interest_accrual_amounts_without_margin.tolist(),
+        date_axis.tolist()
+    ))
+
+
+def calculate_loan_vectorized(
+        start_date: date, end_date: date,
+        loan_amount: Decimal, currency: str,
+        annual_margin: Decimal, base_interest_rates: Mapping[Tuple[Currency, date], BaseInterestRate]
+) -> List[LoanDailyCalculationResult]:
+    # same inputs and outputs as calculator.loan.calculate_loan but computes every day at once in float64
+    days = (end_date - start_date).days + 1
+    if days <= 0:
+        return []
+    if isinstance(base_interest_rates, BaseInterestRateIndex) and base_interest_rates.currency == currency:
+        rates = base_interest_rates.rates_between(start_date=start_date, end_date=end_date)
+    else:
+        rates = build_base_interest_rate_array(
+            start_date=start_date, days=days, currency=currency, base_interest_rates=base_interest_rates
+        )
+    return calculate_loan_from_rate_array(
+        start_date=start_date, end_date=end_date,
+        loan_amount=loan_amount, annual_margin=annual_margin,
+        base_interest_rates=rates
+    )
+
+
+def calculate_loan_grid(
+        start_date: date, end_date: date,
+        loan_amounts: Sequence[Decimal], annual_margins: Sequence[Decimal],
+        base_interest_rates: np.ndarray, with_calculation_results: bool = False
+) -> LoanGridCalculation:
+    # A daily accrual is amount * (base rate + annual margin / days in year), linear in the amount and the
+    # margin, so every loan of the grid is priced from two sums over the one rate pass: the sum of the base
+    # rates and the sum of 1 / days in year. Schedules, when asked for, broadcast the same terms per day.
+    date_axis = build_date_axis(start_date=start_date, end_date=end_date)
+    if len(base_interest_rates) != len(date_axis):
+        raise ValueError(
+            f"Expected {len(date_axis)} base interest rates for {start_date}..{end_date}, "
+            f"got {len(base_interest_rates)}."
+        )
+    amounts = np.array([float(loan_amount) for loan_amount in loan_amounts], dtype=np.float64)
+    margins = np.array([float(annual_margin) for annual_margin in annual_margins], dtype=np.float64)
+    inverse_days_in_year = 1.0 / build_days_in_year_array(date_axis)
+    total_interest_without_margin = amounts * base_interest_rates.sum()
+    total_interest = total_interest_without_margin[:, None] + np.outer(amounts, margins * inverse_days_in_year.sum())
+    interest_accrual_amounts: Optional[np.ndarray] = None
+    interest_accrual_amounts_without_margin: Optional[np.ndarray] = None
+    if with_calculation_results:
+        interest_accrual_amounts_without_margin = np.outer(amounts, base_interest_rates)
+        interest_accrual_amounts = (
+            interest_accrual_amounts_without_margin[:, None, :]
+            + amounts[:, None, None] * np.outer(margins, inverse_days_in_year)[None, :, :]
+        )
+    return LoanGridCalculation(
+        date_axis=date_axis,
+        total_interest=total_interest,
+        total_interest_without_margin=total_interest_without_margin,
+        interest_accrual_amounts=interest_accrual_amounts,
+        interest_accrual_amounts_without_margin=interest_accrual_amounts_without_margin
+    )
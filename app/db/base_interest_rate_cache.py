@@ -0,0 +1,107 @@
+from threading import Lock
+from typing import (
+    Dict,
+    Optional,
+    Tuple
+)
+
+from calculator.rate_index import BaseInterestRateIndex
+from db.data_repositories.base_interest_rate_repository import BaseInterestRateRepository
+
+
+class BaseInterestRateCache:
+    # Keeps a BaseInterestRateIndex per currency together with the rate version it was loaded at.
+    # Every lookup compares that with the version stamp in the database, which is a single primary key read,
+    # and reloads the currency when the rates have been changed since. When every version in between recorded the
+    # date range it changed, only those ranges are read again, into a copy of the cached index.
+
+    def __init__(self):
+        self.entries: Dict[str, Tuple[int, BaseInterestRateIndex]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.partial_reloads = 0
+        self._lock = Lock()
+
+    def get(self, session, currency: str) -> BaseInterestRateIndex:
+        return self.get_with_version(session=session, currency=currency)[1]
+
+    def get_with_version(self, session, currency: str) -> Tuple[int, BaseInterestRateIndex]:
+        base_interest_rates_repository = BaseInterestRateRepository(session=session)
+        version = base_interest_rates_repository.get_version(currency)
+        entry = self.entries.get(currency)
+        # a replica lagging behind the rates the cache already has doesn't roll them back
+        if entry is not None and entry[0] >= version:
+            self.hits += 1
+            return entry
+        with self._lock:
+            entry = self.entries.get(currency)
+            if entry is not None and entry[0] >= version:
+                self.hits += 1
+                return entry
+            return self._load(base_interest_rates_repository, currency=currency, version=version)
+
+    def _load(
+            self, base_interest_rates_repository: BaseInterestRateRepository, currency: str, version: int
+    ) -> Tuple[int, BaseInterestRateIndex]:
+        entry = self.entries.get(currency)
+        # the version is read before the rates: a concurrent change can only make the entry look older
+        # than its data, which costs one extra reload but never serves stale rates under a new version
+        index = None
+        if entry is not None and entry[0] < version:
+            index = self._apply_changes(base_interest_rates_repository, entry=entry, version=version)
+        if index is not None:
+            self.partial_reloads += 1
+        elif entry is not None:
+            self.reloads += 1
+            index = base_interest_rates_repository.get_index(currency)
+        else:
+            self.misses += 1
+            index = base_interest_rates_repository.get_index(currency)
+        self.entries[currency] = (version, index)
+        return version, index
+
+    @staticmethod
+    def _apply_changes(
+            base_interest_rates_repository: BaseInterestRateRepository, entry: Tuple[int, BaseInterestRateIndex],
+            version: int
+    ) -> Optional[BaseInterestRateIndex]:
+        cached_version, cached_index = entry
+        changes = [
+            change for change in base_interest_rates_repository.get_changes(
+                cached_index.currency, after_version=cached_version
+            ) if change.version <= version
+        ]
+        if [change.version for change in changes] != list(range(cached_version + 1, version + 1)):
+            # a version bumped without a recorded range, the whole currency has to be read again
+            return None
+        index = cached_index.copy()
+        for change in changes:
+            # days of the range no period covers any more were deleted
+            index.set_periods(
+                change.date_from, change.date_to, base_interest_rates_repository.get_periods(
+                    cached_index.currency, start_date=change.date_from, end_date=change.date_to
+                )
+            )
+        return index
+
+    def load(self, session):
+        base_interest_rates_repository = BaseInterestRateRepository(session=session)
+        for currency in base_interest_rates_repository.list_currencies():
+            self.get(session=session, currency=currency)
+
+    def invalidate(self, currency: str = None):
+        with self._lock:
+            if currency is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(currency, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "partial_reloads": self.partial_reloads,
+            "currencies": len(self.entries),
+        }
@@ -0,0 +1,112 @@
+import csv
+import json
+import os
+import time
+from collections import namedtuple
+from datetime import date
+from decimal import (
+    Decimal,
+    InvalidOperation
+)
+from itertools import islice
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    TextIO,
+    Tuple
+)
+
+from db.data_repositories.base_interest_rate_repository import BaseInterestRateRepository
+
+# rows merged into the rate periods at once, memory use of a load is bounded by one batch whatever the file size
+BASE_INTEREST_RATE_LOAD_BATCH_SIZE = int(os.environ.get("BASE_INTEREST_RATE_LOAD_BATCH_SIZE", "10000"))
+RATE_FILE_FORMATS = ["csv", "ndjson"]
+
+BaseInterestRateRow = namedtuple("BaseInterestRateRow", ["currency", "date", "interest_rate"])
+BaseInterestRateLoadStats = namedtuple("BaseInterestRateLoadStats", ["rows", "currencies", "versions", "seconds"])
+
+
+class InvalidBaseInterestRateRowError(Exception):
+    pass
+
+
+def _parse_row(line_number: int, currency, rate_date, interest_rate) -> BaseInterestRateRow:
+    try:
+        row = BaseInterestRateRow(
+            currency=str(currency), date=date.fromisoformat(str(rate_date)), interest_rate=Decimal(str(interest_rate))
+        )
+    except (TypeError, ValueError, InvalidOperation) as error:
+        raise InvalidBaseInterestRateRowError(f"Line {line_number} is not a valid base interest rate: {error}")
+    if len(row.currency) != 3:
+        raise InvalidBaseInterestRateRowError(f"Line {line_number} has an invalid currency: '{row.currency}'.")
+    return row
+
+
+def read_csv_rates(file: TextIO) -> Iterator[BaseInterestRateRow]:
+    # header line with currency,date,interest_rate columns in any order
+    for line_number, record in enumerate(csv.DictReader(file), start=2):
+        yield _parse_row(line_number, record.get("currency"), record.get("date"), record.get("interest_rate"))
+
+
+def read_ndjson_rates(file: TextIO) -> Iterator[BaseInterestRateRow]:
+    # one {"currency": ..., "date": ..., "interest_rate": ...} object per line, the rate as a string or a number
+    for line_number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line, parse_float=Decimal)
+        except ValueError as error:
+            raise InvalidBaseInterestRateRowError(f"Line {line_number} is not valid JSON: {error}")
+        if not isinstance(record, dict):
+            raise InvalidBaseInterestRateRowError(f"Line {line_number} is not a JSON object: {line.strip()}")
+        yield _parse_row(line_number, record.get("currency"), record.get("date"), record.get("interest_rate"))
+
+
+def read_rates(file: TextIO, file_format: str) -> Iterator[BaseInterestRateRow]:
+    if file_format not in RATE_FILE_FORMATS:
+        raise ValueError(f"'file_format' has to be one of: {RATE_FILE_FORMATS}.")
+    return read_csv_rates(file) if file_format == "csv" else read_ndjson_rates(file)
+
+
+def _batches(rows: Iterable[BaseInterestRateRow], batch_size: int) -> Iterator[Dict[Tuple[str, date], Decimal]]:
+    iterator = iter(rows)
+    while batch := list(islice(iterator, batch_size)):
+        # a key repeated within a batch keeps its last value like it does across batches
+        yield {(row.currency, row.date): row.interest_rate for row in batch}
+
+
+class BaseInterestRateLoader:
+    # Merges base interest rates into the stored rate periods, so loading a file again or loading a corrected one
+    # leaves the days it doesn't cover as they were. Everything goes through the session's one connection and one
+    # transaction, which also records the loaded date range of every currency under a new version so caches only
+    # reload that range.
+
+    def __init__(self, session, batch_size: int = BASE_INTEREST_RATE_LOAD_BATCH_SIZE):
+        self.session = session
+        self.batch_size = batch_size
+
+    def load(
+            self, rows: Iterable[BaseInterestRateRow],
+            on_progress: Optional[Callable[[int, float], None]] = None
+    ) -> BaseInterestRateLoadStats:
+        started = time.perf_counter()
+        repository = BaseInterestRateRepository(session=self.session)
+        loaded, changed_ranges = 0, {}
+        for batch in _batches(rows, self.batch_size):
+            batch_ranges = repository.upsert(
+                BaseInterestRateRow(currency, rate_date, interest_rate)
+                for (currency, rate_date), interest_rate in batch.items()
+            )
+            for currency, (date_from, date_to) in batch_ranges.items():
+                loaded_from, loaded_to = changed_ranges.get(currency, (date_from, date_to))
+                changed_ranges[currency] = min(loaded_from, date_from), max(loaded_to, date_to)
+            loaded += len(batch)
+            if on_progress is not None:
+                on_progress(loaded, time.perf_counter() - started)
+        versions = repository.record_changes(dict(sorted(changed_ranges.items())))
+        return BaseInterestRateLoadStats(
+            rows=loaded, currencies=sorted(changed_ranges), versions=versions, seconds=time.perf_counter() - started
+        )
@@ -1,60 +1,299 @@
-from datetime import date
+from datetime import (
+    date,
+    datetime,
+    timedelta
+)
 from decimal import Decimal
-from typing import List
+from itertools import islice
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple
+)
 
+from sqlalchemy import (
+    and_,
+    delete,
+    or_
+)
+from sqlalchemy.dialects import (
+    postgresql,
+    sqlite
+)
 from pydantic import BaseModel
 
-from db.schema import BaseInterestRate
+from calculator.loan import BaseInterestRatePeriod as RatePeriod
+from calculator.rate_index import (
+    BaseInterestRateIndex,
+    overlay_periods,
+    periods_from_rates
+)
+from db.schema import (
+    BaseInterestRateChange,
+    BaseInterestRatePeriod,
+    BaseInterestRateVersion
+)
 
 
 class BaseInterestRatesNotFoundError(Exception):
     pass
 
 
-class BaseInterestRateSchema(BaseModel):
-    id: int
+class CreateBaseInterestRateSchema(BaseModel):
     currency: str
     date: date
     interest_rate: Decimal
 
 
+class BaseInterestRateSchema(CreateBaseInterestRateSchema):
+    id: int
+
+
+class BaseInterestRateFiltersSchema(BaseModel):
+    currency: Optional[str] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+
+
+class BaseInterestRatePeriodSchema(BaseModel):
+    currency: str
+    valid_from: date
+    valid_to: date
+    interest_rate: Decimal
+
+
+class BaseInterestRateChangeSchema(BaseModel):
+    id: int
+    currency: str
+    version: int
+    date_from: date
+    date_to: date
+    recomputed_up_to_loan_id: Optional[int] = None
+
+
 class BaseInterestRateRepository:
+    # Base interest rates are stored as BaseInterestRatePeriod runs, the daily rates read and written through
+    # this repository are expanded from or merged into them.
 
     def __init__(self, session):
         self.session = session
 
     def get(self, start_date: date, end_date: date, currency: str) -> List[BaseInterestRateSchema]:
-        interest_rates = self.session.query(
-            BaseInterestRate
-        ).filter(
-            BaseInterestRate.currency == currency
-        ).filter(
-            BaseInterestRate.date >= start_date
-        ).filter(
-            BaseInterestRate.date <= end_date
-        ).all()
+        interest_rates = list(self._daily_rates(
+            self._query_periods(currency, start_date=start_date, end_date=end_date), start_date, end_date
+        ))
         if not interest_rates:
             raise BaseInterestRatesNotFoundError(
                 f"Couldn't find base interest rates for parameters: "
                 f"'currency'={currency}, 'start_date'={start_date}, 'end_date'={end_date}"
             )
+        return interest_rates
+
+    def get_index(self, currency: str) -> BaseInterestRateIndex:
+        # one row read per constant rate run
+        periods = self.get_periods(currency)
+        if not periods:
+            raise BaseInterestRatesNotFoundError(f"Couldn't find base interest rates for 'currency'={currency}")
+        return BaseInterestRateIndex.from_periods(currency=currency, periods=periods)
+
+    def get_periods(
+            self, currency: str, start_date: Optional[date] = None, end_date: Optional[date] = None
+    ) -> List[BaseInterestRatePeriodSchema]:
+        # the periods overlapping the given dates, ordered by valid_from
         return [
-            BaseInterestRateSchema(
-                id=rate.interest_rate,
-                currency=rate.currency,
-                date=rate.date,
-                interest_rate=Decimal(rate.interest_rate),
-            ) for rate in interest_rates
+            BaseInterestRatePeriodSchema(
+                currency=currency, valid_from=period.valid_from, valid_to=period.valid_to,
+                interest_rate=Decimal(period.interest_rate)
+            ) for period in self._query_periods(currency, start_date=start_date, end_date=end_date)
         ]
 
-    def add(self):
-        raise NotImplementedError
+    def _query_periods(self, currency: Optional[str], start_date: Optional[date], end_date: Optional[date]):
+        query = self.session.query(BaseInterestRatePeriod)
+        if currency is not None:
+            query = query.filter(BaseInterestRatePeriod.currency == currency)
+        if start_date is not None:
+            query = query.filter(BaseInterestRatePeriod.valid_to >= start_date)
+        if end_date is not None:
+            query = query.filter(BaseInterestRatePeriod.valid_from <= end_date)
+        return query.order_by(BaseInterestRatePeriod.currency, BaseInterestRatePeriod.valid_from)
+
+    @staticmethod
+    def _daily_rates(
+            periods: Iterable[BaseInterestRatePeriod], date_from: Optional[date] = None, date_to: Optional[date] = None
+    ) -> Iterator[BaseInterestRateSchema]:
+        # every day of the periods cut to the given dates, the id is the one of the period the day belongs to
+        for period in periods:
+            first_date = max(period.valid_from, date_from) if date_from is not None else period.valid_from
+            last_date = min(period.valid_to, date_to) if date_to is not None else period.valid_to
+            for i in range((last_date - first_date).days + 1):
+                yield BaseInterestRateSchema(
+                    id=period.id, currency=period.currency, date=first_date + timedelta(days=i),
+                    interest_rate=Decimal(period.interest_rate)
+                )
+
+    def _write_periods(self, currency: str, changes: List[RatePeriod]):
+        # changes ordered by valid_from and not overlapping, a change without a rate deletes its days. The
+        # periods the changes overlap or touch are read, merged with them and written back, one statement each.
+        date_from, date_to = changes[0].valid_from, changes[-1].valid_to
+        existing = self.session.query(
+            BaseInterestRatePeriod.valid_from, BaseInterestRatePeriod.valid_to, BaseInterestRatePeriod.interest_rate
+        ).filter(
+            BaseInterestRatePeriod.currency == currency,
+            BaseInterestRatePeriod.valid_to >= date_from - timedelta(days=1),
+            BaseInterestRatePeriod.valid_from <= date_to + timedelta(days=1)
+        ).order_by(
+            BaseInterestRatePeriod.valid_from
+        ).with_for_update().all()
+        periods = overlay_periods(
+            [RatePeriod(valid_from, valid_to, Decimal(rate)) for valid_from, valid_to, rate in existing], changes
+        )
+        if existing:
+            self.session.execute(
+                delete(BaseInterestRatePeriod).where(
+                    BaseInterestRatePeriod.currency == currency,
+                    BaseInterestRatePeriod.valid_from >= existing[0].valid_from,
+                    BaseInterestRatePeriod.valid_from <= existing[-1].valid_from
+                )
+            )
+        if periods:
+            self.session.execute(BaseInterestRatePeriod.__table__.insert(), [
+                {
+                    "currency": currency, "valid_from": period.valid_from, "valid_to": period.valid_to,
+                    "interest_rate": period.interest_rate
+                } for period in periods
+            ])
+
+    def list_currencies(self) -> List[str]:
+        return [currency for currency, in self.session.query(BaseInterestRatePeriod.currency).distinct().all()]
+
+    def get_version(self, currency: str) -> int:
+        version = self.session.query(
+            BaseInterestRateVersion.version
+        ).filter(
+            BaseInterestRateVersion.currency == currency
+        ).scalar()
+        return version or 0
+
+    def bump_versions(self, currencies: Iterable[str]):
+        # one INSERT ... ON CONFLICT on the currency key, two writers bumping a currency without a version yet
+        # can't both insert it
+        currencies = sorted(set(currencies))
+        if not currencies:
+            return
+        dialect_insert = postgresql.insert if self.session.connection().dialect.name == "postgresql" else sqlite.insert
+        versions_table = BaseInterestRateVersion.__table__
+        statement = dialect_insert(versions_table).values([
+            {"currency": currency, "version": 1} for currency in currencies
+        ])
+        self.session.execute(statement.on_conflict_do_update(
+            index_elements=[versions_table.c.currency], set_={"version": versions_table.c.version + 1}
+        ))
+
+    def record_changes(self, changed_ranges: Dict[str, Tuple[date, date]]) -> Dict[str, int]:
+        # bumps the version of every changed currency and keeps the changed date range under the new version,
+        # returns the new versions
+        self.bump_versions(changed_ranges)
+        self.session.flush()
+        versions = {}
+        for currency, (date_from, date_to) in changed_ranges.items():
+            versions[currency] = self.get_version(currency)
+            self.session.add(
+                BaseInterestRateChange(
+                    currency=currency, version=versions[currency], date_from=date_from, date_to=date_to
+                )
+            )
+        return versions
+
+    def get_changes(self, currency: str, after_version: int) -> List[BaseInterestRateChangeSchema]:
+        return [
+            self._change_schema(change) for change in self.session.query(
+                BaseInterestRateChange
+            ).filter(
+                BaseInterestRateChange.currency == currency,
+                BaseInterestRateChange.version > after_version
+            ).order_by(
+                BaseInterestRateChange.version
+            )
+        ]
+
+    def get_unrecomputed_changes(self) -> List[BaseInterestRateChangeSchema]:
+        # changes whose affected loans haven't all been recomputed yet, oldest version of a currency first
+        return [
+            self._change_schema(change) for change in self.session.query(
+                BaseInterestRateChange
+            ).filter(
+                BaseInterestRateChange.loans_recomputed_on.is_(None)
+            ).order_by(
+                BaseInterestRateChange.currency, BaseInterestRateChange.version
+            )
+        ]
+
+    def checkpoint_recomputation(self, change_id: int, recomputed_up_to_loan_id: Optional[int], done: bool):
+        self.session.query(
+            BaseInterestRateChange
+        ).filter(
+            BaseInterestRateChange.id == change_id
+        ).update({
+            BaseInterestRateChange.recomputed_up_to_loan_id: recomputed_up_to_loan_id,
+            BaseInterestRateChange.loans_recomputed_on: datetime.utcnow() if done else None
+        }, synchronize_session=False)
+
+    @staticmethod
+    def _change_schema(change: BaseInterestRateChange) -> BaseInterestRateChangeSchema:
+        return BaseInterestRateChangeSchema(
+            id=change.id, currency=change.currency, version=change.version,
+            date_from=change.date_from, date_to=change.date_to,
+            recomputed_up_to_loan_id=change.recomputed_up_to_loan_id
+        )
+
+    def upsert(self, rates: Iterable[CreateBaseInterestRateSchema]) -> Dict[str, Tuple[date, date]]:
+        # the daily rates of every currency are merged into runs and written over its periods, a day given twice
+        # keeps its last rate. Returns the changed date range of every currency for record_changes.
+        rates_by_currency = {}
+        for rate in rates:
+            rates_by_currency.setdefault(rate.currency, {})[rate.date] = rate.interest_rate
+        changed_ranges = {}
+        for currency, rates_by_date in rates_by_currency.items():
+            changes = periods_from_rates(rates_by_date.items())
+            self._write_periods(currency, changes)
+            changed_ranges[currency] = changes[0].valid_from, changes[-1].valid_to
+        return changed_ranges
 
-    def delete(self):
-        raise NotImplementedError
+    def list(
+            self, filters: BaseInterestRateFiltersSchema = BaseInterestRateFiltersSchema(),
+            after: Optional[Tuple[str, date]] = None, limit: Optional[int] = None
+    ) -> List[BaseInterestRateSchema]:
+        # keyset pagination on (currency, date) over the periods in (currency, valid_from) order, every period
+        # read has at least one day on the page
+        query = self._query_periods(filters.currency, start_date=filters.date_from, end_date=filters.date_to)
+        if after is not None:
+            after_currency, after_date = after
+            query = query.filter(or_(
+                BaseInterestRatePeriod.currency > after_currency,
+                and_(BaseInterestRatePeriod.currency == after_currency, BaseInterestRatePeriod.valid_to > after_date)
+            ))
+        if limit is not None:
+            query = query.limit(limit)
+        rates = (
+            rate for period in query for rate in self._daily_rates([period], filters.date_from, filters.date_to)
+            if after is None or (rate.currency, rate.date) > after
+        )
+        return list(islice(rates, limit))
 
-    def list(self):
-        raise NotImplementedError
+    def count(self, filters: BaseInterestRateFiltersSchema = BaseInterestRateFiltersSchema()) -> int:
+        count = 0
+        for period in self._query_periods(filters.currency, start_date=filters.date_from, end_date=filters.date_to):
+            first_date = max(period.valid_from, filters.date_from) if filters.date_from else period.valid_from
+            last_date = min(period.valid_to, filters.date_to) if filters.date_to else period.valid_to
+            count += (last_date - first_date).days + 1
+        return count
 
-    def update(self):
-        raise NotImplementedError
+    def delete(self, currency: str, date_from: date, date_to: date) -> int:
+        # returns the number of days that had a rate
+        deleted = self.count(BaseInterestRateFiltersSchema(currency=currency, date_from=date_from, date_to=date_to))
+        if deleted:
+            self._write_periods(currency, [RatePeriod(date_from, date_to, None)])
+        return deleted
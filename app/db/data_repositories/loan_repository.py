@@ -1,17 +1,52 @@
+import os
 from decimal import Decimal
-from typing import List
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Union
+)
 from datetime import (
     date,
     datetime
 )
 
-from sqlalchemy import delete
+from sqlalchemy import (
+    bindparam,
+    delete,
+    func,
+    insert,
+    or_
+)
+from sqlalchemy.orm import undefer
 from pydantic import BaseModel
 
+from calculator.loan import calculate_daily_margin_from_annual
 from db.schema import (
     Loan,
     DailyLoanCalculationResult
 )
+from db.packed_schedule import (
+    fits_packed_schedule,
+    pack_schedule,
+    patch_schedule,
+    PackedSchedule,
+    PackedScheduleOverflowError
+)
+
+
+# write daily calculation results with one executemany statement instead of one ORM object per day
+LOAN_REPOSITORY_BULK_WRITE = os.environ.get("LOAN_REPOSITORY_BULK_WRITE", "true").lower() == "true"
+
+# "rows" persists one DailyLoanCalculationResult per day, "packed" persists the whole schedule as one blob on
+# the loan (see db.packed_schedule), "computed" persists only the loan and its base interest rate version
+# and leaves regenerating the schedule on read to the caller
+ROWS_SCHEDULE_STORAGE = "rows"
+PACKED_SCHEDULE_STORAGE = "packed"
+COMPUTED_SCHEDULE_STORAGE = "computed"
+SCHEDULE_STORAGES = [ROWS_SCHEDULE_STORAGE, PACKED_SCHEDULE_STORAGE, COMPUTED_SCHEDULE_STORAGE]
+LOAN_SCHEDULE_STORAGE = os.environ.get("LOAN_SCHEDULE_STORAGE", ROWS_SCHEDULE_STORAGE)
 
 
 class LoanNotFoundError(Exception):
@@ -44,60 +79,137 @@ class ListedLoanSchema(LoanParametersSchema):
 
 class CreateLoanSchema(LoanParametersSchema):
     total_interest: Decimal
+    base_interest_rate_version: Optional[int] = None
     calculation_results: List[CreateDailyLoanCalculationResultSchema]
 
 
 class LoanSchema(CreateLoanSchema):
     id: int
+    schedule_storage: str
     created_on: datetime
     updated_on: datetime
-    calculation_results: List[DailyLoanCalculationResultSchema]
+    version: Optional[int] = None
+    calculation_results: Union[PackedSchedule, List[DailyLoanCalculationResultSchema]]
+
+    class Config:
+        arbitrary_types_allowed = True
 
 
 UpdateLoanSchema = CreateLoanSchema
 
 
+class LoanFiltersSchema(BaseModel):
+    currency: Optional[str] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    amount_min: Optional[Decimal] = None
+    amount_max: Optional[Decimal] = None
+
+
 class LoanRepository:
 
-    def __init__(self, session):
+    def __init__(
+            self, session,
+            bulk_write: bool = LOAN_REPOSITORY_BULK_WRITE,
+            schedule_storage: str = LOAN_SCHEDULE_STORAGE
+    ):
+        if schedule_storage not in SCHEDULE_STORAGES:
+            raise ValueError(f"'schedule_storage' has to be one of: {SCHEDULE_STORAGES}.")
         self.session = session
+        self.bulk_write = bulk_write
+        self.schedule_storage = schedule_storage
+
+    @property
+    def stores_calculation_results(self) -> bool:
+        return self.schedule_storage != COMPUTED_SCHEDULE_STORAGE
+
+    @property
+    def stores_calculation_rows(self) -> bool:
+        return self.schedule_storage == ROWS_SCHEDULE_STORAGE
+
+    def _schedule_storage_for(self, calculation_results: List) -> str:
+        # a schedule whose daily amounts don't fit the packed fixed point values is stored as rows instead
+        if self.schedule_storage == PACKED_SCHEDULE_STORAGE and not fits_packed_schedule(calculation_results):
+            return ROWS_SCHEDULE_STORAGE
+        return self.schedule_storage
 
     def add(self, create_loan_parameters: CreateLoanSchema) -> Loan:
+        return self.add_many([create_loan_parameters])[0]
+
+    def add_many(self, create_loans_parameters: List[CreateLoanSchema]) -> List[Loan]:
         ts_now = datetime.utcnow()
-        loan = Loan(
-            amount=create_loan_parameters.amount,
-            currency=create_loan_parameters.currency,
-            annual_margin=create_loan_parameters.annual_margin,
-            start_date=create_loan_parameters.start_date,
-            end_date=create_loan_parameters.end_date,
-            total_interest=create_loan_parameters.total_interest,
-            created_on=ts_now,
-            updated_on=ts_now,
-            daily_loan_calculation_results=[
-                DailyLoanCalculationResult(
-                    date=result.date,
-                    interest_accrual_amount=result.interest_accrual_amount,
-                    interest_accrual_amount_without_margin=result.interest_accrual_amount_without_margin,
-                    days_elapsed_since_loan_start_date=result.days_elapsed_since_loan_start_date)
+        schedule_storages = [
+            self._schedule_storage_for(create_loan_parameters.calculation_results)
+            for create_loan_parameters in create_loans_parameters
+        ]
+        loans = [
+            Loan(
+                amount=create_loan_parameters.amount,
+                currency=create_loan_parameters.currency,
+                annual_margin=create_loan_parameters.annual_margin,
+                start_date=create_loan_parameters.start_date,
+                end_date=create_loan_parameters.end_date,
+                total_interest=create_loan_parameters.total_interest,
+                base_interest_rate_version=create_loan_parameters.base_interest_rate_version,
+                schedule_storage=schedule_storage,
+                created_on=ts_now,
+                updated_on=ts_now,
+                packed_schedule=pack_schedule(
+                    start_date=create_loan_parameters.start_date,
+                    calculation_results=create_loan_parameters.calculation_results
+                ) if schedule_storage == PACKED_SCHEDULE_STORAGE else None,
+                daily_loan_calculation_results=[] if (
+                    self.bulk_write or schedule_storage != ROWS_SCHEDULE_STORAGE
+                ) else [
+                    DailyLoanCalculationResult(
+                        date=result.date,
+                        interest_accrual_amount=result.interest_accrual_amount,
+                        interest_accrual_amount_without_margin=result.interest_accrual_amount_without_margin,
+                        days_elapsed_since_loan_start_date=result.days_elapsed_since_loan_start_date)
+                    for result in create_loan_parameters.calculation_results
+                ]
+            ) for create_loan_parameters, schedule_storage in zip(create_loans_parameters, schedule_storages)
+        ]
+        self.session.add_all(loans)
+        if self.bulk_write and ROWS_SCHEDULE_STORAGE in schedule_storages:
+            # flushing the loans alone gives us their ids for the foreign key of the daily rows,
+            # then the daily rows of every loan go in with a single executemany
+            self.session.flush()
+            self._bulk_insert_calculation_results([
+                self._calculation_result_row(loan_id=loan.id, result=result)
+                for loan, create_loan_parameters in zip(loans, create_loans_parameters)
+                if loan.schedule_storage == ROWS_SCHEDULE_STORAGE
                 for result in create_loan_parameters.calculation_results
-            ]
-        )
-        self.session.add(loan)
-        return loan
+            ])
+        return loans
+
+    def _bulk_insert_calculation_results(self, rows: List[Dict]):
+        if not rows:
+            return
+        self.session.execute(insert(DailyLoanCalculationResult.__table__), rows)
+
+    @staticmethod
+    def _calculation_result_row(loan_id: int, result: CreateDailyLoanCalculationResultSchema) -> Dict:
+        return {
+            "loan_id": loan_id,
+            "date": result.date,
+            "interest_accrual_amount": result.interest_accrual_amount,
+            "interest_accrual_amount_without_margin": result.interest_accrual_amount_without_margin,
+            "days_elapsed_since_loan_start_date": result.days_elapsed_since_loan_start_date
+        }
 
-    def get(self, id: int) -> LoanSchema:
-        loan_record = self.session.query(Loan).filter(Loan.id == id).first()
+    def get(self, id: int, with_calculation_results: bool = True) -> LoanSchema:
+        query = self.session.query(Loan).filter(Loan.id == id)
+        if with_calculation_results:
+            query = query.options(undefer(Loan.packed_schedule))
+        loan_record = query.first()
         if not loan_record:
             raise LoanNotFoundError(f"Loan with id={id} is not found.")
-        return LoanSchema(
-            id=loan_record.id,
-            amount=loan_record.amount,
-            currency=loan_record.currency,
-            total_interest=loan_record.total_interest,
-            annual_margin=loan_record.annual_margin,
-            start_date=loan_record.start_date,
-            end_date=loan_record.end_date,
-            calculation_results=[
+        calculation_results = []
+        if with_calculation_results and loan_record.schedule_storage == PACKED_SCHEDULE_STORAGE:
+            calculation_results = PackedSchedule(loan_record.packed_schedule)
+        elif with_calculation_results and loan_record.schedule_storage != COMPUTED_SCHEDULE_STORAGE:
+            calculation_results = [
                 DailyLoanCalculationResultSchema(
                     id=result.id,
                     date=result.date,
@@ -106,14 +218,105 @@ class LoanRepository:
                     days_elapsed_since_loan_start_date=result.days_elapsed_since_loan_start_date
 
                 ) for result in loan_record.daily_loan_calculation_results
-            ],
+            ]
+        return LoanSchema(
+            id=loan_record.id,
+            amount=loan_record.amount,
+            currency=loan_record.currency,
+            total_interest=loan_record.total_interest,
+            annual_margin=loan_record.annual_margin,
+            start_date=loan_record.start_date,
+            end_date=loan_record.end_date,
+            base_interest_rate_version=loan_record.base_interest_rate_version,
+            schedule_storage=loan_record.schedule_storage or ROWS_SCHEDULE_STORAGE,
+            calculation_results=calculation_results,
             created_on=loan_record.created_on,
-            updated_on=loan_record.updated_on
+            updated_on=loan_record.updated_on,
+            version=loan_record.version
         )
 
-    def list(self) -> List[ListedLoanSchema]:
+    def iter_calculation_results(self, loan_id: int, chunk_size: int = 1000) -> Iterator:
+        packed_schedule = self.session.query(Loan.packed_schedule).filter(Loan.id == loan_id).scalar()
+        if packed_schedule is not None:
+            return iter(PackedSchedule(packed_schedule))
+        # rows are fetched chunk_size at a time through a server-side cursor where the driver supports one
+        return iter(self.session.query(
+            DailyLoanCalculationResult.date,
+            DailyLoanCalculationResult.interest_accrual_amount,
+            DailyLoanCalculationResult.interest_accrual_amount_without_margin,
+            DailyLoanCalculationResult.days_elapsed_since_loan_start_date
+        ).filter(
+            DailyLoanCalculationResult.loan_id == loan_id
+        ).order_by(
+            DailyLoanCalculationResult.days_elapsed_since_loan_start_date
+        ).execution_options(
+            stream_results=True
+        ).yield_per(chunk_size))
+
+    def list(
+            self, after_id: Optional[int] = None, limit: Optional[int] = None,
+            filters: LoanFiltersSchema = LoanFiltersSchema()
+    ) -> List[ListedLoanSchema]:
+        query = self._filter(
+            self.session.query(
+                Loan.id, Loan.amount, Loan.currency, Loan.total_interest,
+                Loan.annual_margin, Loan.start_date, Loan.end_date
+            ),
+            filters=filters
+        )
+        if after_id is not None:
+            query = query.filter(Loan.id > after_id)
+        query = query.order_by(Loan.id)
+        if limit is not None:
+            query = query.limit(limit)
         return [
             ListedLoanSchema(
+                id=loan_record.id,
+                amount=loan_record.amount,
+                currency=loan_record.currency,
+                total_interest=loan_record.total_interest,
+                annual_margin=loan_record.annual_margin,
+                start_date=loan_record.start_date,
+                end_date=loan_record.end_date
+            ) for loan_record in query
+        ]
+
+    def count(self, filters: LoanFiltersSchema = LoanFiltersSchema()) -> int:
+        return self._filter(self.session.query(func.count(Loan.id)), filters=filters).scalar()
+
+    @staticmethod
+    def _filter(query, filters: LoanFiltersSchema):
+        if filters.currency is not None:
+            query = query.filter(Loan.currency == filters.currency)
+        if filters.date_from is not None:
+            query = query.filter(Loan.end_date >= filters.date_from)
+        if filters.date_to is not None:
+            query = query.filter(Loan.start_date <= filters.date_to)
+        if filters.amount_min is not None:
+            query = query.filter(Loan.amount >= filters.amount_min)
+        if filters.amount_max is not None:
+            query = query.filter(Loan.amount <= filters.amount_max)
+        return query
+
+    def list_affected(
+            self, currency: str, date_from: date, date_to: date, before_version: int,
+            after_id: Optional[int] = None, limit: Optional[int] = None
+    ) -> List[LoanSchema]:
+        # loans of the currency running on any day of [date_from, date_to] and calculated with rates older than
+        # before_version, an interval query on currency_start_date_end_date_index
+        query = self.session.query(Loan).filter(
+            Loan.currency == currency,
+            Loan.start_date <= date_to,
+            Loan.end_date >= date_from,
+            or_(Loan.base_interest_rate_version.is_(None), Loan.base_interest_rate_version < before_version)
+        )
+        if after_id is not None:
+            query = query.filter(Loan.id > after_id)
+        query = query.order_by(Loan.id)
+        if limit is not None:
+            query = query.limit(limit)
+        return [
+            LoanSchema(
                 id=loan_record.id,
                 amount=loan_record.amount,
                 currency=loan_record.currency,
@@ -121,11 +324,82 @@ class LoanRepository:
                 annual_margin=loan_record.annual_margin,
                 start_date=loan_record.start_date,
                 end_date=loan_record.end_date,
+                base_interest_rate_version=loan_record.base_interest_rate_version,
+                schedule_storage=loan_record.schedule_storage or ROWS_SCHEDULE_STORAGE,
+                calculation_results=[],
                 created_on=loan_record.created_on,
-                updated_on=loan_record.updated_on
-            ) for loan_record in self.session.query(Loan).all()
+                updated_on=loan_record.updated_on,
+                version=loan_record.version
+            ) for loan_record in query
         ]
 
+    def recompute_days(
+            self, loan: LoanSchema, total_interest: Decimal, base_interest_rate_version: int,
+            calculation_results: List[CreateDailyLoanCalculationResultSchema]
+    ) -> bool:
+        # rewrites the stored days of calculation_results and the totals of a loan after a base interest rate
+        # change, in whatever storage the loan was saved with. Returns False without writing anything when the
+        # loan has been updated or deleted since it was read, its new version was calculated with current rates.
+        # Neither its version nor updated_on change, the loan's parameters are the same, updated_on is set to
+        # itself to keep its onupdate out of the statement.
+        updated = self.session.query(Loan).filter(
+            Loan.id == loan.id, Loan.version.is_(None) if loan.version is None else Loan.version == loan.version
+        ).update({
+            Loan.total_interest: total_interest,
+            Loan.base_interest_rate_version: base_interest_rate_version,
+            Loan.updated_on: Loan.updated_on
+        }, synchronize_session=False)
+        if not updated or not calculation_results:
+            return bool(updated)
+        if loan.schedule_storage == PACKED_SCHEDULE_STORAGE:
+            packed_schedule = self.session.query(Loan.packed_schedule).filter(Loan.id == loan.id).scalar()
+            try:
+                self.session.query(Loan).filter(Loan.id == loan.id).update({
+                    Loan.packed_schedule: patch_schedule(packed_schedule, calculation_results=calculation_results)
+                }, synchronize_session=False)
+            except PackedScheduleOverflowError:
+                self._unpack_to_rows(
+                    loan_id=loan.id, packed_schedule=packed_schedule, calculation_results=calculation_results
+                )
+        elif loan.schedule_storage == ROWS_SCHEDULE_STORAGE:
+            # rows are updated in place with one executemany, the rows of a loan are read back in insertion order
+            results_table = DailyLoanCalculationResult.__table__
+            self.session.execute(
+                results_table.update().where(
+                    results_table.c.loan_id == bindparam("result_loan_id"),
+                    results_table.c.date == bindparam("result_date")
+                ).values(
+                    interest_accrual_amount=bindparam("result_interest_accrual_amount"),
+                    interest_accrual_amount_without_margin=bindparam("result_interest_accrual_amount_without_margin")
+                ),
+                [
+                    {
+                        "result_loan_id": loan.id,
+                        "result_date": result.date,
+                        "result_interest_accrual_amount": result.interest_accrual_amount,
+                        "result_interest_accrual_amount_without_margin": result.interest_accrual_amount_without_margin
+                    } for result in calculation_results
+                ]
+            )
+        return True
+
+    def _unpack_to_rows(
+            self, loan_id: int, packed_schedule,
+            calculation_results: List[CreateDailyLoanCalculationResultSchema]
+    ):
+        # the recomputed days no longer fit the packed layout: the loan moves to rows, the recomputed days
+        # replacing the packed ones
+        results_by_days_elapsed = {result.days_elapsed_since_loan_start_date: result for result in calculation_results}
+        self._bulk_insert_calculation_results([
+            self._calculation_result_row(
+                loan_id=loan_id, result=results_by_days_elapsed.get(result.days_elapsed_since_loan_start_date, result)
+            ) for result in PackedSchedule(packed_schedule)
+        ])
+        self.session.query(Loan).filter(Loan.id == loan_id).update({
+            Loan.schedule_storage: ROWS_SCHEDULE_STORAGE,
+            Loan.packed_schedule: None
+        }, synchronize_session=False)
+
     def delete(self, id: int):
         loan = self.session.query(Loan).filter(Loan.id == id).first()
         if not loan:
@@ -140,19 +414,118 @@ class LoanRepository:
             raise LoanNotFoundError(f"Loan with id={id} is not found so can't be updated.")
         delete_results_statement = delete(DailyLoanCalculationResult).where(DailyLoanCalculationResult.loan_id == id)
         self.session.execute(delete_results_statement)
+        schedule_storage = self._schedule_storage_for(update_loan_parameters.calculation_results)
+        self._insert_calculation_results(
+            loan_id=id, calculation_results=update_loan_parameters.calculation_results,
+            schedule_storage=schedule_storage
+        )
+        self._set_loan_parameters(
+            loan=loan, update_loan_parameters=update_loan_parameters, schedule_storage=schedule_storage
+        )
 
-        for result in update_loan_parameters.calculation_results:
-            self.session.add(
-                DailyLoanCalculationResult(
-                    date=result.date,
-                    loan_id=id,
-                    interest_accrual_amount=result.interest_accrual_amount,
-                    interest_accrual_amount_without_margin=result.interest_accrual_amount_without_margin,
-                    days_elapsed_since_loan_start_date=result.days_elapsed_since_loan_start_date
+    def can_update_incrementally(self, loan: LoanSchema, update_loan_parameters: UpdateLoanSchema) -> bool:
+        # stored rows can be patched as long as every existing day keeps its base rate, that is the loan keeps
+        # its currency and start date and the rates haven't changed since the rows were calculated
+        # a packed schedule is rewritten as a whole anyway, so it is always recalculated in full
+        return (
+            self.stores_calculation_rows
+            and loan.schedule_storage == self.schedule_storage
+            and loan.currency == update_loan_parameters.currency
+            and loan.start_date == update_loan_parameters.start_date
+            and loan.base_interest_rate_version is not None
+            and loan.base_interest_rate_version == update_loan_parameters.base_interest_rate_version
+        )
+
+    def update_incrementally(self, loan: LoanSchema, update_loan_parameters: UpdateLoanSchema):
+        # loan is the loan before the update, see can_update_incrementally, and the calculation_results of
+        # update_loan_parameters only hold the days after loan.end_date when the loan got longer
+        loan_record = self.session.query(Loan).filter(Loan.id == loan.id).first()
+        if not loan_record:
+            raise LoanNotFoundError(f"Loan with id={loan.id} is not found so can't be updated.")
+        if update_loan_parameters.end_date < loan.end_date:
+            self.session.execute(
+                delete(DailyLoanCalculationResult).where(
+                    DailyLoanCalculationResult.loan_id == loan.id,
+                    DailyLoanCalculationResult.date > update_loan_parameters.end_date
                 )
             )
+        if loan.amount != update_loan_parameters.amount or loan.annual_margin != update_loan_parameters.annual_margin:
+            # interest is linear in the amount and the margin: the part without margin scales with the amount
+            # and the margin part only depends on the year, so one UPDATE per year rewrites the kept days
+            amount_ratio = update_loan_parameters.amount / loan.amount
+            last_kept_date = min(loan.end_date, update_loan_parameters.end_date)
+            results_table = DailyLoanCalculationResult.__table__
+            for year in range(loan.start_date.year, last_kept_date.year + 1):
+                daily_margin = calculate_daily_margin_from_annual(
+                    year=year, annual_margin=update_loan_parameters.annual_margin
+                )
+                self.session.execute(
+                    results_table.update().where(
+                        results_table.c.loan_id == loan.id,
+                        results_table.c.date >= date(year, 1, 1),
+                        results_table.c.date <= date(year, 12, 31)
+                    ).values(
+                        interest_accrual_amount_without_margin=(
+                            results_table.c.interest_accrual_amount_without_margin * amount_ratio
+                        ),
+                        interest_accrual_amount=(
+                            results_table.c.interest_accrual_amount_without_margin * amount_ratio
+                            + update_loan_parameters.amount * daily_margin
+                        )
+                    )
+                )
+        self._insert_calculation_results(
+            loan_id=loan.id, calculation_results=update_loan_parameters.calculation_results,
+            schedule_storage=self.schedule_storage
+        )
+        self._set_loan_parameters(
+            loan=loan_record, update_loan_parameters=update_loan_parameters, schedule_storage=self.schedule_storage
+        )
+
+    def pack_calculation_results(self, id: int) -> int:
+        # moves a "rows" storage loan to the packed layout, returns the number of days packed, none when its
+        # daily amounts don't fit the packed values and it stays as rows
+        loan = self.session.query(Loan).filter(Loan.id == id).first()
+        if not loan:
+            raise LoanNotFoundError(f"Loan with id={id} is not found so can't be packed.")
+        calculation_results = list(self.iter_calculation_results(loan_id=id))
+        if not fits_packed_schedule(calculation_results):
+            return 0
+        loan.packed_schedule = pack_schedule(start_date=loan.start_date, calculation_results=calculation_results)
+        loan.schedule_storage = PACKED_SCHEDULE_STORAGE
+        loan.version = func.coalesce(Loan.version, 0) + 1
+        self.session.execute(delete(DailyLoanCalculationResult).where(DailyLoanCalculationResult.loan_id == id))
+        return len(calculation_results)
+
+    def _insert_calculation_results(
+            self, loan_id: int, calculation_results: List[CreateDailyLoanCalculationResultSchema],
+            schedule_storage: str
+    ):
+        if schedule_storage == ROWS_SCHEDULE_STORAGE and self.bulk_write:
+            self._bulk_insert_calculation_results([
+                self._calculation_result_row(loan_id=loan_id, result=result) for result in calculation_results
+            ])
+        elif schedule_storage == ROWS_SCHEDULE_STORAGE:
+            for result in calculation_results:
+                self.session.add(
+                    DailyLoanCalculationResult(
+                        date=result.date,
+                        loan_id=loan_id,
+                        interest_accrual_amount=result.interest_accrual_amount,
+                        interest_accrual_amount_without_margin=result.interest_accrual_amount_without_margin,
+                        days_elapsed_since_loan_start_date=result.days_elapsed_since_loan_start_date
+                    )
+                )
+
+    def _set_loan_parameters(self, loan: Loan, update_loan_parameters: UpdateLoanSchema, schedule_storage: str):
         for field, value in update_loan_parameters.dict().items():
             if field == "calculation_results":
                 continue
             setattr(loan, field, value)
+        loan.schedule_storage = schedule_storage
+        loan.packed_schedule = pack_schedule(
+            start_date=update_loan_parameters.start_date,
+            calculation_results=update_loan_parameters.calculation_results
+        ) if schedule_storage == PACKED_SCHEDULE_STORAGE else None
         loan.updated_on = datetime.utcnow()
+        loan.version = func.coalesce(Loan.version, 0) + 1
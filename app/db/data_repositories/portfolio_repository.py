@@ -0,0 +1,205 @@
+from datetime import (
+    date,
+    timedelta
+)
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Optional
+)
+
+import numpy as np
+from sqlalchemy import (
+    func,
+    or_
+)
+from pydantic import BaseModel
+
+from calculator.rate_index import BaseInterestRateIndex
+from calculator.vectorized_loan import (
+    build_date_axis,
+    build_days_in_year_array
+)
+from db.schema import (
+    Loan,
+    DailyLoanCalculationResult
+)
+from db.packed_schedule import PackedSchedule
+from db.data_repositories.loan_repository import (
+    ROWS_SCHEDULE_STORAGE,
+    PACKED_SCHEDULE_STORAGE,
+    COMPUTED_SCHEDULE_STORAGE
+)
+
+DAY_PERIOD = "day"
+MONTH_PERIOD = "month"
+PORTFOLIO_PERIODS = [DAY_PERIOD, MONTH_PERIOD]
+
+
+class PortfolioInterestPeriodSchema(BaseModel):
+    period_start: date
+    interest: float
+    interest_without_margin: float
+
+
+class PortfolioInterestSchema(BaseModel):
+    currency: str
+    # loans accruing on at least one day of the range
+    loans: int
+    total_interest: float
+    total_interest_without_margin: float
+    series: List[PortfolioInterestPeriodSchema]
+
+
+class PortfolioRepository:
+    # Interest accrued across all loans, per currency and day over a date range. Only columns are selected,
+    # never Loan or DailyLoanCalculationResult objects: "rows" storage loans are summed by the database,
+    # packed schedules are sliced and added as arrays and "computed" loans are accrued in closed form from
+    # the base interest rates, the sum of their amounts active on each day being all the day needs.
+
+    def __init__(self, session):
+        self.session = session
+
+    def interest(
+            self, date_from: date, date_to: date, period: str = DAY_PERIOD, currency: Optional[str] = None,
+            get_base_interest_rate_index: Optional[Callable[[str], BaseInterestRateIndex]] = None
+    ) -> List[PortfolioInterestSchema]:
+        if period not in PORTFOLIO_PERIODS:
+            raise ValueError(f"'period' has to be one of: {PORTFOLIO_PERIODS}.")
+        days = (date_to - date_from).days + 1
+        # per currency, the interest and the interest without margin of every day of the range
+        accruals: Dict[str, np.ndarray] = {}
+
+        def accrual(loan_currency: str) -> np.ndarray:
+            if loan_currency not in accruals:
+                accruals[loan_currency] = np.zeros((2, days), dtype=np.float64)
+            return accruals[loan_currency]
+
+        loans = self._count_loans(date_from=date_from, date_to=date_to, currency=currency)
+        self._add_rows(accrual=accrual, date_from=date_from, date_to=date_to, currency=currency)
+        self._add_packed(accrual=accrual, date_from=date_from, date_to=date_to, currency=currency)
+        if get_base_interest_rate_index is not None:
+            self._add_computed(
+                accrual=accrual, date_from=date_from, date_to=date_to, currency=currency,
+                get_base_interest_rate_index=get_base_interest_rate_index
+            )
+
+        date_axis = build_date_axis(start_date=date_from, end_date=date_to)
+        period_starts = np.arange(days)
+        if period == MONTH_PERIOD:
+            months = date_axis.astype("datetime64[M]")
+            period_starts = np.flatnonzero(np.concatenate([[True], months[1:] != months[:-1]]))
+        portfolio = []
+        for loan_currency in sorted(set(loans) | set(accruals)):
+            interest, interest_without_margin = accrual(loan_currency)
+            period_interest = np.add.reduceat(interest, period_starts)
+            period_interest_without_margin = np.add.reduceat(interest_without_margin, period_starts)
+            portfolio.append(PortfolioInterestSchema(
+                currency=loan_currency,
+                loans=loans.get(loan_currency, 0),
+                total_interest=float(interest.sum()),
+                total_interest_without_margin=float(interest_without_margin.sum()),
+                series=[
+                    PortfolioInterestPeriodSchema(
+                        period_start=period_start, interest=period_amount,
+                        interest_without_margin=period_amount_without_margin
+                    ) for period_start, period_amount, period_amount_without_margin in zip(
+                        date_axis[period_starts].tolist(), period_interest.tolist(),
+                        period_interest_without_margin.tolist()
+                    )
+                ]
+            ))
+        return portfolio
+
+    def _overlapping(self, query, date_from: date, date_to: date, currency: Optional[str]):
+        query = query.filter(Loan.start_date <= date_to, Loan.end_date >= date_from)
+        if currency is not None:
+            query = query.filter(Loan.currency == currency)
+        return query
+
+    def _count_loans(self, date_from: date, date_to: date, currency: Optional[str]) -> Dict[str, int]:
+        query = self.session.query(Loan.currency, func.count(Loan.id)).group_by(Loan.currency)
+        return dict(self._overlapping(query, date_from=date_from, date_to=date_to, currency=currency).all())
+
+    def _add_rows(self, accrual: Callable, date_from: date, date_to: date, currency: Optional[str]):
+        # one row per currency and day, however many loans accrue on it
+        query = self.session.query(
+            Loan.currency,
+            DailyLoanCalculationResult.date,
+            func.sum(DailyLoanCalculationResult.interest_accrual_amount),
+            func.sum(DailyLoanCalculationResult.interest_accrual_amount_without_margin)
+        ).join(
+            Loan, Loan.id == DailyLoanCalculationResult.loan_id
+        ).filter(
+            DailyLoanCalculationResult.date >= date_from,
+            DailyLoanCalculationResult.date <= date_to,
+            or_(Loan.schedule_storage.is_(None), Loan.schedule_storage == ROWS_SCHEDULE_STORAGE)
+        ).group_by(
+            Loan.currency, DailyLoanCalculationResult.date
+        )
+        if currency is not None:
+            query = query.filter(Loan.currency == currency)
+        for loan_currency, result_date, interest, interest_without_margin in query:
+            accrual(loan_currency)[:, (result_date - date_from).days] += (
+                float(interest), float(interest_without_margin)
+            )
+
+    def _add_packed(self, accrual: Callable, date_from: date, date_to: date, currency: Optional[str]):
+        query = self.session.query(Loan.currency, Loan.packed_schedule).filter(
+            Loan.schedule_storage == PACKED_SCHEDULE_STORAGE
+        )
+        query = self._overlapping(query, date_from=date_from, date_to=date_to, currency=currency)
+        days = (date_to - date_from).days + 1
+        # schedules are fetched a chunk at a time, only one chunk of blobs is held at once
+        for loan_currency, packed_schedule in query.yield_per(100):
+            schedule = PackedSchedule(packed_schedule)
+            start = (schedule.start_date - date_from).days
+            first, last = max(start, 0), min(start + len(schedule), days)
+            if first >= last:
+                continue
+            scale = 10.0 ** schedule.decimals
+            columns = accrual(loan_currency)
+            columns[0, first:last] += schedule.interest_accrual_amounts[first - start:last - start] / scale
+            columns[1, first:last] += (
+                schedule.interest_accrual_amounts_without_margin[first - start:last - start] / scale
+            )
+
+    def _add_computed(
+            self, accrual: Callable, date_from: date, date_to: date, currency: Optional[str],
+            get_base_interest_rate_index: Callable[[str], BaseInterestRateIndex]
+    ):
+        query = self.session.query(
+            Loan.currency, Loan.amount, Loan.annual_margin, Loan.start_date, Loan.end_date
+        ).filter(
+            Loan.schedule_storage == COMPUTED_SCHEDULE_STORAGE
+        )
+        query = self._overlapping(query, date_from=date_from, date_to=date_to, currency=currency)
+        days = (date_to - date_from).days + 1
+        # per currency, changes of the total amount and of the total amount times annual margin lent out,
+        # on the first day of a loan and on the day after its last
+        amount_changes, margin_changes, ranges = {}, {}, {}
+        for loan_currency, amount, annual_margin, start_date, end_date in query:
+            if loan_currency not in amount_changes:
+                amount_changes[loan_currency] = np.zeros(days + 1, dtype=np.float64)
+                margin_changes[loan_currency] = np.zeros(days + 1, dtype=np.float64)
+            first, last = max((start_date - date_from).days, 0), min((end_date - date_from).days, days - 1)
+            amount_changes[loan_currency][[first, last + 1]] += (float(amount), -float(amount))
+            margin_changes[loan_currency][[first, last + 1]] += (
+                float(amount * annual_margin), -float(amount * annual_margin)
+            )
+            first_day, last_day = ranges.get(loan_currency, (first, last))
+            ranges[loan_currency] = min(first_day, first), max(last_day, last)
+        for loan_currency, (first, last) in ranges.items():
+            base_interest_rates = get_base_interest_rate_index(loan_currency).rates_between(
+                start_date=date_from + timedelta(days=first), end_date=date_from + timedelta(days=last)
+            )
+            amounts = np.cumsum(amount_changes[loan_currency])[first:last + 1]
+            margins = np.cumsum(margin_changes[loan_currency])[first:last + 1]
+            days_in_year = build_days_in_year_array(
+                build_date_axis(start_date=date_from + timedelta(days=first), end_date=date_from + timedelta(days=last))
+            )
+            interest_without_margin = amounts * base_interest_rates
+            columns = accrual(loan_currency)
+            columns[0, first:last + 1] += interest_without_margin + margins / days_in_year
+            columns[1, first:last + 1] += interest_without_margin
@@ -0,0 +1,129 @@
+import os
+import time
+from threading import Lock
+from typing import (
+    Dict,
+    Optional
+)
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import (
+    Engine,
+    make_url
+)
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+
+DB_CONNECTION_STRING = os.environ["DB_CONNECTION_STRING"]
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+# seconds after which a pooled connection is replaced, -1 keeps connections forever
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+# PostgreSQL statement_timeout in milliseconds, 0 disables it
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+
+class PoolMetrics:
+
+    def __init__(self):
+        self.checkouts = 0
+        self.checkout_wait_seconds_total = 0.0
+        self.checkout_wait_seconds_max = 0.0
+        self._lock = Lock()
+
+    def record_checkout(self, wait_seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_wait_seconds_total += wait_seconds
+            self.checkout_wait_seconds_max = max(self.checkout_wait_seconds_max, wait_seconds)
+
+
+class InstrumentedQueuePool(QueuePool):
+    # QueuePool that records how long each checkout waited for a free connection
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.metrics.record_checkout(time.perf_counter() - started)
+
+    def recreate(self):
+        # engine.dispose() swaps the pool for a new one, the metrics carry over
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+_engines: Dict[str, Engine] = {}
+_session_factories: Dict[Engine, sessionmaker] = {}
+_lock = Lock()
+
+
+def create_database_engine(connection_string: str) -> Engine:
+    url = make_url(connection_string)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # every in-memory SQLite connection is a separate database, keep SQLAlchemy's default pool for it
+        return create_engine(connection_string)
+    connect_args = {}
+    if url.get_backend_name() == "sqlite":
+        connect_args["check_same_thread"] = False
+    if url.get_backend_name() == "postgresql" and DB_STATEMENT_TIMEOUT_MS:
+        connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    return create_engine(
+        connection_string,
+        poolclass=InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        pool_recycle=DB_POOL_RECYCLE,
+        connect_args=connect_args
+    )
+
+
+def get_engine(connection_string: str = DB_CONNECTION_STRING) -> Engine:
+    # one engine, and so one connection pool, per connection string and process
+    with _lock:
+        if connection_string not in _engines:
+            _engines[connection_string] = create_database_engine(connection_string)
+        return _engines[connection_string]
+
+
+def dispose_engines():
+    # drops every pooled connection, a forked process must not share the sockets of its parent's pools
+    with _lock:
+        engines = list(_engines.values())
+    for engine in engines:
+        engine.dispose()
+
+
+def get_session_factory(engine: Engine) -> sessionmaker:
+    with _lock:
+        if engine not in _session_factories:
+            _session_factories[engine] = sessionmaker(bind=engine)
+        return _session_factories[engine]
+
+
+def get_pool_stats(engine: Engine) -> Optional[Dict]:
+    pool = engine.pool
+    if not isinstance(pool, InstrumentedQueuePool):
+        return None
+    capacity = pool.size() + max(DB_MAX_OVERFLOW, 0)
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        # share of the pool (including overflow) currently in use, at 1.0 new checkouts have to wait
+        "saturation": pool.checkedout() / capacity if capacity else 0.0,
+        "checkouts": pool.metrics.checkouts,
+        "checkout_wait_seconds_total": pool.metrics.checkout_wait_seconds_total,
+        "checkout_wait_seconds_max": pool.metrics.checkout_wait_seconds_max,
+    }
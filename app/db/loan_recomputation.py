@@ -0,0 +1,198 @@
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import (
+    Callable,
+    List,
+    Optional
+)
+
+from sqlalchemy.orm import sessionmaker
+
+from calculator.batch import (
+    calculate_loans,
+    LoanCalculationRequest
+)
+from calculator.loan import (
+    calculate_loan_totals,
+    BaseInterestRateNotFound
+)
+from calculator.rate_index import BaseInterestRateIndex
+from db.data_repositories.base_interest_rate_repository import (
+    BaseInterestRateChangeSchema,
+    BaseInterestRateRepository,
+    BaseInterestRatesNotFoundError
+)
+from db.data_repositories.loan_repository import (
+    CreateDailyLoanCalculationResultSchema,
+    LoanRepository,
+    LoanSchema,
+    COMPUTED_SCHEDULE_STORAGE
+)
+
+# loans read, recalculated and written per transaction, also how much work a restart can repeat
+LOAN_RECOMPUTATION_BATCH_SIZE = int(os.environ.get("LOAN_RECOMPUTATION_BATCH_SIZE", "500"))
+# processes recalculating the changed days, bounds the CPU taken from the API on a shared host
+LOAN_RECOMPUTATION_WORKERS = int(os.environ.get("LOAN_RECOMPUTATION_WORKERS", "2"))
+# sleep between batches to leave the database to the API while a large change is worked through
+LOAN_RECOMPUTATION_PAUSE_SECONDS = float(os.environ.get("LOAN_RECOMPUTATION_PAUSE_SECONDS", "0"))
+LOAN_RECOMPUTATION_POLL_SECONDS = float(os.environ.get("LOAN_RECOMPUTATION_POLL_SECONDS", "5"))
+
+LoanRecomputationStats = namedtuple("LoanRecomputationStats", [
+    "changes",
+    "loans",
+    "days",
+    # loans updated or deleted through the API while their batch was recalculated
+    "skipped",
+    # loans missing base interest rates for some of their days, they keep their old calculation and their
+    # change stays open so the next run retries them
+    "failed",
+    "seconds"
+])
+
+
+class LoanRecomputation:
+    # Brings the stored totals and schedules of loans up to date with the base interest rate changes recorded in
+    # db.schema.BaseInterestRateChange. For every change the affected loans are read in batches ordered by id,
+    # only the days inside the changed range are recalculated on the worker pool, and each batch is written in
+    # one transaction together with the change's checkpoint, so a restart carries on after the last committed
+    # batch. Loans are stamped with the change's version, which also keeps them out of a rerun. A change is only
+    # marked done once none of its loans is left unstamped, otherwise its checkpoint goes back to the start and
+    # the next run retries just the loans that failed.
+
+    def __init__(
+            self, engine,
+            batch_size: int = LOAN_RECOMPUTATION_BATCH_SIZE,
+            workers: int = LOAN_RECOMPUTATION_WORKERS,
+            pause_seconds: float = LOAN_RECOMPUTATION_PAUSE_SECONDS
+    ):
+        self.session_maker = sessionmaker(bind=engine)
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+
+    def close(self):
+        self.executor.shutdown()
+
+    def run(
+            self, on_progress: Optional[Callable[[BaseInterestRateChangeSchema, LoanRecomputationStats], None]] = None
+    ) -> LoanRecomputationStats:
+        started = time.perf_counter()
+        with self.session_maker() as session:
+            changes = BaseInterestRateRepository(session=session).get_unrecomputed_changes()
+        stats = LoanRecomputationStats(changes=0, loans=0, days=0, skipped=0, failed=0, seconds=0.0)
+        for change in changes:
+            stats = self._recompute_change(change=change, stats=stats, started=started, on_progress=on_progress)
+            stats = stats._replace(changes=stats.changes + 1)
+        return stats._replace(seconds=time.perf_counter() - started)
+
+    def _recompute_change(
+            self, change: BaseInterestRateChangeSchema, stats: LoanRecomputationStats, started: float,
+            on_progress: Optional[Callable]
+    ) -> LoanRecomputationStats:
+        with self.session_maker() as session:
+            try:
+                # read after the change was recorded, so it has the rates of change.version or newer ones,
+                # a newer change overlapping the same days is recomputed after this one anyway
+                base_interest_rate_index = BaseInterestRateRepository(session=session).get_index(change.currency)
+            except BaseInterestRatesNotFoundError:
+                base_interest_rate_index = BaseInterestRateIndex.from_rates(currency=change.currency, rates=[])
+        after_id = change.recomputed_up_to_loan_id
+        while True:
+            with self.session_maker(autocommit=False) as session:
+                loan_repository = LoanRepository(session=session)
+                loans = loan_repository.list_affected(
+                    currency=change.currency, date_from=change.date_from, date_to=change.date_to,
+                    before_version=change.version, after_id=after_id, limit=self.batch_size
+                )
+                if loans:
+                    stats = self._recompute_batch(
+                        loan_repository=loan_repository, loans=loans, change=change,
+                        base_interest_rate_index=base_interest_rate_index, stats=stats
+                    )
+                    after_id = loans[-1].id
+                done = len(loans) < self.batch_size
+                # loans that failed are still unstamped, the change is left open from its first loan
+                retry = done and bool(loan_repository.list_affected(
+                    currency=change.currency, date_from=change.date_from, date_to=change.date_to,
+                    before_version=change.version, limit=1
+                ))
+                BaseInterestRateRepository(session=session).checkpoint_recomputation(
+                    change_id=change.id, recomputed_up_to_loan_id=None if retry else after_id, done=done and not retry
+                )
+                session.commit()
+            if on_progress is not None:
+                on_progress(change, stats._replace(seconds=time.perf_counter() - started))
+            if done:
+                return stats
+            if self.pause_seconds:
+                time.sleep(self.pause_seconds)
+
+    def _recompute_batch(
+            self, loan_repository: LoanRepository, loans: List[LoanSchema], change: BaseInterestRateChangeSchema,
+            base_interest_rate_index: BaseInterestRateIndex, stats: LoanRecomputationStats
+    ) -> LoanRecomputationStats:
+        totals, calculated_loans, calculation_requests = {}, [], []
+        failed = 0
+        for loan in loans:
+            # the loan's days inside the changed range, the only ones whose accruals differ
+            start_date, end_date = max(loan.start_date, change.date_from), min(loan.end_date, change.date_to)
+            try:
+                totals[loan.id] = calculate_loan_totals(
+                    start_date=loan.start_date, end_date=loan.end_date,
+                    loan_amount=loan.amount, annual_margin=loan.annual_margin,
+                    base_interest_rate_index=base_interest_rate_index
+                )
+                if loan.schedule_storage == COMPUTED_SCHEDULE_STORAGE:
+                    continue
+                calculation_requests.append(
+                    LoanCalculationRequest(
+                        start_date=start_date, end_date=end_date,
+                        loan_amount=loan.amount, currency=loan.currency, annual_margin=loan.annual_margin,
+                        base_interest_rate_index=base_interest_rate_index.between(
+                            start_date=start_date, end_date=end_date
+                        ),
+                        with_calculation_results=True
+                    )
+                )
+                calculated_loans.append(loan)
+            except BaseInterestRateNotFound:
+                totals.pop(loan.id, None)
+                failed += 1
+
+        calculation_results = {loan.id: [] for loan in loans}
+        for loan, calculation_request, calculation in zip(
+                calculated_loans, calculation_requests,
+                calculate_loans(calculation_requests, executor=self.executor)
+        ):
+            if isinstance(calculation, Exception):
+                totals.pop(loan.id)
+                failed += 1
+                continue
+            days_elapsed_offset = (calculation_request.start_date - loan.start_date).days
+            calculation_results[loan.id] = [
+                CreateDailyLoanCalculationResultSchema(
+                    date=result.date,
+                    interest_accrual_amount=result.interest_accrual_amount,
+                    interest_accrual_amount_without_margin=result.interest_accrual_amount_without_margin,
+                    days_elapsed_since_loan_start_date=result.days_elapsed_since_loan_start_date + days_elapsed_offset
+                ) for result in calculation.calculation_results
+            ]
+
+        recomputed, days, skipped = 0, 0, 0
+        for loan in loans:
+            if loan.id not in totals:
+                continue
+            if loan_repository.recompute_days(
+                    loan=loan, total_interest=totals[loan.id].total_interest,
+                    base_interest_rate_version=change.version, calculation_results=calculation_results[loan.id]
+            ):
+                recomputed += 1
+                days += len(calculation_results[loan.id])
+            else:
+                skipped += 1
+        return stats._replace(
+            loans=stats.loans + recomputed, days=stats.days + days,
+            skipped=stats.skipped + skipped, failed=stats.failed + failed
+        )
@@ -0,0 +1,143 @@
+import struct
+from datetime import (
+    date,
+    timedelta
+)
+from decimal import Decimal
+from typing import (
+    Iterator,
+    List
+)
+
+import numpy as np
+
+from calculator.loan import LoanDailyCalculationResult
+
+# A loan's daily schedule as one blob: a 16 byte header followed by two little-endian int64 columns,
+# interest_accrual_amount then interest_accrual_amount_without_margin, one value per day from the start date.
+# Values are fixed point with PACKED_SCHEDULE_DECIMALS decimals, which keeps 1e-9 precision on daily amounts
+# of up to ~9.2e9 per day, loans with larger ones are stored as rows. Dates and days elapsed are implicit since
+# a schedule has every day of the loan.
+PACKED_SCHEDULE_MAGIC = b"LSP1"
+# magic, start date as a proleptic ordinal, number of days, decimals of the fixed point values
+PACKED_SCHEDULE_HEADER = struct.Struct("<4siIi")
+PACKED_SCHEDULE_DECIMALS = 9
+PACKED_SCHEDULE_DTYPE = np.dtype("<i8")
+PACKED_SCHEDULE_VALUE_MIN = int(np.iinfo(PACKED_SCHEDULE_DTYPE).min)
+PACKED_SCHEDULE_VALUE_MAX = int(np.iinfo(PACKED_SCHEDULE_DTYPE).max)
+
+
+class InvalidPackedScheduleError(Exception):
+    pass
+
+
+class PackedScheduleOverflowError(InvalidPackedScheduleError):
+    pass
+
+
+def to_fixed_point(value: Decimal, decimals: int = PACKED_SCHEDULE_DECIMALS) -> int:
+    fixed_point = int(Decimal(value).scaleb(decimals).to_integral_value())
+    if not PACKED_SCHEDULE_VALUE_MIN <= fixed_point <= PACKED_SCHEDULE_VALUE_MAX:
+        raise PackedScheduleOverflowError(
+            f"Daily amount {value} doesn't fit a packed schedule value with {decimals} decimals."
+        )
+    return fixed_point
+
+
+def fits_packed_schedule(calculation_results: List, decimals: int = PACKED_SCHEDULE_DECIMALS) -> bool:
+    # whether every daily amount of a schedule can be packed, loans that can't are stored as rows instead
+    limit = PACKED_SCHEDULE_VALUE_MAX / 10 ** decimals
+    return all(
+        abs(float(result.interest_accrual_amount)) < limit
+        and abs(float(result.interest_accrual_amount_without_margin)) < limit
+        for result in calculation_results
+    )
+
+
+def pack_schedule(start_date: date, calculation_results: List, decimals: int = PACKED_SCHEDULE_DECIMALS) -> bytes:
+    # calculation_results have to be ordered and contiguous from start_date, as the calculator returns them
+    for days_elapsed, result in enumerate(calculation_results):
+        if result.days_elapsed_since_loan_start_date != days_elapsed:
+            raise InvalidPackedScheduleError(
+                f"Schedule has no result for day {days_elapsed} since the loan start date so it can't be packed."
+            )
+    interest_accrual_amounts = np.array(
+        [to_fixed_point(result.interest_accrual_amount, decimals) for result in calculation_results],
+        dtype=PACKED_SCHEDULE_DTYPE
+    )
+    interest_accrual_amounts_without_margin = np.array(
+        [to_fixed_point(result.interest_accrual_amount_without_margin, decimals) for result in calculation_results],
+        dtype=PACKED_SCHEDULE_DTYPE
+    )
+    return b"".join([
+        PACKED_SCHEDULE_HEADER.pack(
+            PACKED_SCHEDULE_MAGIC, start_date.toordinal(), len(calculation_results), decimals
+        ),
+        interest_accrual_amounts.tobytes(),
+        interest_accrual_amounts_without_margin.tobytes()
+    ])
+
+
+def patch_schedule(blob, calculation_results: List) -> bytes:
+    # rewrites the days of calculation_results in a packed schedule, placed by days_elapsed_since_loan_start_date,
+    # every other day is copied over as it is
+    schedule = PackedSchedule(blob)
+    interest_accrual_amounts = schedule.interest_accrual_amounts.copy()
+    interest_accrual_amounts_without_margin = schedule.interest_accrual_amounts_without_margin.copy()
+    for result in calculation_results:
+        days_elapsed = result.days_elapsed_since_loan_start_date
+        if not 0 <= days_elapsed < len(schedule):
+            raise InvalidPackedScheduleError(
+                f"Day {days_elapsed} since the loan start date is outside the packed schedule of {len(schedule)} days."
+            )
+        interest_accrual_amounts[days_elapsed] = to_fixed_point(result.interest_accrual_amount, schedule.decimals)
+        interest_accrual_amounts_without_margin[days_elapsed] = to_fixed_point(
+            result.interest_accrual_amount_without_margin, schedule.decimals
+        )
+    return b"".join([
+        bytes(blob[:PACKED_SCHEDULE_HEADER.size]),
+        interest_accrual_amounts.tobytes(),
+        interest_accrual_amounts_without_margin.tobytes()
+    ])
+
+
+class PackedSchedule:
+    # Read side of pack_schedule. The columns are NumPy views over the blob (bytes or the memoryview the
+    # driver returns), so nothing is copied until the values are converted while iterating.
+
+    def __init__(self, blob):
+        if len(blob) < PACKED_SCHEDULE_HEADER.size:
+            raise InvalidPackedScheduleError("Packed schedule is shorter than its header.")
+        magic, start_ordinal, days, decimals = PACKED_SCHEDULE_HEADER.unpack_from(blob)
+        if magic != PACKED_SCHEDULE_MAGIC:
+            raise InvalidPackedScheduleError(f"Packed schedule has an unknown format: {magic!r}.")
+        if len(blob) != PACKED_SCHEDULE_HEADER.size + 2 * days * PACKED_SCHEDULE_DTYPE.itemsize:
+            raise InvalidPackedScheduleError(f"Packed schedule of {days} days has a wrong size: {len(blob)}.")
+        self.start_date = date.fromordinal(start_ordinal)
+        self.decimals = decimals
+        self.interest_accrual_amounts = np.frombuffer(
+            blob, dtype=PACKED_SCHEDULE_DTYPE, count=days, offset=PACKED_SCHEDULE_HEADER.size
+        )
+        self.interest_accrual_amounts_without_margin = np.frombuffer(
+            blob, dtype=PACKED_SCHEDULE_DTYPE, count=days,
+            offset=PACKED_SCHEDULE_HEADER.size + days * PACKED_SCHEDULE_DTYPE.itemsize
+        )
+
+    def __len__(self) -> int:
+        return len(self.interest_accrual_amounts)
+
+    def __iter__(self) -> Iterator[LoanDailyCalculationResult]:
+        # one vectorized scaling per column, amounts come out as floats like the vectorized engine's,
+        # dividing by the exact power of ten gives the float nearest to the fixed point value
+        scale = 10.0 ** self.decimals
+        interest_accrual_amounts = (self.interest_accrual_amounts / scale).tolist()
+        interest_accrual_amounts_without_margin = (self.interest_accrual_amounts_without_margin / scale).tolist()
+        for days_elapsed, (interest_accrual_amount, interest_accrual_amount_without_margin) in enumerate(
+                zip(interest_accrual_amounts, interest_accrual_amounts_without_margin)
+        ):
+            yield LoanDailyCalculationResult(
+                interest_accrual_amount=interest_accrual_amount,
+                days_elapsed_since_loan_start_date=days_elapsed,
+                interest_accrual_amount_without_margin=interest_accrual_amount_without_margin,
+                date=self.start_date + timedelta(days=days_elapsed)
+            )
@@ -0,0 +1,110 @@
+import os
+import time
+from threading import Lock
+from typing import (
+    Dict,
+    List,
+    Optional
+)
+
+from sqlalchemy.engine import Engine
+
+from db.engine import get_pool_stats
+
+# read replicas of DB_CONNECTION_STRING, comma separated, read-only units of work go to the primary without any
+DB_REPLICA_CONNECTION_STRINGS = [
+    connection_string for connection_string in os.environ.get("DB_REPLICA_CONNECTION_STRINGS", "").split(",")
+    if connection_string
+]
+ROUND_ROBIN_ROUTING = "round_robin"
+# the replica with the fewest read-only units of work of this process open on it
+LEAST_CONNECTIONS_ROUTING = "least_connections"
+REPLICA_ROUTINGS = [ROUND_ROBIN_ROUTING, LEAST_CONNECTIONS_ROUTING]
+DB_REPLICA_ROUTING = os.environ.get("DB_REPLICA_ROUTING", ROUND_ROBIN_ROUTING)
+# seconds after a commit during which read-only units of work still read from the primary, so a client reading
+# back what it just wrote doesn't depend on the replication lag, 0 disables it
+DB_READ_YOUR_WRITES_SECONDS = float(os.environ.get("DB_READ_YOUR_WRITES_SECONDS", "0"))
+
+
+class ReplicaRouter:
+    # Picks the engine of every read-only unit of work opened on a primary. The read-your-writes window is
+    # kept per process: a commit sends this process' reads to the primary for a while, reads served by other
+    # processes (gunicorn workers included) still go to the replicas.
+
+    def __init__(
+            self, primary: Engine, replicas: List[Engine],
+            routing: str = DB_REPLICA_ROUTING,
+            read_your_writes_seconds: float = DB_READ_YOUR_WRITES_SECONDS
+    ):
+        if routing not in REPLICA_ROUTINGS:
+            raise ValueError(f"'routing' has to be one of: {REPLICA_ROUTINGS}.")
+        if not replicas:
+            raise ValueError("At least one replica is needed to route reads to.")
+        self.primary = primary
+        self.replicas = replicas
+        self.routing = routing
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self.reads = [0] * len(replicas)
+        self.in_flight = [0] * len(replicas)
+        self.read_your_writes_reads = 0
+        self._next = 0
+        self._last_write = None
+        self._lock = Lock()
+
+    def acquire(self) -> Engine:
+        # every acquired engine has to be given back with release
+        with self._lock:
+            if self._last_write is not None and (
+                    time.monotonic() - self._last_write < self.read_your_writes_seconds
+            ):
+                self.read_your_writes_reads += 1
+                return self.primary
+            if self.routing == LEAST_CONNECTIONS_ROUTING:
+                # ties go round-robin so idle replicas share the load instead of the first one taking it all
+                position = min(
+                    range(len(self.replicas)),
+                    key=lambda i: (self.in_flight[i], (i - self._next) % len(self.replicas))
+                )
+            else:
+                position = self._next % len(self.replicas)
+            self._next = (position + 1) % len(self.replicas)
+            self.reads[position] += 1
+            self.in_flight[position] += 1
+            return self.replicas[position]
+
+    def release(self, engine: Engine):
+        if engine is self.primary:
+            return
+        with self._lock:
+            self.in_flight[self.replicas.index(engine)] -= 1
+
+    def record_write(self):
+        with self._lock:
+            self._last_write = time.monotonic()
+
+    def stats(self) -> Dict:
+        return {
+            "routing": self.routing,
+            "read_your_writes_reads": self.read_your_writes_reads,
+            "replicas": [
+                {
+                    "reads": self.reads[position],
+                    "in_flight": self.in_flight[position],
+                    "pool": get_pool_stats(replica)
+                } for position, replica in enumerate(self.replicas)
+            ]
+        }
+
+
+_replica_routers: Dict[Engine, ReplicaRouter] = {}
+
+
+def set_replica_router(primary: Engine, replica_router: Optional[ReplicaRouter]):
+    if replica_router is None:
+        _replica_routers.pop(primary, None)
+    else:
+        _replica_routers[primary] = replica_router
+
+
+def get_replica_router(primary: Engine) -> Optional[ReplicaRouter]:
+    return _replica_routers.get(primary)
@@ -3,37 +3,76 @@ from sqlalchemy import (
     ForeignKey,
     UniqueConstraint,
     Index,
-    create_engine,
     Integer,
     DECIMAL,
     String,
     Column,
     DateTime,
     Date,
+    LargeBinary,
+    inspect,
+    text
+)
+from sqlalchemy.orm import (
+    deferred,
+    relationship
 )
-from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
-engine = create_engine(os.environ["DB_CONNECTION_STRING"])
+from db.engine import get_engine
+
+engine = get_engine()
 Base = declarative_base()
 
 
 LOAN_TABLE_NAME = os.environ["LOAN_TABLE_NAME"]
 LOAN_CALCULATION_RESULT_TABLE_NAME = os.environ["LOAN_CALCULATION_RESULT_TABLE_NAME"]
-BASE_INTEREST_RATE_TABLE_NAME = os.environ["BASE_INTEREST_RATE_TABLE_NAME"]
+BASE_INTEREST_RATE_VERSION_TABLE_NAME = os.environ["BASE_INTEREST_RATE_VERSION_TABLE_NAME"]
+BASE_INTEREST_RATE_CHANGE_TABLE_NAME = os.environ["BASE_INTEREST_RATE_CHANGE_TABLE_NAME"]
+BASE_INTEREST_RATE_PERIOD_TABLE_NAME = os.environ["BASE_INTEREST_RATE_PERIOD_TABLE_NAME"]
 
 
-class BaseInterestRate(Base):
-    __tablename__ = BASE_INTEREST_RATE_TABLE_NAME
+class BaseInterestRatePeriod(Base):
+    # base interest rates as runs of days with the same rate, both dates included, neighbouring runs always
+    # have different rates. Rates are written and read as periods only (see BaseInterestRateRepository), a
+    # currency takes a handful of rows for slowly changing rates and one per day when the rate changes daily.
+    __tablename__ = BASE_INTEREST_RATE_PERIOD_TABLE_NAME
     id = Column(Integer, primary_key=True)
     currency = Column(String(3), nullable=False)
-    date = Column(Date(), nullable=False)
+    valid_from = Column(Date(), nullable=False)
+    valid_to = Column(Date(), nullable=False)
     interest_rate = Column(DECIMAL(precision=60, scale=35), nullable=False)
 
     __table_args__ = (
-        UniqueConstraint('currency', 'date', name='currency_date'),
-        Index('currency_date_index', "currency", "date")
+        UniqueConstraint('currency', 'valid_from', name='currency_valid_from'),
+        Index('currency_valid_from_valid_to_index', "currency", "valid_from", "valid_to")
+    )
+
+
+class BaseInterestRateVersion(Base):
+    # bumped whenever the base interest rates of a currency change so in-process caches know when to reload
+    __tablename__ = BASE_INTEREST_RATE_VERSION_TABLE_NAME
+    currency = Column(String(3), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class BaseInterestRateChange(Base):
+    # the date range a version bump changed, versions without one make caches reload the whole currency
+    __tablename__ = BASE_INTEREST_RATE_CHANGE_TABLE_NAME
+    id = Column(Integer, primary_key=True)
+    currency = Column(String(3), nullable=False)
+    version = Column(Integer, nullable=False)
+    date_from = Column(Date(), nullable=False)
+    date_to = Column(Date(), nullable=False)
+    created_on = Column(DateTime(), default=datetime.now)
+    # checkpoint of db.loan_recomputation: the last loan id whose batch was committed, and when every loan the
+    # change affects had been recomputed
+    recomputed_up_to_loan_id = Column(Integer, nullable=True)
+    loans_recomputed_on = Column(DateTime(), nullable=True)
+
+    __table_args__ = (
+        Index('currency_version_index', "currency", "version"),
     )
 
 
@@ -49,9 +88,24 @@ class Loan(Base):
     end_date = Column(Date(), default=datetime.now, nullable=False)
 
     total_interest = Column(DECIMAL(precision=60, scale=35), nullable=False)
+    # base interest rate version total_interest (and the stored schedule if any) was calculated with
+    base_interest_rate_version = Column(Integer, nullable=True)
+    # how the daily schedule is kept, see db.data_repositories.loan_repository, NULL means stored rows
+    schedule_storage = Column(String(16), nullable=True)
+    # the whole schedule of a "packed" storage loan, see db.packed_schedule, only loaded when asked for
+    packed_schedule = deferred(Column(LargeBinary(), nullable=True))
 
     created_on = Column(DateTime(), default=datetime.now)
     updated_on = Column(DateTime(), default=datetime.now, onupdate=datetime.now)
+    # bumped by every write of the loan's parameters or schedule through the API, not by recomputations after a
+    # rate change, which check it to leave loans written since they were read alone. NULL for loans created
+    # before it existed.
+    version = Column(Integer, nullable=True, default=1)
+
+    __table_args__ = (
+        # loans whose [start_date, end_date] overlaps a date range of one currency, see LoanRepository.list_affected
+        Index('currency_start_date_end_date_index', "currency", "start_date", "end_date"),
+    )
 
 
 class DailyLoanCalculationResult(Base):
@@ -64,5 +118,41 @@ class DailyLoanCalculationResult(Base):
     interest_accrual_amount_without_margin = Column(DECIMAL(precision=60, scale=35), nullable=False)
     days_elapsed_since_loan_start_date = Column(Integer, nullable=False)
 
+    __table_args__ = (
+        # date range scans of the portfolio aggregates, across loans and within one loan
+        Index('calculation_result_date_index', "date"),
+        Index('calculation_result_loan_id_date_index', "loan_id", "date"),
+    )
+
 
-Base.metadata.create_all(engine)
+def add_missing_columns(bind=engine):
+    # columns added to tables that existed before them (Loan.base_interest_rate_version, Loan.schedule_storage,
+    # ...), they're all nullable so existing rows keep NULL, which every reader already handles
+    inspector = inspect(bind)
+    quote = bind.dialect.identifier_preparer.quote
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            with bind.begin() as connection:
+                connection.execute(text(
+                    f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} "
+                    f"{column.type.compile(dialect=bind.dialect)}"
+                ))
+
+
+def create_schema(bind=engine):
+    # run once per deployment (python -m db.schema) instead of on every import, creates missing tables, the
+    # columns and the indexes added to tables that existed before them
+    Base.metadata.create_all(bind)
+    add_missing_columns(bind)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+
+if __name__ == "__main__":
+    create_schema()
@@ -0,0 +1,50 @@
+import os
+import sys
+from decimal import Decimal
+
+from sqlalchemy import (
+    inspect,
+    MetaData,
+    Table
+)
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append("/app/")
+
+from db.schema import (
+    create_schema,
+    engine
+)
+from db.data_repositories.base_interest_rate_repository import (
+    BaseInterestRateRepository,
+    CreateBaseInterestRateSchema
+)
+
+# the table base interest rates were stored in one row per day before they were stored as periods
+BASE_INTEREST_RATE_TABLE_NAME = os.environ["BASE_INTEREST_RATE_TABLE_NAME"]
+
+
+if __name__ == "__main__":
+    # moves the daily rates of the old table into periods. Currencies that already have periods were written
+    # since and are left alone, the rates themselves don't change so no version is bumped. The old table can
+    # be dropped once this has run.
+    create_schema()
+    if not inspect(engine).has_table(BASE_INTEREST_RATE_TABLE_NAME):
+        sys.exit(f"There is no '{BASE_INTEREST_RATE_TABLE_NAME}' table to move rates from.")
+    daily_rates = Table(BASE_INTEREST_RATE_TABLE_NAME, MetaData(), autoload_with=engine)
+    with sessionmaker(bind=engine)() as session:
+        repository = BaseInterestRateRepository(session=session)
+        with_periods = set(repository.list_currencies())
+        for currency, in session.query(daily_rates.c.currency).distinct().all():
+            if currency in with_periods:
+                print(f"{currency}: skipped, it already has periods")
+                continue
+            rates = [
+                CreateBaseInterestRateSchema(currency=currency, date=rate_date, interest_rate=Decimal(rate))
+                for rate_date, rate in session.query(
+                    daily_rates.c.date, daily_rates.c.interest_rate
+                ).filter(daily_rates.c.currency == currency)
+            ]
+            repository.upsert(rates)
+            print(f"{currency}: {len(rates)} days in {len(repository.get_periods(currency))} periods")
+        session.commit()
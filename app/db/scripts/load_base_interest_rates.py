@@ -0,0 +1,42 @@
+import argparse
+import sys
+
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append("/app/")
+
+from db.schema import (
+    create_schema,
+    engine
+)
+from db.base_interest_rate_loader import (
+    BaseInterestRateLoader,
+    read_rates,
+    BASE_INTEREST_RATE_LOAD_BATCH_SIZE,
+    RATE_FILE_FORMATS
+)
+
+
+def report_progress(rows: int, seconds: float):
+    print(f"loaded {rows} rates, {rows / max(seconds, 1e-9):.0f} rows/s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upserts base interest rates from a CSV or NDJSON file.")
+    parser.add_argument("path", help="rate file, '-' reads stdin")
+    parser.add_argument("--format", choices=RATE_FILE_FORMATS, help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=BASE_INTEREST_RATE_LOAD_BATCH_SIZE)
+    arguments = parser.parse_args()
+
+    create_schema()
+    file_format = arguments.format or ("ndjson" if arguments.path.endswith((".ndjson", ".jsonl")) else "csv")
+    file = sys.stdin if arguments.path == "-" else open(arguments.path, newline="")
+    with file, sessionmaker(bind=engine)() as session:
+        stats = BaseInterestRateLoader(session=session, batch_size=arguments.batch_size).load(
+            read_rates(file, file_format=file_format), on_progress=report_progress
+        )
+        session.commit()
+    print(
+        f"loaded {stats.rows} rates of {', '.join(stats.currencies)} in {stats.seconds:.1f}s, "
+        f"{stats.rows / max(stats.seconds, 1e-9):.0f} rows/s"
+    )
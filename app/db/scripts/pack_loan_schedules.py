@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+
+from sqlalchemy import or_
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append("/app/")
+
+from db.schema import (
+    add_missing_columns,
+    engine,
+    Loan
+)
+from db.data_repositories.loan_repository import (
+    LoanRepository,
+    ROWS_SCHEDULE_STORAGE,
+    PACKED_SCHEDULE_STORAGE
+)
+
+# loans migrated per transaction
+PACK_LOAN_SCHEDULES_BATCH_SIZE = int(os.environ.get("PACK_LOAN_SCHEDULES_BATCH_SIZE", "100"))
+
+
+def pack_loan_schedules(batch_size: int = PACK_LOAN_SCHEDULES_BATCH_SIZE):
+    session_maker = sessionmaker(bind=engine)
+    started = time.perf_counter()
+    loans, days, after_id = 0, 0, 0
+    while True:
+        with session_maker(autocommit=False) as session:
+            loan_ids = [loan_id for loan_id, in session.query(Loan.id).filter(
+                Loan.id > after_id,
+                or_(Loan.schedule_storage == ROWS_SCHEDULE_STORAGE, Loan.schedule_storage.is_(None))
+            ).order_by(Loan.id).limit(batch_size)]
+            if not loan_ids:
+                break
+            loan_repository = LoanRepository(session=session, schedule_storage=PACKED_SCHEDULE_STORAGE)
+            for loan_id in loan_ids:
+                days += loan_repository.pack_calculation_results(loan_id)
+            session.commit()
+        loans += len(loan_ids)
+        after_id = loan_ids[-1]
+        print(f"packed {loans} loans, {days} days, {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    # create_all doesn't alter tables that existed before the packed layout
+    add_missing_columns()
+    pack_loan_schedules()
@@ -0,0 +1,46 @@
+import argparse
+import sys
+import time
+
+sys.path.append("/app/")
+
+from db.schema import (
+    create_schema,
+    engine
+)
+from db.loan_recomputation import (
+    LoanRecomputation,
+    LOAN_RECOMPUTATION_BATCH_SIZE,
+    LOAN_RECOMPUTATION_POLL_SECONDS,
+    LOAN_RECOMPUTATION_WORKERS
+)
+
+
+def print_progress(change, stats):
+    print(
+        f"{change.currency} version {change.version} ({change.date_from} - {change.date_to}): "
+        f"{stats.loans} loans, {stats.days} days recomputed, {stats.skipped} skipped, {stats.failed} failed, "
+        f"{stats.seconds:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recomputes loans affected by recorded base interest rate changes.")
+    parser.add_argument("--loop", action="store_true", help="keeps polling for new changes")
+    parser.add_argument("--batch-size", type=int, default=LOAN_RECOMPUTATION_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=LOAN_RECOMPUTATION_WORKERS)
+    arguments = parser.parse_args()
+
+    # also adds the recomputation's columns to tables created before them
+    create_schema()
+    loan_recomputation = LoanRecomputation(engine, batch_size=arguments.batch_size, workers=arguments.workers)
+    try:
+        while True:
+            stats = loan_recomputation.run(on_progress=print_progress)
+            if stats.changes:
+                print(f"recomputed {stats.changes} changes, {stats.loans} loans in {stats.seconds:.1f}s")
+            if not arguments.loop:
+                break
+            time.sleep(LOAN_RECOMPUTATION_POLL_SECONDS)
+    finally:
+        loan_recomputation.close()
@@ -1,16 +1,25 @@
-import os
+from db.engine import get_session_factory
+from db.replicas import get_replica_router
+
+
+class ReadOnlyUnitOfWorkError(Exception):
+    pass
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 
 # FROM: https://www.cosmicpython.com/book/chapter_06_uow.html
 class UnitOfWork:
 
-    def __init__(self, connection):
+    def __init__(self, connection, read_only: bool = False):
         self.connection = connection
-        self.session_maker = sessionmaker(bind=connection)
+        # read-only units of work go to a replica when the primary has any (see db.replicas)
+        self.read_only = read_only
+        self.replica_router = get_replica_router(connection)
 
     def __enter__(self):
+        self.engine = self.connection
+        if self.read_only and self.replica_router is not None:
+            self.engine = self.replica_router.acquire()
+        self.session_maker = get_session_factory(self.engine)
         self.session = self.session_maker()
         return self
 
@@ -19,9 +28,15 @@ class UnitOfWork:
             self.rollback()
             self.session.close()
         self.session.close()
+        if self.engine is not self.connection:
+            self.replica_router.release(self.engine)
 
     def commit(self):
+        if self.read_only:
+            raise ReadOnlyUnitOfWorkError("A read-only unit of work can't be committed.")
         self.session.commit()
+        if self.replica_router is not None:
+            self.replica_router.record_write()
 
     def rollback(self):
         self.session.rollback()
@@ -0,0 +1,67 @@
+import gc
+import os
+import shutil
+import tempfile
+import time
+
+# gunicorn -c gunicorn.conf.py wsgi:app
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '3001')}"
+workers = int(os.environ.get("GUNICORN_WORKERS", str(2 * (os.cpu_count() or 1) + 1)))
+# "gthread" serves GUNICORN_THREADS requests per worker, "sync" one at a time
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+# loads the app in the master before forking, so rate caches and holiday calendars are built once and shared
+# copy-on-write by the workers instead of rebuilt by each of them
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() == "true"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+# restarts a worker after this many requests (plus up to the jitter), 0 never restarts
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+accesslog = "-"
+# the workers' Prometheus samples are shared through files in this directory so /metrics reports every worker
+# and not only the one serving the scrape, it has to be set before the app imports prometheus_client
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "loan_api_prometheus"))
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+
+def on_starting(server):
+    # samples left by a previous run would be added to this one's, the preloaded app hasn't written any yet
+    # since the histograms only get files once a worker observes a labelled value
+    shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"])
+
+
+def when_ready(server):
+    # runs in the master once the app is preloaded and before the first worker is forked
+    if server.cfg.preload_app:
+        from wsgi import APP_LOAD_SECONDS
+        server.log.info(f"App preloaded in {APP_LOAD_SECONDS * 1000:.0f} ms")
+    from db.engine import dispose_engines
+    dispose_engines()
+    # moves the preloaded objects out of the collector's reach so collections in the workers don't write to
+    # their pages and undo the copy-on-write sharing
+    gc.freeze()
+
+
+def pre_fork(server, worker):
+    worker.boot_started = time.perf_counter()
+
+
+def post_fork(server, worker):
+    # connections pooled in the master must not be shared by the workers
+    from db.engine import dispose_engines
+    dispose_engines()
+
+
+def child_exit(server, worker):
+    # runs in the master, the samples of the dead worker are kept but its live gauges are dropped
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    # time from fork until the worker accepts requests, includes loading the app without preload_app
+    worker.log.info(
+        f"Worker {worker.pid} booted in {(time.perf_counter() - worker.boot_started) * 1000:.0f} ms"
+        f"{'' if worker.cfg.preload_app else ', app loaded by the worker'}"
+    )
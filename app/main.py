@@ -1,7 +1,10 @@
 import os
+from db.schema import create_schema
 from web_api.app import create_app
 
 if __name__ == "__main__":
+    # the development server sets the database up itself, gunicorn deployments run python -m db.schema first
+    create_schema()
     app = create_app(
         api_title=os.environ["API_TITLE"],
         api_version=os.environ["API_VERSION"],
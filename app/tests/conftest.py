@@ -0,0 +1,84 @@
+import os
+import tempfile
+from datetime import (
+    date,
+    timedelta
+)
+from decimal import Decimal
+
+import pytest
+
+# the modules below read their configuration on import, the tests run against a throwaway SQLite file
+os.environ.setdefault("DB_CONNECTION_STRING", f"sqlite:///{tempfile.mkdtemp()}/test.sqlite")
+os.environ.setdefault("LOAN_TABLE_NAME", "loan")
+os.environ.setdefault("LOAN_CALCULATION_RESULT_TABLE_NAME", "daily_loan_calculation_result")
+os.environ.setdefault("BASE_INTEREST_RATE_VERSION_TABLE_NAME", "base_interest_rate_version")
+os.environ.setdefault("BASE_INTEREST_RATE_CHANGE_TABLE_NAME", "base_interest_rate_change")
+os.environ.setdefault("BASE_INTEREST_RATE_PERIOD_TABLE_NAME", "base_interest_rate_period")
+os.environ.setdefault("LOANS_PERIOD_START", "2022")
+os.environ.setdefault("LOANS_PERIOD_END", "2032")
+os.environ.setdefault("LOAN_CURRENCIES", "USD,GBP,EUR")
+os.environ.setdefault("MAXIMUM_LOAN_AMOUNT", "1000000000000")
+
+from db.schema import (
+    Base,
+    create_schema,
+    engine
+)
+from db.unit_of_work import UnitOfWork
+from db.data_repositories.base_interest_rate_repository import (
+    BaseInterestRateRepository,
+    CreateBaseInterestRateSchema
+)
+from web_api.app import create_app
+
+RATES_START_DATE = date(2022, 1, 1)
+RATES_END_DATE = date(2025, 12, 31)
+
+
+def build_base_interest_rates(currency: str, start_date: date, end_date: date):
+    # a rate that changes every few days, so loans cross several rate runs
+    return [
+        CreateBaseInterestRateSchema(
+            currency=currency,
+            date=start_date + timedelta(days=i),
+            interest_rate=Decimal("0.0001") + Decimal((i // 10) % 7) / Decimal(1000000)
+        ) for i in range((end_date - start_date).days + 1)
+    ]
+
+
+def write_base_interest_rates(rates):
+    with UnitOfWork(engine) as unit_of_work:
+        repository = BaseInterestRateRepository(session=unit_of_work.session)
+        versions = repository.record_changes(repository.upsert(rates))
+        unit_of_work.commit()
+    return versions
+
+
+@pytest.fixture
+def database():
+    Base.metadata.drop_all(engine)
+    create_schema(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def base_interest_rates(database):
+    return write_base_interest_rates(
+        build_base_interest_rates("USD", RATES_START_DATE, RATES_END_DATE)
+        + build_base_interest_rates("GBP", RATES_START_DATE, RATES_END_DATE)
+    )
+
+
+@pytest.fixture
+def app(base_interest_rates):
+    return create_app(
+        api_title="loans", api_version="v1", openapi_version="3.0.2",
+        db_connection_string=os.environ["DB_CONNECTION_STRING"], db_replica_connection_strings=[]
+    )
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
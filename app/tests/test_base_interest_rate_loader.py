@@ -0,0 +1,113 @@
+import io
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from db.base_interest_rate_loader import (
+    read_rates,
+    BaseInterestRateLoader,
+    InvalidBaseInterestRateRowError
+)
+from db.unit_of_work import UnitOfWork
+from db.data_repositories.base_interest_rate_repository import BaseInterestRateRepository
+
+# powers of two, which SQLite keeps exactly although it stores DECIMAL as floating point
+RATE = "0.0001220703125"
+OTHER_RATE = "0.000244140625"
+
+
+def ndjson_line(currency, rate_date, interest_rate):
+    return f'{{"currency": "{currency}", "date": "{rate_date}", "interest_rate": "{interest_rate}"}}\n'
+
+
+def load(engine, text, file_format="ndjson", batch_size=2):
+    with UnitOfWork(engine) as unit_of_work:
+        stats = BaseInterestRateLoader(session=unit_of_work.session, batch_size=batch_size).load(
+            read_rates(io.StringIO(text), file_format=file_format)
+        )
+        unit_of_work.commit()
+    return stats
+
+
+def get_periods(engine, currency):
+    with UnitOfWork(engine) as unit_of_work:
+        return [
+            (period.valid_from, period.valid_to, period.interest_rate)
+            for period in BaseInterestRateRepository(session=unit_of_work.session).get_periods(currency)
+        ]
+
+
+@pytest.mark.parametrize("text, line_number", [
+    (ndjson_line("EUR", "2023-01-01", RATE) + '{"currency": "EUR", "date": \n', 2),
+    (ndjson_line("EUR", "2023-01-01", RATE) + '["EUR", "2023-01-02", "0.0001"]\n', 2),
+    (ndjson_line("EUR", "2023-13-01", RATE), 1),
+    (ndjson_line("EUR", "2023-01-01", "one"), 1),
+    ('{"currency": "EUR", "date": "2023-01-01"}\n', 1),
+    # blank lines are skipped but still counted
+    ("\n" + ndjson_line("EURO", "2023-01-01", RATE), 2),
+])
+def test_malformed_ndjson_lines_are_reported_with_their_line_number(text, line_number):
+    with pytest.raises(InvalidBaseInterestRateRowError, match=f"^Line {line_number} "):
+        list(read_rates(io.StringIO(text), file_format="ndjson"))
+
+
+def test_malformed_csv_lines_are_reported_with_their_line_number():
+    text = f"date,currency,interest_rate\n2023-01-01,EUR,{RATE}\n2023-01-32,EUR,{RATE}\n"
+
+    with pytest.raises(InvalidBaseInterestRateRowError, match="^Line 3 "):
+        list(read_rates(io.StringIO(text), file_format="csv"))
+
+
+def test_malformed_line_after_a_batch_leaves_nothing_loaded(database):
+    text = "".join(ndjson_line("EUR", f"2023-01-0{day}", RATE) for day in range(1, 6)) + "not json\n"
+
+    with pytest.raises(InvalidBaseInterestRateRowError):
+        load(database, text)
+
+    assert get_periods(database, "EUR") == []
+
+
+def test_day_given_twice_in_one_load_keeps_its_last_rate(database):
+    text = "".join([
+        ndjson_line("EUR", "2023-01-01", RATE),
+        ndjson_line("EUR", "2023-01-02", RATE),
+        # the first batch again, then a day of the same batch twice
+        ndjson_line("EUR", "2023-01-01", OTHER_RATE),
+        ndjson_line("EUR", "2023-01-03", RATE),
+        ndjson_line("EUR", "2023-01-03", OTHER_RATE),
+    ])
+
+    stats = load(database, text, batch_size=2)
+
+    assert get_periods(database, "EUR") == [
+        (date(2023, 1, 1), date(2023, 1, 1), Decimal(OTHER_RATE)),
+        (date(2023, 1, 2), date(2023, 1, 2), Decimal(RATE)),
+        (date(2023, 1, 3), date(2023, 1, 3), Decimal(OTHER_RATE)),
+    ]
+    assert stats.currencies == ["EUR"]
+
+
+def test_load_records_a_version_and_a_change_per_currency(database):
+    first_text = "".join([
+        ndjson_line("EUR", "2023-01-05", RATE),
+        ndjson_line("GBP", "2023-02-01", RATE),
+        ndjson_line("EUR", "2023-01-01", RATE),
+        ndjson_line("EUR", "2023-01-09", OTHER_RATE),
+    ])
+    second_text = f"currency,date,interest_rate\nEUR,2023-01-03,{OTHER_RATE}\n"
+
+    first_stats = load(database, first_text)
+    second_stats = load(database, second_text, file_format="csv")
+
+    assert (first_stats.rows, first_stats.currencies, first_stats.versions) == (4, ["EUR", "GBP"], {"EUR": 1, "GBP": 1})
+    assert (second_stats.rows, second_stats.currencies, second_stats.versions) == (1, ["EUR"], {"EUR": 2})
+    with UnitOfWork(database) as unit_of_work:
+        repository = BaseInterestRateRepository(session=unit_of_work.session)
+        # the range of a load spans its batches, from the earliest to the latest day loaded
+        assert [
+            (change.version, change.date_from, change.date_to) for change in repository.get_changes("EUR", 0)
+        ] == [(1, date(2023, 1, 1), date(2023, 1, 9)), (2, date(2023, 1, 3), date(2023, 1, 3))]
+        assert [
+            (change.version, change.date_from, change.date_to) for change in repository.get_changes("GBP", 0)
+        ] == [(1, date(2023, 2, 1), date(2023, 2, 1))]
@@ -0,0 +1,123 @@
+from datetime import (
+    date,
+    timedelta
+)
+from decimal import Decimal
+
+from calculator.rate_index import BaseInterestRateIndex
+from db.unit_of_work import UnitOfWork
+from db.data_repositories.base_interest_rate_repository import (
+    BaseInterestRateFiltersSchema,
+    BaseInterestRateRepository,
+    CreateBaseInterestRateSchema
+)
+
+# powers of two, which SQLite keeps exactly although it stores DECIMAL as floating point
+RATE = Decimal(2) ** -13
+OTHER_RATE = Decimal(2) ** -12
+THIRD_RATE = Decimal(2) ** -11
+
+
+def build_rates(currency: str, start_date: date, end_date: date, rate: Decimal):
+    return [
+        CreateBaseInterestRateSchema(currency=currency, date=start_date + timedelta(days=i), interest_rate=rate)
+        for i in range((end_date - start_date).days + 1)
+    ]
+
+
+def get_periods(repository: BaseInterestRateRepository, currency: str):
+    return [
+        (period.valid_from, period.valid_to, period.interest_rate) for period in repository.get_periods(currency)
+    ]
+
+
+def test_upsert_merges_days_into_periods(database):
+    with UnitOfWork(database) as unit_of_work:
+        repository = BaseInterestRateRepository(session=unit_of_work.session)
+
+        changed_ranges = repository.upsert(
+            build_rates("EUR", date(2022, 1, 1), date(2022, 12, 31), RATE)
+        )
+        repository.upsert(build_rates("EUR", date(2022, 3, 1), date(2022, 3, 31), OTHER_RATE))
+        # the same rate as the days around it, the periods merge back
+        repository.upsert(build_rates("EUR", date(2022, 3, 20), date(2022, 3, 31), RATE))
+
+        assert changed_ranges == {"EUR": (date(2022, 1, 1), date(2022, 12, 31))}
+        assert get_periods(repository, "EUR") == [
+            (date(2022, 1, 1), date(2022, 2, 28), RATE),
+            (date(2022, 3, 1), date(2022, 3, 19), OTHER_RATE),
+            (date(2022, 3, 20), date(2022, 12, 31), RATE),
+        ]
+
+
+def test_delete_cuts_periods(database):
+    with UnitOfWork(database) as unit_of_work:
+        repository = BaseInterestRateRepository(session=unit_of_work.session)
+        repository.upsert(build_rates("EUR", date(2022, 1, 1), date(2022, 12, 31), RATE))
+
+        deleted = repository.delete(currency="EUR", date_from=date(2022, 6, 1), date_to=date(2023, 6, 30))
+
+        assert deleted == 214
+        assert get_periods(repository, "EUR") == [(date(2022, 1, 1), date(2022, 5, 31), RATE)]
+        assert repository.delete(currency="EUR", date_from=date(2022, 6, 1), date_to=date(2022, 6, 30)) == 0
+
+
+def test_list_pages_through_every_day_once(database):
+    rates = (
+        build_rates("EUR", date(2022, 1, 1), date(2022, 1, 10), RATE)
+        + build_rates("EUR", date(2022, 1, 11), date(2022, 1, 12), OTHER_RATE)
+        + build_rates("USD", date(2022, 1, 5), date(2022, 1, 20), THIRD_RATE)
+    )
+    filters = BaseInterestRateFiltersSchema(date_from=date(2022, 1, 3), date_to=date(2022, 1, 15))
+    with UnitOfWork(database) as unit_of_work:
+        repository = BaseInterestRateRepository(session=unit_of_work.session)
+        repository.upsert(rates)
+
+        listed, after = [], None
+        while page := repository.list(filters=filters, after=after, limit=4):
+            listed.extend((rate.currency, rate.date, rate.interest_rate) for rate in page)
+            after = page[-1].currency, page[-1].date
+
+        expected = [
+            (rate.currency, rate.date, rate.interest_rate) for rate in rates
+            if filters.date_from <= rate.date <= filters.date_to
+        ]
+        assert listed == expected
+        assert repository.count(filters=filters) == len(expected)
+
+
+def test_index_is_read_from_periods(database):
+    rates = (
+        build_rates("EUR", date(2022, 1, 1), date(2022, 1, 31), RATE)
+        + build_rates("EUR", date(2022, 3, 1), date(2022, 3, 31), OTHER_RATE)
+    )
+    with UnitOfWork(database) as unit_of_work:
+        repository = BaseInterestRateRepository(session=unit_of_work.session)
+        repository.upsert(rates)
+
+        index = repository.get_index("EUR")
+
+    expected = BaseInterestRateIndex.from_rates(
+        currency="EUR", rates=[(rate.date, rate.interest_rate) for rate in rates]
+    )
+    assert index.periods == expected.periods
+    assert index.prefix_sums == expected.prefix_sums
+
+
+def test_bump_versions_inserts_then_increments_versions(database):
+    with UnitOfWork(database) as unit_of_work:
+        repository = BaseInterestRateRepository(session=unit_of_work.session)
+        repository.bump_versions(["EUR"])
+        unit_of_work.commit()
+
+    # another transaction bumps a version that exists and one that doesn't yet in one statement
+    with UnitOfWork(database) as unit_of_work:
+        repository = BaseInterestRateRepository(session=unit_of_work.session)
+        repository.bump_versions(["EUR", "GBP", "EUR"])
+        unit_of_work.commit()
+
+    with UnitOfWork(database) as unit_of_work:
+        repository = BaseInterestRateRepository(session=unit_of_work.session)
+        assert (repository.get_version("EUR"), repository.get_version("GBP"), repository.get_version("USD")) == (
+            2, 1, 0
+        )
@@ -0,0 +1,43 @@
+import pytest
+
+from web_api import errors
+
+RANGE = {"currency": "USD", "start_date": "2026-01-01", "end_date": "2026-01-10", "interest_rate": "0.0002"}
+
+
+@pytest.fixture
+def batch_size_max(monkeypatch):
+    monkeypatch.setattr(errors, "BASE_INTEREST_RATES_BATCH_SIZE_MAX", 10)
+    return 10
+
+
+def get_rates_count(client, currency, date_from, date_to):
+    response = client.get(
+        "/api/base-interest-rates", query_string={"currency": currency, "date_from": date_from, "date_to": date_to}
+    )
+    assert response.status_code == 200, response.json
+    return response.json["count"]
+
+
+def test_post_expands_ranges_and_bumps_the_version(client, base_interest_rates, batch_size_max):
+    response = client.post("/api/base-interest-rates", json={"ranges": [RANGE]})
+
+    assert response.status_code == 200, response.json
+    assert response.json == {"changed": 10, "versions": {"USD": base_interest_rates["USD"] + 1}}
+    assert get_rates_count(client, "USD", "2026-01-01", "2026-01-31") == 10
+
+
+@pytest.mark.parametrize("upsert_rates_params", [
+    # a range longer than a batch on its own
+    {"ranges": [{**RANGE, "end_date": "2026-01-11"}]},
+    # ranges that fit one by one but not together with the rates
+    {"ranges": [RANGE], "rates": [{"currency": "USD", "date": "2026-02-01", "interest_rate": "0.0002"}]},
+    # ranges ending before they start, or millions of days long
+    {"ranges": [{**RANGE, "end_date": "2025-12-31"}]},
+    {"ranges": [{**RANGE, "end_date": "9999-12-31"}]},
+])
+def test_post_rejects_ranges_over_the_batch_size_before_writing(client, batch_size_max, upsert_rates_params):
+    response = client.post("/api/base-interest-rates", json=upsert_rates_params)
+
+    assert response.status_code == 400, response.json
+    assert get_rates_count(client, "USD", "2026-01-01", "2026-12-31") == 0
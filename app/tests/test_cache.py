@@ -0,0 +1,114 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import (
+    Event,
+    Lock
+)
+
+import pytest
+
+from web_api.cache import LRUCache
+
+THREADS = 8
+
+
+class ComputeFailed(Exception):
+    pass
+
+
+class BlockingCompute:
+    # a compute that blocks until released, counting its calls
+
+    def __init__(self, value=None, error=None):
+        self.value = value
+        self.error = error
+        self.calls = 0
+        self.released = Event()
+        self._lock = Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        assert self.released.wait(timeout=5)
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_concurrent_misses_of_a_key_compute_it_once():
+    cache = LRUCache(max_size=4)
+    compute = BlockingCompute(value="quote")
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        futures = [executor.submit(cache.get_or_compute, "key", compute) for _ in range(THREADS)]
+        # every other thread waits on the first one's computation before it finishes
+        wait_for(lambda: cache.coalesced == THREADS - 1)
+        compute.released.set()
+        values = [future.result() for future in futures]
+
+    assert values == ["quote"] * THREADS
+    assert compute.calls == 1
+    assert (cache.misses, cache.coalesced, cache.hits) == (1, THREADS - 1, 0)
+    assert cache.get_or_compute("key", compute) == "quote"
+    assert (compute.calls, cache.hits) == (1, 1)
+
+
+def test_failed_computation_is_raised_to_every_waiter_and_not_cached():
+    cache = LRUCache(max_size=4)
+    compute = BlockingCompute(error=ComputeFailed())
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        futures = [executor.submit(cache.get_or_compute, "key", compute) for _ in range(THREADS)]
+        wait_for(lambda: cache.coalesced == THREADS - 1)
+        compute.released.set()
+        for future in futures:
+            with pytest.raises(ComputeFailed):
+                future.result()
+
+    assert compute.calls == 1
+    assert cache.get_or_compute("key", lambda: "quote") == "quote"
+    assert cache.stats()["size"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    # a becomes the most recently used, b is evicted next
+    assert cache.get_or_compute("a", lambda: pytest.fail("a is cached")) == 1
+
+    cache.put("c", 3)
+
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    assert cache.evictions == 1
+
+
+def test_concurrent_computations_of_distinct_keys_stay_within_max_size():
+    cache = LRUCache(max_size=4)
+    keys = range(THREADS * 8)
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        values = list(executor.map(lambda key: cache.get_or_compute(key, lambda: key * 2), keys))
+
+    assert values == [key * 2 for key in keys]
+    assert cache.stats()["size"] == 4
+    assert cache.misses == len(keys)
+    assert cache.evictions == len(keys) - 4
+
+
+def test_max_size_of_zero_computes_every_time():
+    cache = LRUCache(max_size=0)
+    calls = []
+
+    for _ in range(3):
+        assert cache.get_or_compute("key", lambda: calls.append(1) or "quote") == "quote"
+
+    assert len(calls) == 3
+    assert cache.stats()["size"] == 0
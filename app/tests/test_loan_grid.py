@@ -0,0 +1,92 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from calculator.engines import LOAN_CALCULATION_ENGINE_TOLERANCE
+from calculator.loan import (
+    calculate_loan,
+    calculate_loan_totals
+)
+from calculator.rate_index import BaseInterestRateIndex
+from calculator.vectorized_loan import calculate_loan_grid
+from tests.conftest import (
+    build_base_interest_rates,
+    RATES_END_DATE,
+    RATES_START_DATE
+)
+
+LOAN_AMOUNTS = [Decimal("0.01"), Decimal(1000), Decimal("2500000.55"), Decimal(100000000)]
+ANNUAL_MARGINS = [Decimal(0), Decimal("0.025"), Decimal("0.0725")]
+
+
+@pytest.fixture(scope="module")
+def base_interest_rate_index():
+    return BaseInterestRateIndex.from_rates(
+        currency="USD",
+        rates=[
+            (rate.date, rate.interest_rate)
+            for rate in build_base_interest_rates("USD", RATES_START_DATE, RATES_END_DATE)
+        ]
+    )
+
+
+def assert_within_tolerance(value, expected_value):
+    assert abs(Decimal(float(value)) - Decimal(expected_value)) <= LOAN_CALCULATION_ENGINE_TOLERANCE
+
+
+@pytest.mark.parametrize("start_date, end_date", [
+    (date(2023, 3, 1), date(2023, 3, 1)),
+    # across the end of a year into a leap year, the daily margin changes on January 1st
+    (date(2023, 11, 15), date(2024, 3, 20)),
+    (date(2022, 1, 3), date(2025, 12, 31)),
+])
+def test_grid_totals_match_every_loan_calculated_on_its_own(base_interest_rate_index, start_date, end_date):
+    grid = calculate_loan_grid(
+        start_date=start_date, end_date=end_date, loan_amounts=LOAN_AMOUNTS, annual_margins=ANNUAL_MARGINS,
+        base_interest_rates=base_interest_rate_index.rates_between(start_date=start_date, end_date=end_date)
+    )
+
+    for i, loan_amount in enumerate(LOAN_AMOUNTS):
+        for j, annual_margin in enumerate(ANNUAL_MARGINS):
+            calculation_results = calculate_loan(
+                start_date=start_date, end_date=end_date, loan_amount=loan_amount, currency="USD",
+                annual_margin=annual_margin, base_interest_rates=base_interest_rate_index
+            )
+            loan_totals = calculate_loan_totals(
+                start_date=start_date, end_date=end_date, loan_amount=loan_amount, annual_margin=annual_margin,
+                base_interest_rate_index=base_interest_rate_index
+            )
+            assert_within_tolerance(
+                grid.total_interest[i, j], sum(result.interest_accrual_amount for result in calculation_results)
+            )
+            assert_within_tolerance(grid.total_interest[i, j], loan_totals.total_interest)
+            assert_within_tolerance(grid.total_interest_without_margin[i], loan_totals.total_interest_without_margin)
+
+
+def test_grid_schedules_match_every_loan_calculated_on_its_own(base_interest_rate_index):
+    start_date, end_date = date(2023, 11, 15), date(2024, 3, 20)
+
+    grid = calculate_loan_grid(
+        start_date=start_date, end_date=end_date, loan_amounts=LOAN_AMOUNTS, annual_margins=ANNUAL_MARGINS,
+        base_interest_rates=base_interest_rate_index.rates_between(start_date=start_date, end_date=end_date),
+        with_calculation_results=True
+    )
+
+    assert grid.date_axis.tolist() == [
+        result.date for result in calculate_loan(
+            start_date=start_date, end_date=end_date, loan_amount=Decimal(1), currency="USD",
+            annual_margin=Decimal(0), base_interest_rates=base_interest_rate_index
+        )
+    ]
+    for i, loan_amount in enumerate(LOAN_AMOUNTS):
+        for j, annual_margin in enumerate(ANNUAL_MARGINS):
+            calculation_results = calculate_loan(
+                start_date=start_date, end_date=end_date, loan_amount=loan_amount, currency="USD",
+                annual_margin=annual_margin, base_interest_rates=base_interest_rate_index
+            )
+            for day, result in enumerate(calculation_results):
+                assert_within_tolerance(grid.interest_accrual_amounts[i, j, day], result.interest_accrual_amount)
+                assert_within_tolerance(
+                    grid.interest_accrual_amounts_without_margin[i, day], result.interest_accrual_amount_without_margin
+                )
@@ -0,0 +1,128 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from db.loan_recomputation import LoanRecomputation
+from db.unit_of_work import UnitOfWork
+from db.data_repositories.base_interest_rate_repository import (
+    BaseInterestRateRepository,
+    CreateBaseInterestRateSchema
+)
+from db.data_repositories.loan_repository import LoanRepository
+from tests.conftest import write_base_interest_rates
+from tests.test_loan_update import (
+    assert_same_schedule,
+    create_loan,
+    LOAN_PARAMETERS
+)
+
+
+class LoanRecomputationInterrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def loan_recomputation(app):
+    loan_recomputation = LoanRecomputation(app.db_connection, batch_size=1, workers=1)
+    # closes the changes of the initial rates, there are no loans yet
+    loan_recomputation.run()
+    yield loan_recomputation
+    loan_recomputation.close()
+
+
+@pytest.fixture
+def recomputed_ids(monkeypatch):
+    # the ids of the loans LoanRepository.recompute_days was called for
+    recomputed_ids = []
+    recompute_days = LoanRepository.recompute_days
+
+    def record_recompute_days(self, loan, **kwargs):
+        recomputed_ids.append(loan.id)
+        return recompute_days(self, loan=loan, **kwargs)
+
+    monkeypatch.setattr(LoanRepository, "recompute_days", record_recompute_days)
+    return recomputed_ids
+
+
+def change_base_interest_rates():
+    # March 2023 of USD gets a rate of its own, every loan of LOAN_PARAMETERS runs over it
+    write_base_interest_rates([
+        CreateBaseInterestRateSchema(currency="USD", date=date(2023, 3, day), interest_rate=Decimal("0.0003"))
+        for day in range(1, 32)
+    ])
+
+
+def get_loan(app, loan_id):
+    with UnitOfWork(app.db_connection) as unit_of_work:
+        return LoanRepository(session=unit_of_work.session).get(loan_id, with_calculation_results=False)
+
+
+def get_unrecomputed_changes(app):
+    with UnitOfWork(app.db_connection) as unit_of_work:
+        return BaseInterestRateRepository(session=unit_of_work.session).get_unrecomputed_changes()
+
+
+def test_recomputation_keeps_the_loan_version_and_updated_on(app, client, loan_recomputation):
+    loan_id = create_loan(client, LOAN_PARAMETERS)
+    loan = get_loan(app, loan_id)
+    change_base_interest_rates()
+
+    stats = loan_recomputation.run()
+
+    assert (stats.loans, stats.skipped, stats.failed) == (1, 0, 0)
+    recomputed_loan = get_loan(app, loan_id)
+    assert (recomputed_loan.version, recomputed_loan.updated_on) == (loan.version, loan.updated_on)
+    assert recomputed_loan.base_interest_rate_version > loan.base_interest_rate_version
+    expected_loan_id = create_loan(client, LOAN_PARAMETERS)
+    assert_same_schedule(client.get(f"/api/loan/{loan_id}").json, client.get(f"/api/loan/{expected_loan_id}").json)
+    assert get_unrecomputed_changes(app) == []
+
+
+def test_loan_put_while_its_batch_is_recalculated_is_kept(app, client, loan_recomputation, monkeypatch):
+    loan_id = create_loan(client, LOAN_PARAMETERS)
+    change_base_interest_rates()
+    put_loan_parameters = {**LOAN_PARAMETERS, "amount": 2500, "end_date": "2024-02-06"}
+    recompute_days = LoanRepository.recompute_days
+
+    def put_before_recompute_days(self, loan, **kwargs):
+        # the loan was read by the recomputation before the PUT committed
+        response = client.put(f"/api/loan/{loan.id}", json=put_loan_parameters)
+        assert response.status_code == 200, response.json
+        return recompute_days(self, loan=loan, **kwargs)
+
+    monkeypatch.setattr(LoanRepository, "recompute_days", put_before_recompute_days)
+    stats = loan_recomputation.run()
+
+    assert (stats.loans, stats.skipped, stats.failed) == (0, 1, 0)
+    put_loan = client.get(f"/api/loan/{loan_id}").json
+    assert put_loan["amount"] == 2500
+    expected_loan_id = create_loan(client, put_loan_parameters)
+    assert_same_schedule(put_loan, client.get(f"/api/loan/{expected_loan_id}").json)
+    # the PUT calculated the loan with the changed rates, nothing is left to retry
+    assert get_unrecomputed_changes(app) == []
+
+
+def test_interrupted_recomputation_resumes_after_its_checkpoint(app, client, loan_recomputation, recomputed_ids):
+    loan_ids = [create_loan(client, LOAN_PARAMETERS) for _ in range(3)]
+    change_base_interest_rates()
+
+    def interrupt(change, stats):
+        raise LoanRecomputationInterrupted()
+
+    with pytest.raises(LoanRecomputationInterrupted):
+        loan_recomputation.run(on_progress=interrupt)
+
+    # the first batch was committed together with its checkpoint
+    [change] = get_unrecomputed_changes(app)
+    assert change.recomputed_up_to_loan_id == loan_ids[0]
+    assert recomputed_ids == loan_ids[:1]
+
+    stats = loan_recomputation.run()
+
+    assert (stats.changes, stats.loans, stats.skipped, stats.failed) == (1, 2, 0, 0)
+    assert recomputed_ids == loan_ids
+    assert get_unrecomputed_changes(app) == []
+    expected_loan = client.get(f"/api/loan/{create_loan(client, LOAN_PARAMETERS)}").json
+    for loan_id in loan_ids:
+        assert_same_schedule(client.get(f"/api/loan/{loan_id}").json, expected_loan)
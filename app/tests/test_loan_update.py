@@ -0,0 +1,99 @@
+import pytest
+
+from db.unit_of_work import UnitOfWork
+from db.data_repositories.loan_repository import (
+    LoanRepository,
+    PACKED_SCHEDULE_STORAGE
+)
+
+LOAN_PARAMETERS = {
+    "amount": 1000, "currency": "USD", "annual_margin_in_percent": 2.5,
+    "start_date": "2023-01-10", "end_date": "2023-12-05"
+}
+
+
+@pytest.fixture
+def incremental_updates(monkeypatch):
+    # the ids of the loans LoanRepository.update_incrementally was called for
+    updated_ids = []
+    update_incrementally = LoanRepository.update_incrementally
+
+    def record_update_incrementally(self, loan, update_loan_parameters):
+        updated_ids.append(loan.id)
+        return update_incrementally(self, loan=loan, update_loan_parameters=update_loan_parameters)
+
+    monkeypatch.setattr(LoanRepository, "update_incrementally", record_update_incrementally)
+    return updated_ids
+
+
+def create_loan(client, loan_parameters) -> int:
+    response = client.post("/api/loans", json=loan_parameters)
+    assert response.status_code == 200, response.json
+    return response.json["id"]
+
+
+def assert_same_schedule(loan, expected_loan):
+    assert loan["total_interest"] == pytest.approx(expected_loan["total_interest"], rel=1e-12)
+    assert len(loan["calculation_results"]) == len(expected_loan["calculation_results"])
+    for result, expected_result in zip(loan["calculation_results"], expected_loan["calculation_results"]):
+        assert result["date"] == expected_result["date"]
+        assert result["days_elapsed_since_loan_start_date"] == expected_result["days_elapsed_since_loan_start_date"]
+        assert result["interest_accrual_amount"] == pytest.approx(
+            expected_result["interest_accrual_amount"], rel=1e-12
+        )
+        assert result["interest_accrual_amount_without_margin"] == pytest.approx(
+            expected_result["interest_accrual_amount_without_margin"], rel=1e-12
+        )
+
+
+@pytest.mark.parametrize("loan_parameters, changes, incremental", [
+    # the end is extended into the next year
+    (LOAN_PARAMETERS, {"end_date": "2024-02-06"}, True),
+    (LOAN_PARAMETERS, {"end_date": "2023-06-06"}, True),
+    # the amount and the margin of a loan running over two years, each year has its own daily margin
+    ({**LOAN_PARAMETERS, "end_date": "2024-02-06"}, {"amount": 2500, "annual_margin_in_percent": 7}, True),
+    ({**LOAN_PARAMETERS, "end_date": "2024-02-06"}, {"annual_margin_in_percent": 0, "end_date": "2025-01-07"}, True),
+    # every day moves with a shifted start, so does the base rate of every day with another currency
+    (LOAN_PARAMETERS, {"start_date": "2023-01-11"}, False),
+    (LOAN_PARAMETERS, {"currency": "GBP"}, False),
+])
+def test_put_matches_a_freshly_created_loan(client, incremental_updates, loan_parameters, changes, incremental):
+    loan_id = create_loan(client, loan_parameters)
+
+    response = client.put(f"/api/loan/{loan_id}", json={**loan_parameters, **changes})
+
+    assert response.status_code == 200, response.json
+    assert incremental_updates == ([loan_id] if incremental else [])
+    expected_loan_id = create_loan(client, {**loan_parameters, **changes})
+    assert_same_schedule(client.get(f"/api/loan/{loan_id}").json, client.get(f"/api/loan/{expected_loan_id}").json)
+
+
+def test_put_of_a_loan_stored_in_another_storage_is_recalculated_in_full(app, client, incremental_updates):
+    loan_id = create_loan(client, LOAN_PARAMETERS)
+    with UnitOfWork(app.db_connection) as unit_of_work:
+        LoanRepository(session=unit_of_work.session).pack_calculation_results(loan_id)
+        unit_of_work.commit()
+
+    response = client.put(f"/api/loan/{loan_id}", json={**LOAN_PARAMETERS, "end_date": "2024-02-06"})
+
+    assert response.status_code == 200, response.json
+    assert incremental_updates == []
+    with UnitOfWork(app.db_connection) as unit_of_work:
+        assert LoanRepository(session=unit_of_work.session).get(loan_id).schedule_storage != PACKED_SCHEDULE_STORAGE
+    expected_loan_id = create_loan(client, {**LOAN_PARAMETERS, "end_date": "2024-02-06"})
+    assert_same_schedule(client.get(f"/api/loan/{loan_id}").json, client.get(f"/api/loan/{expected_loan_id}").json)
+
+
+def test_put_after_a_rate_change_is_recalculated_in_full(client, incremental_updates):
+    loan_id = create_loan(client, LOAN_PARAMETERS)
+    response = client.post("/api/base-interest-rates", json={"ranges": [
+        {"currency": "USD", "start_date": "2023-03-01", "end_date": "2023-03-31", "interest_rate": "0.0005"}
+    ]})
+    assert response.status_code == 200, response.json
+
+    response = client.put(f"/api/loan/{loan_id}", json={**LOAN_PARAMETERS, "end_date": "2024-02-06"})
+
+    assert response.status_code == 200, response.json
+    assert incremental_updates == []
+    expected_loan_id = create_loan(client, {**LOAN_PARAMETERS, "end_date": "2024-02-06"})
+    assert_same_schedule(client.get(f"/api/loan/{loan_id}").json, client.get(f"/api/loan/{expected_loan_id}").json)
@@ -0,0 +1,38 @@
+from datetime import date
+
+import pytest
+
+from web_api.errors import (
+    LoanEndDateOnWeekendError,
+    LoanStartDateOnWeekendError,
+    LoanStartOrAndDateFallsOnBankHolidayError,
+    validate_loan_inputs
+)
+
+
+def validate_dates(start_date: date, end_date: date, currency: str = "USD"):
+    validate_loan_inputs(
+        start_date=start_date, end_date=end_date, loan_amount=1000, currency=currency, annual_margin_in_percent=1
+    )
+
+
+@pytest.mark.parametrize("start_date, end_date, error", [
+    # a Saturday start and a Sunday end
+    (date(2023, 1, 7), date(2023, 2, 1), LoanStartDateOnWeekendError),
+    (date(2023, 1, 10), date(2023, 1, 15), LoanEndDateOnWeekendError),
+    # Independence Day and Thanksgiving of the US calendar
+    (date(2023, 7, 4), date(2023, 8, 1), LoanStartOrAndDateFallsOnBankHolidayError),
+    (date(2023, 1, 10), date(2023, 11, 23), LoanStartOrAndDateFallsOnBankHolidayError),
+])
+def test_loan_dates_have_to_be_business_days(start_date, end_date, error):
+    with pytest.raises(error):
+        validate_dates(start_date, end_date)
+
+
+def test_holidays_follow_the_currency_calendar():
+    # Thanksgiving is a business day in the UK
+    validate_dates(date(2023, 1, 10), date(2023, 11, 23), currency="GBP")
+    with pytest.raises(LoanStartOrAndDateFallsOnBankHolidayError):
+        # the Summer bank holiday of England
+        validate_dates(date(2023, 1, 10), date(2023, 8, 28), currency="GBP")
+    validate_dates(date(2023, 1, 10), date(2023, 8, 28), currency="USD")
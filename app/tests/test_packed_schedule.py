@@ -0,0 +1,189 @@
+from datetime import (
+    date,
+    timedelta
+)
+from decimal import Decimal
+
+import pytest
+
+from db.packed_schedule import (
+    fits_packed_schedule,
+    pack_schedule,
+    patch_schedule,
+    InvalidPackedScheduleError,
+    PackedSchedule,
+    PackedScheduleOverflowError
+)
+from db.unit_of_work import UnitOfWork
+from db.data_repositories.loan_repository import (
+    CreateDailyLoanCalculationResultSchema,
+    CreateLoanSchema,
+    LoanRepository,
+    PACKED_SCHEDULE_STORAGE,
+    ROWS_SCHEDULE_STORAGE
+)
+
+START_DATE = date(2023, 1, 10)
+DAYS = 60
+# larger than any daily amount a packed value can hold
+OVERFLOWING_AMOUNT = Decimal("1e11")
+
+
+def build_calculation_results(days_elapsed, scale=Decimal(1)):
+    # amounts with every one of the 9 packed decimals used
+    return [
+        CreateDailyLoanCalculationResultSchema(
+            date=START_DATE + timedelta(days=day),
+            interest_accrual_amount=Decimal("0.123456789") * (day + 1) * scale,
+            interest_accrual_amount_without_margin=Decimal("0.012345678") * (day + 1) * scale,
+            days_elapsed_since_loan_start_date=day
+        ) for day in days_elapsed
+    ]
+
+
+def assert_same_results(results, expected_results):
+    results, expected_results = list(results), list(expected_results)
+    assert len(results) == len(expected_results)
+    for result, expected_result in zip(results, expected_results):
+        assert result.date == expected_result.date
+        assert result.days_elapsed_since_loan_start_date == expected_result.days_elapsed_since_loan_start_date
+        assert float(result.interest_accrual_amount) == pytest.approx(
+            float(expected_result.interest_accrual_amount), abs=1e-9
+        )
+        assert float(result.interest_accrual_amount_without_margin) == pytest.approx(
+            float(expected_result.interest_accrual_amount_without_margin), abs=1e-9
+        )
+
+
+def add_loan(engine, schedule_storage, calculation_results) -> int:
+    with UnitOfWork(engine) as unit_of_work:
+        loan = LoanRepository(session=unit_of_work.session, schedule_storage=schedule_storage).add(
+            CreateLoanSchema(
+                amount=1000, currency="USD", annual_margin=Decimal("0.025"), total_interest=1,
+                start_date=START_DATE, end_date=START_DATE + timedelta(days=len(calculation_results) - 1),
+                base_interest_rate_version=1, calculation_results=calculation_results
+            )
+        )
+        unit_of_work.commit()
+        return loan.id
+
+
+def get_loan(engine, loan_id):
+    with UnitOfWork(engine) as unit_of_work:
+        loan = LoanRepository(session=unit_of_work.session).get(loan_id)
+        return loan, list(loan.calculation_results)
+
+
+def recompute_days(engine, loan_id, calculation_results) -> bool:
+    with UnitOfWork(engine) as unit_of_work:
+        loan_repository = LoanRepository(session=unit_of_work.session)
+        recomputed = loan_repository.recompute_days(
+            loan=loan_repository.get(loan_id, with_calculation_results=False), total_interest=2,
+            base_interest_rate_version=2, calculation_results=calculation_results
+        )
+        unit_of_work.commit()
+    return recomputed
+
+
+def test_packed_schedule_reads_back_every_day():
+    calculation_results = build_calculation_results(range(DAYS))
+
+    schedule = PackedSchedule(pack_schedule(start_date=START_DATE, calculation_results=calculation_results))
+
+    assert (schedule.start_date, len(schedule)) == (START_DATE, DAYS)
+    assert_same_results(schedule, calculation_results)
+
+
+def test_pack_schedule_needs_every_day_from_the_start_date():
+    with pytest.raises(InvalidPackedScheduleError):
+        pack_schedule(start_date=START_DATE, calculation_results=build_calculation_results([0, 1, 3]))
+
+
+def test_patch_schedule_rewrites_only_the_given_days():
+    calculation_results = build_calculation_results(range(DAYS))
+    patched_results = build_calculation_results(range(10, 20), scale=Decimal(3))
+
+    schedule = PackedSchedule(patch_schedule(
+        pack_schedule(start_date=START_DATE, calculation_results=calculation_results),
+        calculation_results=patched_results
+    ))
+
+    assert_same_results(schedule, calculation_results[:10] + patched_results + calculation_results[20:])
+
+
+def test_patch_schedule_rejects_days_outside_the_schedule():
+    blob = pack_schedule(start_date=START_DATE, calculation_results=build_calculation_results(range(DAYS)))
+
+    with pytest.raises(InvalidPackedScheduleError):
+        patch_schedule(blob, calculation_results=build_calculation_results([DAYS]))
+
+
+def test_amounts_too_large_for_packed_values_overflow():
+    calculation_results = build_calculation_results(range(DAYS))
+    calculation_results[5] = calculation_results[5].copy(update={"interest_accrual_amount": OVERFLOWING_AMOUNT})
+
+    assert not fits_packed_schedule(calculation_results)
+    with pytest.raises(PackedScheduleOverflowError):
+        pack_schedule(start_date=START_DATE, calculation_results=calculation_results)
+    with pytest.raises(PackedScheduleOverflowError):
+        patch_schedule(
+            pack_schedule(start_date=START_DATE, calculation_results=build_calculation_results(range(DAYS))),
+            calculation_results=calculation_results[5:6]
+        )
+
+
+def test_packed_loan_reads_back_like_a_rows_loan(database):
+    calculation_results = build_calculation_results(range(DAYS))
+    rows_loan_id = add_loan(database, ROWS_SCHEDULE_STORAGE, calculation_results)
+    packed_loan_id = add_loan(database, PACKED_SCHEDULE_STORAGE, calculation_results)
+
+    rows_loan, rows_results = get_loan(database, rows_loan_id)
+    packed_loan, packed_results = get_loan(database, packed_loan_id)
+
+    assert (rows_loan.schedule_storage, packed_loan.schedule_storage) == (
+        ROWS_SCHEDULE_STORAGE, PACKED_SCHEDULE_STORAGE
+    )
+    assert_same_results(rows_results, calculation_results)
+    assert_same_results(packed_results, rows_results)
+
+
+def test_packing_a_rows_loan_keeps_its_schedule(database):
+    loan_id = add_loan(database, ROWS_SCHEDULE_STORAGE, build_calculation_results(range(DAYS)))
+    _, rows_results = get_loan(database, loan_id)
+
+    with UnitOfWork(database) as unit_of_work:
+        days = LoanRepository(session=unit_of_work.session).pack_calculation_results(loan_id)
+        unit_of_work.commit()
+
+    loan, packed_results = get_loan(database, loan_id)
+    assert (days, loan.schedule_storage) == (DAYS, PACKED_SCHEDULE_STORAGE)
+    assert_same_results(packed_results, rows_results)
+
+
+def test_loan_with_amounts_too_large_to_pack_is_stored_as_rows(database):
+    calculation_results = build_calculation_results(range(DAYS), scale=OVERFLOWING_AMOUNT)
+
+    loan, results = get_loan(database, add_loan(database, PACKED_SCHEDULE_STORAGE, calculation_results))
+
+    assert loan.schedule_storage == ROWS_SCHEDULE_STORAGE
+    assert [result.days_elapsed_since_loan_start_date for result in results] == list(range(DAYS))
+
+
+@pytest.mark.parametrize("recomputed_results, schedule_storage", [
+    (build_calculation_results(range(10, 20), scale=Decimal(3)), PACKED_SCHEDULE_STORAGE),
+    # a recomputed day too large to pack moves the loan to rows, its other days are kept
+    (build_calculation_results(range(10, 20), scale=OVERFLOWING_AMOUNT), ROWS_SCHEDULE_STORAGE),
+])
+def test_recomputed_packed_loan_matches_a_recomputed_rows_loan(database, recomputed_results, schedule_storage):
+    calculation_results = build_calculation_results(range(DAYS))
+    rows_loan_id = add_loan(database, ROWS_SCHEDULE_STORAGE, calculation_results)
+    packed_loan_id = add_loan(database, PACKED_SCHEDULE_STORAGE, calculation_results)
+
+    assert recompute_days(database, rows_loan_id, recomputed_results)
+    assert recompute_days(database, packed_loan_id, recomputed_results)
+
+    _, rows_results = get_loan(database, rows_loan_id)
+    packed_loan, packed_results = get_loan(database, packed_loan_id)
+    assert packed_loan.schedule_storage == schedule_storage
+    assert_same_results(rows_results, calculation_results[:10] + recomputed_results + calculation_results[20:])
+    assert_same_results(packed_results, rows_results)
@@ -0,0 +1,137 @@
+from datetime import (
+    date,
+    timedelta
+)
+from decimal import Decimal
+
+import pytest
+
+from calculator.loan import (
+    BaseInterestRateNotFound,
+    BaseInterestRatePeriod
+)
+from calculator.rate_index import BaseInterestRateIndex
+
+START_DATE = date(2022, 1, 1)
+END_DATE = date(2022, 1, 10)
+
+
+def build_rates(start_date: date, end_date: date, rate: Decimal):
+    return [(start_date + timedelta(days=i), rate) for i in range((end_date - start_date).days + 1)]
+
+
+def assert_same_index(index: BaseInterestRateIndex, expected: BaseInterestRateIndex):
+    assert index.start_date == expected.start_date
+    assert index.periods == expected.periods
+    assert index.prefix_sums == expected.prefix_sums
+    assert index.missing_prefix_counts == expected.missing_prefix_counts
+
+
+@pytest.mark.parametrize("changed_rates", [
+    # a gap before the start
+    build_rates(date(2021, 12, 20), date(2021, 12, 22), Decimal("0.0002")),
+    # right after the end
+    build_rates(date(2022, 1, 11), date(2022, 1, 12), Decimal("0.0002")),
+    # a gap after the end
+    build_rates(date(2022, 2, 1), date(2022, 2, 3), Decimal("0.0002")),
+    # inside the range
+    build_rates(date(2022, 1, 4), date(2022, 1, 5), Decimal("0.0002")),
+    # inside the range and past the end
+    build_rates(date(2022, 1, 8), date(2022, 1, 15), Decimal("0.0002")),
+])
+def test_set_rates_matches_index_built_from_scratch(changed_rates):
+    rates = build_rates(START_DATE, END_DATE, Decimal("0.0001"))
+    index = BaseInterestRateIndex.from_rates(currency="EUR", rates=rates)
+
+    index.set_rates(changed_rates)
+
+    expected = BaseInterestRateIndex.from_rates(currency="EUR", rates=dict(rates + changed_rates).items())
+    assert_same_index(index, expected)
+
+
+def test_set_rates_deletes_past_the_end():
+    index = BaseInterestRateIndex.from_rates(currency="EUR", rates=build_rates(START_DATE, END_DATE, Decimal("0.0001")))
+
+    index.set_rates((date(2022, 2, 1) + timedelta(days=i), None) for i in range(3))
+
+    # deleting days that had no rate leaves the index as it was
+    assert index.end_date == END_DATE
+    assert index.sum_between(START_DATE, END_DATE) == Decimal("0.0010")
+    assert index.prefix_sums[-1] == Decimal("0.0010")
+    assert index.missing_prefix_counts[-1] == 0
+
+
+def build_stepped_rates():
+    # three runs, a gap of missing days and a fourth run
+    return (
+        build_rates(date(2022, 1, 1), date(2022, 1, 31), Decimal("0.0001"))
+        + build_rates(date(2022, 2, 1), date(2022, 2, 28), Decimal("0.0002"))
+        + build_rates(date(2022, 3, 1), date(2022, 3, 10), Decimal("0.0001"))
+        + build_rates(date(2022, 4, 1), date(2022, 4, 30), Decimal("0.0003"))
+    )
+
+
+def test_index_keeps_one_run_per_constant_rate():
+    index = BaseInterestRateIndex.from_rates(currency="EUR", rates=build_stepped_rates())
+
+    assert [(period.valid_from, period.valid_to, period.interest_rate) for period in index.periods] == [
+        (date(2022, 1, 1), date(2022, 1, 31), Decimal("0.0001")),
+        (date(2022, 2, 1), date(2022, 2, 28), Decimal("0.0002")),
+        (date(2022, 3, 1), date(2022, 3, 10), Decimal("0.0001")),
+        (date(2022, 3, 11), date(2022, 3, 31), None),
+        (date(2022, 4, 1), date(2022, 4, 30), Decimal("0.0003")),
+    ]
+    assert_same_index(BaseInterestRateIndex.from_periods(currency="EUR", periods=index.periods), index)
+
+
+@pytest.mark.parametrize("start_date, end_date", [
+    (date(2022, 1, 1), date(2022, 3, 10)),
+    (date(2022, 1, 15), date(2022, 2, 14)),
+    (date(2022, 2, 28), date(2022, 3, 1)),
+    (date(2022, 4, 2), date(2022, 4, 2)),
+])
+def test_sums_and_lookups_match_the_daily_rates(start_date, end_date):
+    rates = dict(build_stepped_rates())
+    index = BaseInterestRateIndex.from_rates(currency="EUR", rates=rates.items())
+    days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+    assert index.sum_between(start_date, end_date) == sum(rates[day] for day in days)
+    assert [index[("EUR", day)] for day in days] == [rates[day] for day in days]
+    assert index.rates_between(start_date, end_date).tolist() == [float(rates[day]) for day in days]
+    assert index.between(start_date, end_date).sum_between(start_date, end_date) == sum(rates[day] for day in days)
+
+
+@pytest.mark.parametrize("start_date, end_date", [
+    (date(2021, 12, 31), date(2022, 1, 5)),
+    (date(2022, 3, 5), date(2022, 4, 5)),
+    (date(2022, 4, 30), date(2022, 5, 1)),
+])
+def test_ranges_with_missing_days_raise(start_date, end_date):
+    index = BaseInterestRateIndex.from_rates(currency="EUR", rates=build_stepped_rates())
+
+    with pytest.raises(BaseInterestRateNotFound):
+        index.sum_between(start_date, end_date)
+    with pytest.raises(BaseInterestRateNotFound):
+        index.periods_between(start_date, end_date)
+
+
+def test_set_periods_replaces_the_range():
+    index = BaseInterestRateIndex.from_rates(currency="EUR", rates=build_stepped_rates())
+    changed = index.copy()
+
+    changed.set_periods(date(2022, 1, 20), date(2022, 3, 20), [
+        BaseInterestRatePeriod(date(2022, 1, 1), date(2022, 2, 10), Decimal("0.0001")),
+        BaseInterestRatePeriod(date(2022, 2, 11), date(2022, 3, 5), Decimal("0.0004")),
+    ])
+
+    expected_rates = dict(build_stepped_rates())
+    for i in range((date(2022, 3, 20) - date(2022, 1, 20)).days + 1):
+        day = date(2022, 1, 20) + timedelta(days=i)
+        expected_rates.pop(day, None)
+        if day <= date(2022, 2, 10):
+            expected_rates[day] = Decimal("0.0001")
+        elif day <= date(2022, 3, 5):
+            expected_rates[day] = Decimal("0.0004")
+    assert_same_index(changed, BaseInterestRateIndex.from_rates(currency="EUR", rates=expected_rates.items()))
+    # the copy changed, not the original
+    assert_same_index(index, BaseInterestRateIndex.from_rates(currency="EUR", rates=build_stepped_rates()))
@@ -0,0 +1,116 @@
+import pytest
+from sqlalchemy import create_engine
+
+from db import replicas
+from db.replicas import (
+    set_replica_router,
+    ReplicaRouter,
+    LEAST_CONNECTIONS_ROUTING
+)
+from db.unit_of_work import (
+    ReadOnlyUnitOfWorkError,
+    UnitOfWork
+)
+
+READ_YOUR_WRITES_SECONDS = 2.0
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(replicas, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def engines(tmp_path):
+    primary, *replica_engines = [create_engine(f"sqlite:///{tmp_path}/{name}.sqlite") for name in ("p", "r1", "r2")]
+    yield primary, replica_engines
+    for engine in [primary, *replica_engines]:
+        engine.dispose()
+
+
+@pytest.fixture
+def replica_router(engines, clock):
+    primary, replica_engines = engines
+    replica_router = ReplicaRouter(
+        primary=primary, replicas=replica_engines, read_your_writes_seconds=READ_YOUR_WRITES_SECONDS
+    )
+    set_replica_router(primary, replica_router)
+    yield replica_router
+    set_replica_router(primary, None)
+
+
+def read_engine(primary):
+    with UnitOfWork(primary, read_only=True) as unit_of_work:
+        return unit_of_work.engine
+
+
+def test_reads_go_round_robin_to_the_replicas(engines, replica_router):
+    primary, replica_engines = engines
+
+    assert [read_engine(primary) for _ in range(4)] == replica_engines * 2
+    assert replica_router.reads == [2, 2]
+    assert replica_router.in_flight == [0, 0]
+
+
+def test_reads_after_a_commit_go_to_the_primary_for_the_window(engines, replica_router, clock):
+    primary, replica_engines = engines
+    with UnitOfWork(primary) as unit_of_work:
+        unit_of_work.commit()
+
+    clock.now += READ_YOUR_WRITES_SECONDS - 0.1
+    assert read_engine(primary) is primary
+    clock.now += 0.1
+    assert read_engine(primary) is replica_engines[0]
+    assert replica_router.read_your_writes_reads == 1
+
+
+def test_read_your_writes_window_of_zero_never_reads_from_the_primary(engines, replica_router):
+    primary, replica_engines = engines
+    replica_router.read_your_writes_seconds = 0
+    with UnitOfWork(primary) as unit_of_work:
+        unit_of_work.commit()
+
+    assert read_engine(primary) is replica_engines[0]
+
+
+def test_without_replicas_reads_fall_back_to_the_primary(engines):
+    primary, _ = engines
+
+    with UnitOfWork(primary, read_only=True) as unit_of_work:
+        assert unit_of_work.engine is primary
+        with pytest.raises(ReadOnlyUnitOfWorkError):
+            unit_of_work.commit()
+
+
+def test_least_connections_routing_skips_busy_replicas(engines, clock):
+    primary, replica_engines = engines
+    replica_router = ReplicaRouter(primary=primary, replicas=replica_engines, routing=LEAST_CONNECTIONS_ROUTING)
+
+    busy = replica_router.acquire()
+    assert [replica_router.acquire() for _ in range(2)] == [replica_engines[1], replica_engines[0]]
+    replica_router.release(busy)
+
+    assert replica_router.in_flight == [1, 1]
+    # the primary isn't counted against any replica
+    replica_router.release(primary)
+    assert replica_router.in_flight == [1, 1]
+
+
+def test_router_needs_a_replica_and_a_known_routing(engines):
+    primary, replica_engines = engines
+
+    with pytest.raises(ValueError):
+        ReplicaRouter(primary=primary, replicas=[])
+    with pytest.raises(ValueError):
+        ReplicaRouter(primary=primary, replicas=replica_engines, routing="random")
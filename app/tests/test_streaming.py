@@ -0,0 +1,42 @@
+import pytest
+
+from db.engine import get_pool_stats
+
+CREATE_LOAN_PARAMETERS = {
+    "amount": 1000000, "currency": "USD", "annual_margin_in_percent": 2.5,
+    "start_date": "2023-01-10", "end_date": "2024-01-09"
+}
+
+
+@pytest.fixture
+def loan_id(client):
+    response = client.post("/api/loans", json=CREATE_LOAN_PARAMETERS)
+    assert response.status_code == 200, response.json
+    return response.json["id"]
+
+
+@pytest.mark.parametrize("requested_format", ["ndjson", "csv"])
+def test_head_releases_the_streaming_connection(app, client, loan_id, requested_format):
+    # closing the response is what the WSGI server does once the (empty) body is written
+    for _ in range(3):
+        with client.head(f"/api/loan/{loan_id}?format={requested_format}") as response:
+            assert response.status_code == 200
+
+    assert get_pool_stats(app.db_connection)["checked_out"] == 0
+
+
+def test_unread_stream_releases_the_connection_on_close(app, client, loan_id):
+    response = client.get(f"/api/loan/{loan_id}?format=ndjson", buffered=False)
+    assert get_pool_stats(app.db_connection)["checked_out"] == 1
+
+    response.close()
+
+    assert get_pool_stats(app.db_connection)["checked_out"] == 0
+
+
+@pytest.mark.parametrize("requested_format", ["ndjson", "csv"])
+def test_streamed_schedule_has_every_day(client, loan_id, requested_format):
+    with client.get(f"/api/loan/{loan_id}?format={requested_format}") as response:
+        assert response.status_code == 200
+        # ndjson has the loan on the first line, csv the header
+        assert len(response.data.decode().splitlines()) == 1 + 365
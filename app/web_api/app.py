@@ -1,16 +1,58 @@
+import os
+from typing import (
+    List,
+    Optional
+)
+
 from flask import Flask
-from sqlalchemy import create_engine
 from flask_smorest import Api
 
+from calculator.engines import get_loan_calculation_engine
+from db.engine import get_engine
+from db.replicas import (
+    set_replica_router,
+    ReplicaRouter,
+    DB_REPLICA_CONNECTION_STRINGS
+)
+from db.unit_of_work import UnitOfWork
+from db.base_interest_rate_cache import BaseInterestRateCache
+from web_api.cache import LRUCache
+from web_api.json_responses import get_loan_json_encoder
+from web_api.instrumentation import init_request_timing
 from web_api.views import api_blp
 
+BASE_INTEREST_RATE_CACHE_PRELOAD = os.environ.get("BASE_INTEREST_RATE_CACHE_PRELOAD", "true").lower() == "true"
+# number of regenerated schedules of "computed" storage loans kept in memory, 0 disables the cache
+LOAN_SCHEDULE_CACHE_SIZE = int(os.environ.get("LOAN_SCHEDULE_CACHE_SIZE", "128"))
+# number of calculated quotes kept in memory, a ten year quote holds ~3650 days, 0 disables the cache
+LOAN_QUOTE_CACHE_SIZE = int(os.environ.get("LOAN_QUOTE_CACHE_SIZE", "256"))
+
 
-def create_app(api_title: str, api_version: str, openapi_version: str, db_connection_string: str) -> Flask:
+def create_app(
+        api_title: str, api_version: str, openapi_version: str, db_connection_string: str,
+        db_replica_connection_strings: Optional[List[str]] = None
+) -> Flask:
+    # fail fast on a misconfigured engine instead of on the first loan request
+    get_loan_calculation_engine()
+    get_loan_json_encoder()
     app = Flask(__name__)
     app.config["API_TITLE"] = api_title
     app.config["API_VERSION"] = api_version
     app.config["OPENAPI_VERSION"] = openapi_version
-    app.db_connection = create_engine(db_connection_string)
+    app.db_connection = get_engine(db_connection_string)
+    if db_replica_connection_strings is None:
+        db_replica_connection_strings = DB_REPLICA_CONNECTION_STRINGS
+    set_replica_router(app.db_connection, ReplicaRouter(
+        primary=app.db_connection,
+        replicas=[get_engine(connection_string) for connection_string in db_replica_connection_strings]
+    ) if db_replica_connection_strings else None)
+    app.base_interest_rate_cache = BaseInterestRateCache()
+    if BASE_INTEREST_RATE_CACHE_PRELOAD:
+        with UnitOfWork(app.db_connection) as unit_of_work:
+            app.base_interest_rate_cache.load(session=unit_of_work.session)
+    app.loan_schedule_cache = LRUCache(max_size=LOAN_SCHEDULE_CACHE_SIZE)
+    app.loan_quote_cache = LRUCache(max_size=LOAN_QUOTE_CACHE_SIZE)
+    init_request_timing(app)
     api = Api(app)
     api.register_blueprint(api_blp)
     return app
@@ -1,12 +1,30 @@
 import os
 from datetime import date
+from typing import (
+    List,
+    Optional
+)
 
-import holidays
-
+from calculator.business_days import (
+    build_currency_calendars,
+    DEFAULT_CURRENCY_CALENDARS,
+    UK_CALENDAR
+)
 
 LOANS_PERIOD_START = date(int(os.environ["LOANS_PERIOD_START"]), 1, 1)
 LOANS_PERIOD_END = date(int(os.environ["LOANS_PERIOD_END"]), 12, 31)
 MAXIMUM_LOAN_AMOUNT = float(os.environ["MAXIMUM_LOAN_AMOUNT"])
+LOANS_PAGE_SIZE_DEFAULT = int(os.environ.get("LOANS_PAGE_SIZE_DEFAULT", "100"))
+LOANS_PAGE_SIZE_MAX = int(os.environ.get("LOANS_PAGE_SIZE_MAX", "1000"))
+LOANS_BATCH_SIZE_MAX = int(os.environ.get("LOANS_BATCH_SIZE_MAX", "5000"))
+BASE_INTEREST_RATES_PAGE_SIZE_DEFAULT = int(os.environ.get("BASE_INTEREST_RATES_PAGE_SIZE_DEFAULT", "1000"))
+BASE_INTEREST_RATES_PAGE_SIZE_MAX = int(os.environ.get("BASE_INTEREST_RATES_PAGE_SIZE_MAX", "10000"))
+# loans priced by one scenarios request, the number of amounts times the number of margins
+LOAN_SCENARIOS_MAX = int(os.environ.get("LOAN_SCENARIOS_MAX", "10000"))
+# scenarios times loan days when the scenarios' schedules are returned too, bounds the response size
+LOAN_SCENARIO_SCHEDULE_DAYS_MAX = int(os.environ.get("LOAN_SCENARIO_SCHEDULE_DAYS_MAX", "1000000"))
+# days written by one upsert request, a range counts every day it covers
+BASE_INTEREST_RATES_BATCH_SIZE_MAX = int(os.environ.get("BASE_INTEREST_RATES_BATCH_SIZE_MAX", "100000"))
 
 
 class InconsistentLoanStartAndEndDateError(Exception):
@@ -45,12 +63,47 @@ class LoanEndDateOnWeekendError(Exception):
     pass
 
 
+class IncorrectPageSizeError(Exception):
+    pass
+
+
+class IncorrectBatchSizeError(Exception):
+    pass
+
+
+class InconsistentDateRangeError(Exception):
+    pass
+
+
+# everything validate_loan_inputs can raise, used to report errors per loan in batches
+LOAN_INPUT_ERRORS = (
+    CurrencyNotAllowedError,
+    IncorrectLoanAmountError,
+    IncorrectMarginError,
+    OutOfBoundsStartDateError,
+    OutOfBoundsEndDateError,
+    InconsistentLoanStartAndEndDateError,
+    LoanStartDateOnWeekendError,
+    LoanEndDateOnWeekendError,
+    LoanStartOrAndDateFallsOnBankHolidayError,
+)
+
+
 ALLOWED_CURRENCIES = os.environ["LOAN_CURRENCIES"].split(",")
 LOANS_PERIOD_START = int(os.environ["LOANS_PERIOD_START"])
 LOANS_PERIOD_END = int(os.environ["LOANS_PERIOD_END"])
-BANK_HOLIDAYS_UK = [
-    d for d in holidays.UnitedKingdom(years=[y for y in range(LOANS_PERIOD_START, LOANS_PERIOD_END+1)])
-]
+# holiday calendar of every currency as "currency:calendar" pairs, see calculator.business_days,
+# currencies without one keep the UK calendar
+CURRENCY_CALENDARS = {
+    **DEFAULT_CURRENCY_CALENDARS,
+    **dict(
+        pair.split(":") for pair in os.environ.get("CURRENCY_CALENDARS", "").split(",") if pair
+    )
+}
+LOAN_CALENDARS = build_currency_calendars(
+    {currency: CURRENCY_CALENDARS.get(currency, UK_CALENDAR) for currency in ALLOWED_CURRENCIES},
+    start_year=LOANS_PERIOD_START, end_year=LOANS_PERIOD_END
+)
 
 
 def validate_loan_inputs(
@@ -74,11 +127,86 @@ def validate_loan_inputs(
         )
     if start_date >= end_date:
         raise InconsistentLoanStartAndEndDateError("Loan 'start_date' must be before end_date.")
-    if start_date.weekday() in [5, 6]:
-        raise LoanStartDateOnWeekendError(f"Loan 'start_date' can't be weekend day.")
-    if end_date.weekday() in [5, 6]:
-        raise LoanStartDateOnWeekendError(f"Loan 'end_date' can't be weekend day.")
-    if start_date in BANK_HOLIDAYS_UK or end_date in BANK_HOLIDAYS_UK:
-        raise LoanStartOrAndDateFallsOnBankHolidayError(
-            f"Loan 'start_date' and 'end_date' cannot fall on a bank holiday: {[str(d) for d in BANK_HOLIDAYS_UK]}"
+    calendar = LOAN_CALENDARS[currency]
+    for loan_date in [start_date, end_date]:
+        if calendar.is_business_day(loan_date):
+            continue
+        if calendar.is_holiday(loan_date):
+            raise LoanStartOrAndDateFallsOnBankHolidayError(
+                f"Loan 'start_date' and 'end_date' cannot fall on a bank holiday of the {calendar.name} calendar "
+                f"used for {currency}: {loan_date}."
+            )
+        if loan_date == start_date:
+            raise LoanStartDateOnWeekendError(f"Loan 'start_date' can't be weekend day.")
+        raise LoanEndDateOnWeekendError(f"Loan 'end_date' can't be weekend day.")
+
+
+def validate_list_loans_inputs(limit: int):
+    if not(0 < limit <= LOANS_PAGE_SIZE_MAX):
+        raise IncorrectPageSizeError(f"'limit' has to be between 1 and {LOANS_PAGE_SIZE_MAX}.")
+
+
+def validate_loans_batch_inputs(batch_size: int):
+    if not(0 < batch_size <= LOANS_BATCH_SIZE_MAX):
+        raise IncorrectBatchSizeError(f"Number of 'loans' has to be between 1 and {LOANS_BATCH_SIZE_MAX}.")
+
+
+def validate_base_interest_rate_range_inputs(currency: str, date_from: date, date_to: date):
+    if currency not in ALLOWED_CURRENCIES:
+        raise CurrencyNotAllowedError(f"'currency' has to be one of: {ALLOWED_CURRENCIES}.")
+    if date_from > date_to:
+        raise InconsistentDateRangeError(f"'{date_from}' must not be after '{date_to}'.")
+
+
+def validate_portfolio_interest_inputs(currency: Optional[str], date_from: date, date_to: date):
+    if currency is not None and currency not in ALLOWED_CURRENCIES:
+        raise CurrencyNotAllowedError(f"'currency' has to be one of: {ALLOWED_CURRENCIES}.")
+    if date_from > date_to:
+        raise InconsistentDateRangeError(f"'{date_from}' must not be after '{date_to}'.")
+    # no loan accrues outside the loans period, it also bounds the series to the days of the period
+    if not(LOANS_PERIOD_START <= date_from.year and date_to.year <= LOANS_PERIOD_END):
+        raise InconsistentDateRangeError(
+            f"'date_from' and 'date_to' have to be between years {LOANS_PERIOD_START} and {LOANS_PERIOD_END}."
+        )
+
+
+def validate_loan_scenarios_inputs(
+        start_date: date, end_date: date, currency: str,
+        loan_amounts: List[float], annual_margins_in_percent: List[float], with_calculation_results: bool
+):
+    scenarios = len(loan_amounts) * len(annual_margins_in_percent)
+    if not(0 < scenarios <= LOAN_SCENARIOS_MAX):
+        raise IncorrectBatchSizeError(
+            f"Number of 'amounts' times number of 'annual_margins_in_percent' has to be between 1 and "
+            f"{LOAN_SCENARIOS_MAX}."
+        )
+    days = (end_date - start_date).days + 1
+    if with_calculation_results and scenarios * days > LOAN_SCENARIO_SCHEDULE_DAYS_MAX:
+        raise IncorrectBatchSizeError(
+            f"Number of scenarios times loan days has to be at most {LOAN_SCENARIO_SCHEDULE_DAYS_MAX} "
+            f"with 'with_calculation_results', got {scenarios * days}."
+        )
+    # the bounds are checked on the extremes, every other amount and margin of the grid lies between them
+    for loan_amount in {min(loan_amounts), max(loan_amounts)}:
+        validate_loan_inputs(
+            start_date=start_date, end_date=end_date, loan_amount=loan_amount, currency=currency,
+            annual_margin_in_percent=min(annual_margins_in_percent)
+        )
+
+
+def validate_list_base_interest_rates_inputs(limit: int):
+    if not(0 < limit <= BASE_INTEREST_RATES_PAGE_SIZE_MAX):
+        raise IncorrectPageSizeError(f"'limit' has to be between 1 and {BASE_INTEREST_RATES_PAGE_SIZE_MAX}.")
+
+
+def validate_base_interest_rates_batch_inputs(batch_size: int, range_days: List[int]):
+    # ranges are expanded day by day, each one is bounded before any of them is
+    for days in range_days:
+        if not(0 < days <= BASE_INTEREST_RATES_BATCH_SIZE_MAX):
+            raise IncorrectBatchSizeError(
+                f"A range of base interest rates has to have between 1 and {BASE_INTEREST_RATES_BATCH_SIZE_MAX} days."
+            )
+    if not(0 < batch_size <= BASE_INTEREST_RATES_BATCH_SIZE_MAX):
+        raise IncorrectBatchSizeError(
+            f"Number of base interest rate days has to be between 1 and {BASE_INTEREST_RATES_BATCH_SIZE_MAX}."
         )
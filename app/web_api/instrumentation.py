@@ -0,0 +1,117 @@
+import os
+import time
+from contextlib import (
+    contextmanager,
+    nullcontext
+)
+from datetime import date
+from typing import Optional
+
+from flask import (
+    Flask,
+    g,
+    request,
+    Response
+)
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Histogram,
+    generate_latest
+)
+from prometheus_client.multiprocess import MultiProcessCollector
+
+# times the stages of the loan handlers into a Server-Timing header and the histograms served on /metrics,
+# when off stage() hands out a shared no-op context and no request hooks are registered
+REQUEST_TIMING_ENABLED = os.environ.get("REQUEST_TIMING_ENABLED", "true").lower() == "true"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# upper bounds in days of the loan_length label
+LOAN_LENGTH_BUCKETS = [(31, "1m"), (92, "3m"), (366, "1y"), (1827, "5y"), (3653, "10y")]
+
+REQUEST_SECONDS = Histogram(
+    "loan_api_request_seconds", "Time to build the response of a request, streamed bodies excluded.",
+    ["endpoint", "method", "status", "loan_length"], buckets=LATENCY_BUCKETS
+)
+STAGE_SECONDS = Histogram(
+    "loan_api_stage_seconds", "Time spent in one stage of a loan request handler.",
+    ["endpoint", "method", "stage", "loan_length"], buckets=LATENCY_BUCKETS
+)
+
+_NO_STAGE = nullcontext()
+
+
+def loan_length_bucket(days: Optional[int]) -> str:
+    if days is None:
+        return "none"
+    for upper_bound, label in LOAN_LENGTH_BUCKETS:
+        if days <= upper_bound:
+            return label
+    return "longer"
+
+
+@contextmanager
+def _timed_stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.last_stage_ended = time.perf_counter()
+        g.stage_timings.append((name, g.last_stage_ended - started))
+
+
+def stage(name: str):
+    # must be entered on the request thread, the timings are kept on flask.g
+    if not REQUEST_TIMING_ENABLED or "stage_timings" not in g:
+        return _NO_STAGE
+    return _timed_stage(name)
+
+
+def set_loan_length(start_date: date, end_date: date):
+    if REQUEST_TIMING_ENABLED:
+        g.loan_length_days = (end_date - start_date).days + 1
+
+
+def _start_request_timing():
+    g.request_started = time.perf_counter()
+    g.last_stage_ended = g.request_started
+    g.stage_timings = []
+
+
+def _finish_request_timing(response: Response) -> Response:
+    if "request_started" not in g:
+        return response
+    ended = time.perf_counter()
+    stage_timings = g.stage_timings
+    if stage_timings:
+        # whatever ran after the last stage: flask-smorest dumping the body and building the response
+        stage_timings.append(("response", ended - g.last_stage_ended))
+    total = ended - g.request_started
+    response.headers["Server-Timing"] = ", ".join(
+        f"{name};dur={seconds * 1000:.3f}" for name, seconds in stage_timings + [("total", total)]
+    )
+    if request.url_rule is not None:
+        endpoint = request.url_rule.rule
+        loan_length = loan_length_bucket(g.get("loan_length_days"))
+        REQUEST_SECONDS.labels(endpoint, request.method, str(response.status_code), loan_length).observe(total)
+        for name, seconds in stage_timings:
+            STAGE_SECONDS.labels(endpoint, request.method, name, loan_length).observe(seconds)
+    return response
+
+
+def metrics() -> Response:
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return Response(generate_latest(), content_type=CONTENT_TYPE_LATEST)
+    # under gunicorn every worker writes its samples to the directory, whichever worker serves the scrape
+    # merges them all (see gunicorn.conf.py)
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+def init_request_timing(app: Flask):
+    if not REQUEST_TIMING_ENABLED:
+        return
+    app.before_request(_start_request_timing)
+    app.after_request(_finish_request_timing)
+    app.add_url_rule("/metrics", "metrics", metrics)
@@ -2,6 +2,7 @@ import os
 
 from marshmallow import (
     fields,
+    validate,
     Schema
 )
 
@@ -16,3 +17,83 @@ class CreateLoanSchema(Schema):
 
 
 UpdateLoanSchema = CreateLoanSchema
+QuoteLoanSchema = CreateLoanSchema
+
+
+class CreateLoansBatchSchema(Schema):
+    loans = fields.List(fields.Nested(CreateLoanSchema), required=True)
+
+
+class ListLoansSchema(Schema):
+    # keyset pagination: pass the 'next_after_id' of a page as 'after_id' to get the next one
+    after_id = fields.Integer()
+    limit = fields.Integer()
+    currency = fields.String()
+    # loans whose [start_date, end_date] overlaps [date_from, date_to]
+    date_from = fields.Date()
+    date_to = fields.Date()
+    amount_min = fields.Float()
+    amount_max = fields.Float()
+
+
+class GetLoanSchema(Schema):
+    format = fields.String(
+        validate=validate.OneOf(["json", "ndjson", "csv"]),
+        metadata={
+            "description": "'ndjson' and 'csv' stream the schedule in chunks instead of building the whole document, "
+                           "can also be requested with an 'application/x-ndjson' or 'text/csv' Accept header."
+        }
+    )
+
+
+class UpsertBaseInterestRateSchema(Schema):
+    currency = fields.String(required=True)
+    date = fields.Date(required=True)
+    interest_rate = fields.Decimal(required=True)
+
+
+class BaseInterestRateRangeSchema(Schema):
+    # the same rate on every day from start_date to end_date, both included
+    currency = fields.String(required=True)
+    start_date = fields.Date(required=True)
+    end_date = fields.Date(required=True)
+    interest_rate = fields.Decimal(required=True)
+
+
+class UpsertBaseInterestRatesSchema(Schema):
+    rates = fields.List(fields.Nested(UpsertBaseInterestRateSchema), load_default=list)
+    ranges = fields.List(fields.Nested(BaseInterestRateRangeSchema), load_default=list)
+
+
+class ListBaseInterestRatesSchema(Schema):
+    # keyset pagination: pass the 'next_after_currency' and 'next_after_date' of a page to get the next one
+    after_currency = fields.String()
+    after_date = fields.Date()
+    limit = fields.Integer()
+    currency = fields.String()
+    date_from = fields.Date()
+    date_to = fields.Date()
+
+
+class DeleteBaseInterestRatesSchema(Schema):
+    currency = fields.String(required=True)
+    date_from = fields.Date(required=True)
+    date_to = fields.Date(required=True)
+
+
+class PortfolioInterestSchema(Schema):
+    date_from = fields.Date(required=True)
+    date_to = fields.Date(required=True)
+    period = fields.String(validate=validate.OneOf(["day", "month"]), load_default="day")
+    # all currencies when not given
+    currency = fields.String()
+
+
+class LoanScenariosSchema(Schema):
+    currency = fields.String(required=True)
+    start_date = fields.Date(required=True)
+    end_date = fields.Date(required=True)
+    # every amount is priced with every margin
+    amounts = fields.List(fields.Float(), required=True)
+    annual_margins_in_percent = fields.List(fields.Float(), required=True)
+    with_calculation_results = fields.Boolean(load_default=False)
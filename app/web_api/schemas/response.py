@@ -13,6 +13,31 @@ class DailyLoanCalculationResultSchema(Schema):
     days_elapsed_since_loan_start_date = fields.Integer(required=True)
 
 
+class LoanQuoteSchema(CreateLoanSchema):
+    total_interest = fields.Float(required=True)
+    # version of the base interest rates the quote was calculated with
+    base_interest_rate_version = fields.Integer(required=True)
+    calculation_results = fields.List(fields.Nested(DailyLoanCalculationResultSchema), required=True)
+
+
+class LoanScenarioSchema(Schema):
+    amount = fields.Float(required=True)
+    annual_margin_in_percent = fields.Float(required=True)
+    total_interest = fields.Float(required=True)
+    total_interest_without_margin = fields.Float(required=True)
+    # only with 'with_calculation_results'
+    calculation_results = fields.List(fields.Nested(DailyLoanCalculationResultSchema))
+
+
+class LoanScenariosResultSchema(Schema):
+    currency = fields.String(required=True)
+    start_date = fields.Date(required=True)
+    end_date = fields.Date(required=True)
+    base_interest_rate_version = fields.Integer(required=True)
+    # ordered by amount, then by margin, in the order of the request
+    scenarios = fields.List(fields.Nested(LoanScenarioSchema), required=True)
+
+
 class ListedLoanSchema(CreateLoanSchema):
     id = fields.Integer(required=True)
     total_interest = fields.Float(required=True)
@@ -24,4 +49,116 @@ class LoanSchema(ListedLoanSchema):
 
 class ListLoansSchema(Schema):
     loans = fields.List(fields.Nested(ListedLoanSchema), required=True)
+    # number of loans matching the filters across all pages
     count = fields.Integer(required=True)
+    next_after_id = fields.Integer(required=True, allow_none=True)
+
+
+class CreatedLoanInBatchSchema(Schema):
+    # position of the loan in the request, either 'id' or 'error' is set
+    index = fields.Integer(required=True)
+    id = fields.Integer(required=True, allow_none=True)
+    error = fields.String(required=True, allow_none=True)
+
+
+class CreateLoansBatchResultSchema(Schema):
+    results = fields.List(fields.Nested(CreatedLoanInBatchSchema), required=True)
+    created = fields.Integer(required=True)
+    failed = fields.Integer(required=True)
+
+
+class BaseInterestRateSchema(Schema):
+    id = fields.Integer(required=True)
+    currency = fields.String(required=True)
+    date = fields.Date(required=True)
+    interest_rate = fields.Float(required=True)
+
+
+class ListBaseInterestRatesSchema(Schema):
+    rates = fields.List(fields.Nested(BaseInterestRateSchema), required=True)
+    # number of rates matching the filters across all pages
+    count = fields.Integer(required=True)
+    next_after_currency = fields.String(required=True, allow_none=True)
+    next_after_date = fields.Date(required=True, allow_none=True)
+
+
+class ChangedBaseInterestRatesSchema(Schema):
+    # number of rates written or deleted and the new rate version of every changed currency
+    changed = fields.Integer(required=True)
+    versions = fields.Dict(keys=fields.String(), values=fields.Integer(), required=True)
+
+
+class PortfolioInterestPeriodSchema(Schema):
+    # day, or first day of the month inside the range, the amounts accrued from
+    period_start = fields.Date(required=True)
+    interest = fields.Float(required=True)
+    interest_without_margin = fields.Float(required=True)
+
+
+class CurrencyPortfolioInterestSchema(Schema):
+    currency = fields.String(required=True)
+    # loans accruing on at least one day of the range
+    loans = fields.Integer(required=True)
+    total_interest = fields.Float(required=True)
+    total_interest_without_margin = fields.Float(required=True)
+    series = fields.List(fields.Nested(PortfolioInterestPeriodSchema), required=True)
+
+
+class PortfolioInterestSchema(Schema):
+    currencies = fields.List(fields.Nested(CurrencyPortfolioInterestSchema), required=True)
+
+
+class CacheStatsSchema(Schema):
+    hits = fields.Integer(required=True)
+    misses = fields.Integer(required=True)
+    reloads = fields.Integer(required=True)
+    partial_reloads = fields.Integer(required=True)
+    currencies = fields.Integer(required=True)
+
+
+class LRUCacheStatsSchema(Schema):
+    hits = fields.Integer(required=True)
+    misses = fields.Integer(required=True)
+    # lookups that waited for a concurrent miss of the same key instead of computing it again
+    coalesced = fields.Integer(required=True)
+    # share of lookups served without computing, hits and coalesced ones
+    hit_ratio = fields.Float(required=True)
+    evictions = fields.Integer(required=True)
+    size = fields.Integer(required=True)
+
+
+class DatabasePoolStatsSchema(Schema):
+    size = fields.Integer(required=True)
+    checked_out = fields.Integer(required=True)
+    overflow = fields.Integer(required=True)
+    saturation = fields.Float(required=True)
+    checkouts = fields.Integer(required=True)
+    checkout_wait_seconds_total = fields.Float(required=True)
+    checkout_wait_seconds_max = fields.Float(required=True)
+
+
+class ReplicaStatsSchema(Schema):
+    reads = fields.Integer(required=True)
+    # read-only units of work currently open on the replica
+    in_flight = fields.Integer(required=True)
+    pool = fields.Nested(DatabasePoolStatsSchema, required=True, allow_none=True)
+
+
+class ReplicaRouterStatsSchema(Schema):
+    routing = fields.String(required=True)
+    # reads sent to the primary because this process committed within the read-your-writes window
+    read_your_writes_reads = fields.Integer(required=True)
+    replicas = fields.List(fields.Nested(ReplicaStatsSchema), required=True)
+
+
+class StatsSchema(Schema):
+    # every counter below is of the process that served the request only: each gunicorn worker has its own
+    # caches and pools, so consecutive requests can report different workers, unlike /metrics
+    worker_pid = fields.Integer(required=True)
+    base_interest_rate_cache = fields.Nested(CacheStatsSchema, required=True)
+    loan_schedule_cache = fields.Nested(LRUCacheStatsSchema, required=True)
+    loan_quote_cache = fields.Nested(LRUCacheStatsSchema, required=True)
+    # not available for in-memory SQLite
+    database_pool = fields.Nested(DatabasePoolStatsSchema, required=True, allow_none=True)
+    # only when DB_REPLICA_CONNECTION_STRINGS is set
+    database_replicas = fields.Nested(ReplicaRouterStatsSchema, required=True, allow_none=True)
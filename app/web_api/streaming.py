@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+import os
+from datetime import date
+from decimal import Decimal
+from itertools import islice
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional
+)
+
+from werkzeug.datastructures import MIMEAccept
+
+
+JSON_MEDIA_TYPE = "application/json"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+LOAN_MEDIA_TYPES = {
+    "json": JSON_MEDIA_TYPE,
+    "ndjson": NDJSON_MEDIA_TYPE,
+    "csv": CSV_MEDIA_TYPE,
+}
+# number of daily calculation results fetched from the database and written per chunk
+LOAN_STREAM_CHUNK_SIZE = int(os.environ.get("LOAN_STREAM_CHUNK_SIZE", "1000"))
+
+CALCULATION_RESULT_FIELDS = [
+    "date",
+    "interest_accrual_amount",
+    "interest_accrual_amount_without_margin",
+    "days_elapsed_since_loan_start_date",
+]
+
+
+def negotiate_loan_media_type(requested_format: Optional[str], accept_mimetypes: MIMEAccept) -> str:
+    # an explicit 'format' query parameter wins over the Accept header, plain JSON is the default
+    if requested_format is not None:
+        return LOAN_MEDIA_TYPES[requested_format]
+    return accept_mimetypes.best_match(
+        [JSON_MEDIA_TYPE, NDJSON_MEDIA_TYPE, CSV_MEDIA_TYPE], default=JSON_MEDIA_TYPE
+    ) or JSON_MEDIA_TYPE
+
+
+def _to_serializable(value: Any) -> Any:
+    # same conversions as the marshmallow response schemas: Decimal -> Float, date -> ISO 8601
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _chunks(iterable: Iterable, chunk_size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
+
+
+def _calculation_result_values(result) -> list:
+    return [_to_serializable(getattr(result, field)) for field in CALCULATION_RESULT_FIELDS]
+
+
+def ndjson_chunks(
+        loan: Dict[str, Any], calculation_results: Iterable, chunk_size: int = LOAN_STREAM_CHUNK_SIZE
+) -> Iterator[str]:
+    # first line is the loan without its schedule, every following line is one daily calculation result
+    yield json.dumps({key: _to_serializable(value) for key, value in loan.items()}) + "\n"
+    for chunk in _chunks(calculation_results, chunk_size):
+        yield "".join(
+            json.dumps(dict(zip(CALCULATION_RESULT_FIELDS, _calculation_result_values(result)))) + "\n"
+            for result in chunk
+        )
+
+
+def csv_chunks(calculation_results: Iterable, chunk_size: int = LOAN_STREAM_CHUNK_SIZE) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CALCULATION_RESULT_FIELDS)
+    yield buffer.getvalue()
+    for chunk in _chunks(calculation_results, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_calculation_result_values(result) for result in chunk)
+        yield buffer.getvalue()
@@ -1,17 +1,33 @@
+import os
+import sys
+from datetime import timedelta
 from typing import (
     Dict,
-    List
+    List,
+    Tuple
 )
 from decimal import Decimal
-from flask import current_app
+from flask import (
+    current_app,
+    request,
+    Response
+)
 from flask.views import MethodView
 from flask_smorest import Blueprint
 from werkzeug.exceptions import HTTPException
 
 from calculator.loan import (
-    calculate_loan,
+    calculate_loan_totals,
+    LoanDailyCalculationResult,
     BaseInterestRateNotFound
 )
+from calculator.rate_index import BaseInterestRateIndex
+from calculator.engines import calculate_loan_with_engine
+from calculator.vectorized_loan import calculate_loan_grid
+from calculator.batch import (
+    calculate_loans,
+    LoanCalculationRequest
+)
 from web_api.errors import (
     InconsistentLoanStartAndEndDateError,
     LoanStartOrAndDateFallsOnBankHolidayError,
@@ -21,21 +37,67 @@ from web_api.errors import (
     OutOfBoundsEndDateError,
     LoanStartDateOnWeekendError,
     LoanEndDateOnWeekendError,
-    BANK_HOLIDAYS_UK,
-    validate_loan_inputs
+    IncorrectPageSizeError,
+    IncorrectBatchSizeError,
+    CurrencyNotAllowedError,
+    InconsistentDateRangeError,
+    LOAN_INPUT_ERRORS,
+    LOANS_PAGE_SIZE_DEFAULT,
+    BASE_INTEREST_RATES_PAGE_SIZE_DEFAULT,
+    validate_loan_inputs,
+    validate_list_loans_inputs,
+    validate_loans_batch_inputs,
+    validate_base_interest_rate_range_inputs,
+    validate_list_base_interest_rates_inputs,
+    validate_base_interest_rates_batch_inputs,
+    validate_portfolio_interest_inputs,
+    validate_loan_scenarios_inputs
 )
 from web_api.schemas.request import (
     UpdateLoanSchema as UpdateLoanRequestSchema,
-    CreateLoanSchema as CreateLoanRequestSchema
+    CreateLoanSchema as CreateLoanRequestSchema,
+    QuoteLoanSchema as QuoteLoanRequestSchema,
+    LoanScenariosSchema as LoanScenariosRequestSchema,
+    CreateLoansBatchSchema as CreateLoansBatchRequestSchema,
+    ListLoansSchema as ListLoansRequestSchema,
+    GetLoanSchema as GetLoanRequestSchema,
+    UpsertBaseInterestRatesSchema as UpsertBaseInterestRatesRequestSchema,
+    ListBaseInterestRatesSchema as ListBaseInterestRatesRequestSchema,
+    DeleteBaseInterestRatesSchema as DeleteBaseInterestRatesRequestSchema,
+    PortfolioInterestSchema as PortfolioInterestRequestSchema
 )
 from web_api.schemas.response import (
     LoanSchema as LoanResponseSchema,
-    ListLoansSchema as ListLoansResponseSchema
+    LoanQuoteSchema as LoanQuoteResponseSchema,
+    LoanScenariosResultSchema as LoanScenariosResponseSchema,
+    ListLoansSchema as ListLoansResponseSchema,
+    CreateLoansBatchResultSchema as CreateLoansBatchResponseSchema,
+    StatsSchema as StatsResponseSchema,
+    ListBaseInterestRatesSchema as ListBaseInterestRatesResponseSchema,
+    ChangedBaseInterestRatesSchema as ChangedBaseInterestRatesResponseSchema,
+    PortfolioInterestSchema as PortfolioInterestResponseSchema
+)
+from web_api.json_responses import loan_json_response
+from web_api.instrumentation import (
+    stage,
+    set_loan_length
+)
+from web_api.streaming import (
+    negotiate_loan_media_type,
+    ndjson_chunks,
+    csv_chunks,
+    JSON_MEDIA_TYPE,
+    NDJSON_MEDIA_TYPE,
+    LOAN_STREAM_CHUNK_SIZE
 )
 from db.unit_of_work import UnitOfWork
+from db.engine import get_pool_stats
+from db.replicas import get_replica_router
 from db.data_repositories.base_interest_rate_repository import (
+    BaseInterestRatesNotFoundError,
     BaseInterestRateRepository,
-    BaseInterestRatesNotFoundError
+    BaseInterestRateFiltersSchema,
+    CreateBaseInterestRateSchema
 )
 from db.data_repositories.loan_repository import (
     CreateDailyLoanCalculationResultSchema,
@@ -43,12 +105,92 @@ from db.data_repositories.loan_repository import (
     LoanRepository,
     CreateLoanSchema,
     UpdateLoanSchema,
-    LoanSchema
+    LoanSchema,
+    LoanFiltersSchema,
+    COMPUTED_SCHEDULE_STORAGE
 )
+from db.data_repositories.portfolio_repository import PortfolioRepository
 
 api_blp = Blueprint("api", "loan", url_prefix="/api/")
 
 
+def get_base_interest_rate_index(session, currency: str) -> Tuple[int, BaseInterestRateIndex]:
+    return current_app.base_interest_rate_cache.get_with_version(session=session, currency=currency)
+
+
+def read_base_interest_rate_index(currency: str) -> Tuple[int, BaseInterestRateIndex]:
+    # for handlers that only calculate, the rates are read in a read-only unit of work of their own
+    with UnitOfWork(current_app.db_connection, read_only=True) as unit_of_work:
+        return get_base_interest_rate_index(session=unit_of_work.session, currency=currency)
+
+
+def compute_loan_schedule(session, loan: LoanSchema) -> Tuple[Decimal, List[LoanDailyCalculationResult]]:
+    # regenerates the schedule of a loan that only has its parameters persisted, recently read ones are cached
+    with stage("rates"):
+        base_interest_rate_version, base_interest_rate_index = get_base_interest_rate_index(
+            session=session, currency=loan.currency
+        )
+    cache_key = (loan.id, loan.updated_on, base_interest_rate_version)
+    schedule = current_app.loan_schedule_cache.get(cache_key)
+    if schedule is not None:
+        return schedule
+    with stage("calculate"):
+        total_interest = loan.total_interest
+        if loan.base_interest_rate_version != base_interest_rate_version:
+            # rates changed since the loan was saved, the schedule is regenerated from the current ones
+            total_interest = calculate_loan_totals(
+                start_date=loan.start_date, end_date=loan.end_date,
+                loan_amount=loan.amount, annual_margin=loan.annual_margin,
+                base_interest_rate_index=base_interest_rate_index
+            ).total_interest
+        schedule = total_interest, calculate_loan_with_engine(
+            base_interest_rates=base_interest_rate_index,
+            start_date=loan.start_date, end_date=loan.end_date,
+            loan_amount=loan.amount, currency=loan.currency,
+            annual_margin=loan.annual_margin
+        )
+    current_app.loan_schedule_cache.put(cache_key, schedule)
+    return schedule
+
+
+def stream_loan(id: int, media_type: str) -> Response:
+    # the unit of work stays open until the response is closed so rows can be read while streaming, closing
+    # runs even when the body is never iterated (HEAD, a client gone before the first chunk)
+    unit_of_work = UnitOfWork(current_app.db_connection, read_only=True).__enter__()
+    try:
+        loan_repository = LoanRepository(session=unit_of_work.session)
+        loan = loan_repository.get(id, with_calculation_results=False)
+        if loan.schedule_storage == COMPUTED_SCHEDULE_STORAGE:
+            total_interest, calculation_results = compute_loan_schedule(session=unit_of_work.session, loan=loan)
+        else:
+            total_interest = loan.total_interest
+            calculation_results = loan_repository.iter_calculation_results(
+                loan_id=loan.id, chunk_size=LOAN_STREAM_CHUNK_SIZE
+            )
+    except BaseException:
+        unit_of_work.__exit__(*sys.exc_info())
+        raise
+
+    if media_type == NDJSON_MEDIA_TYPE:
+        chunks = ndjson_chunks(
+            loan={
+                "id": loan.id,
+                "amount": loan.amount,
+                "currency": loan.currency,
+                "annual_margin_in_percent": loan.annual_margin * Decimal(100.0),
+                "start_date": loan.start_date,
+                "end_date": loan.end_date,
+                "total_interest": total_interest,
+            },
+            calculation_results=calculation_results
+        )
+    else:
+        chunks = csv_chunks(calculation_results=calculation_results)
+    response = Response(chunks, mimetype=media_type)
+    response.call_on_close(lambda: unit_of_work.__exit__(None, None, None))
+    return response
+
+
 @api_blp.route("/loans")
 class Loans(MethodView):
 
@@ -57,95 +199,351 @@ class Loans(MethodView):
     def post(self, create_loan_params: Dict) -> Dict:
         with UnitOfWork(current_app.db_connection) as unit_of_work:
             loan_repository = LoanRepository(session=unit_of_work.session)
-            base_interest_rates_repository = BaseInterestRateRepository(session=unit_of_work.session)
 
             start_date, end_date = create_loan_params["start_date"], create_loan_params["end_date"]
             loan_amount = Decimal(create_loan_params["amount"])
             annual_margin_in_percent = Decimal(create_loan_params["annual_margin_in_percent"])
             currency = create_loan_params["currency"]
+            set_loan_length(start_date=start_date, end_date=end_date)
+            with stage("validate"):
+                validate_loan_inputs(
+                    start_date=start_date, end_date=end_date, loan_amount=loan_amount,
+                    annual_margin_in_percent=annual_margin_in_percent, currency=currency
+                )
+
+            annual_margin = annual_margin_in_percent / Decimal(100.0)
+
+            with stage("rates"):
+                base_interest_rate_version, base_interest_rate_index = get_base_interest_rate_index(
+                    session=unit_of_work.session, currency=currency
+                )
+            with stage("calculate"):
+                loan_calculation_results = []
+                if loan_repository.stores_calculation_results:
+                    loan_calculation_results = calculate_loan_with_engine(
+                        base_interest_rates=base_interest_rate_index,
+                        start_date=start_date, end_date=end_date,
+                        loan_amount=loan_amount, currency=currency,
+                        annual_margin=annual_margin
+                    )
+                loan_totals = calculate_loan_totals(
+                    start_date=start_date, end_date=end_date,
+                    loan_amount=loan_amount, annual_margin=annual_margin,
+                    base_interest_rate_index=base_interest_rate_index
+                )
+
+            with stage("write"):
+                new_loan = loan_repository.add(
+                    CreateLoanSchema(
+                        start_date=start_date, end_date=end_date,
+                        amount=loan_amount, currency=currency,
+                        annual_margin=annual_margin,
+                        total_interest=loan_totals.total_interest,
+                        base_interest_rate_version=base_interest_rate_version,
+                        calculation_results=[
+                            CreateDailyLoanCalculationResultSchema(
+                                date=result.date,
+                                interest_accrual_amount=result.interest_accrual_amount,
+                                interest_accrual_amount_without_margin=result.interest_accrual_amount_without_margin,
+                                days_elapsed_since_loan_start_date=result.days_elapsed_since_loan_start_date
+                            ) for result in loan_calculation_results
+                        ]
+                    )
+                )
+                unit_of_work.commit()
+            return {"id": new_loan.id}
+
+    @api_blp.arguments(ListLoansRequestSchema, location="query")
+    @api_blp.response(200, schema=ListLoansResponseSchema)
+    def get(self, list_loans_params: Dict) -> Dict[str, List]:
+        limit = list_loans_params.get("limit", LOANS_PAGE_SIZE_DEFAULT)
+        validate_list_loans_inputs(limit=limit)
+        filters = LoanFiltersSchema(
+            currency=list_loans_params.get("currency"),
+            date_from=list_loans_params.get("date_from"),
+            date_to=list_loans_params.get("date_to"),
+            amount_min=list_loans_params.get("amount_min"),
+            amount_max=list_loans_params.get("amount_max")
+        )
+        with UnitOfWork(current_app.db_connection, read_only=True) as unit_of_work:
+            loan_repository = LoanRepository(session=unit_of_work.session)
+            with stage("read"):
+                listed_loans = loan_repository.list(
+                    after_id=list_loans_params.get("after_id"), limit=limit, filters=filters
+                )
+                count = loan_repository.count(filters=filters)
+        loans = [
+            {
+                "id": loan.id,
+                "amount": loan.amount,
+                "currency": loan.currency,
+                "annual_margin_in_percent": loan.annual_margin * Decimal(100.0),
+                "start_date": loan.start_date,
+                "end_date": loan.end_date,
+                "total_interest": loan.total_interest,
+            } for loan in listed_loans
+        ]
+        with stage("serialize"):
+            return loan_json_response({
+                "loans": loans,
+                "count": count,
+                "next_after_id": loans[-1]["id"] if len(loans) == limit else None
+            })
+
+
+@api_blp.route("/loans/batch")
+class LoansBatch(MethodView):
+
+    @api_blp.arguments(CreateLoansBatchRequestSchema)
+    @api_blp.response(200, schema=CreateLoansBatchResponseSchema)
+    def post(self, create_loans_batch_params: Dict) -> Dict:
+        loans_params = create_loans_batch_params["loans"]
+        validate_loans_batch_inputs(batch_size=len(loans_params))
+        results = [{"index": index, "id": None, "error": None} for index in range(len(loans_params))]
+        with UnitOfWork(current_app.db_connection) as unit_of_work:
+            loan_repository = LoanRepository(session=unit_of_work.session)
+
+            base_interest_rates = {}
+            calculation_indexes, calculation_requests = [], []
+            for index, create_loan_params in enumerate(loans_params):
+                start_date, end_date = create_loan_params["start_date"], create_loan_params["end_date"]
+                loan_amount = Decimal(create_loan_params["amount"])
+                annual_margin_in_percent = Decimal(create_loan_params["annual_margin_in_percent"])
+                currency = create_loan_params["currency"]
+                try:
+                    validate_loan_inputs(
+                        start_date=start_date, end_date=end_date, loan_amount=loan_amount,
+                        annual_margin_in_percent=annual_margin_in_percent, currency=currency
+                    )
+                    # rates are looked up once per currency for the whole batch
+                    if currency not in base_interest_rates:
+                        base_interest_rates[currency] = get_base_interest_rate_index(
+                            session=unit_of_work.session, currency=currency
+                        )
+                    _, base_interest_rate_index = base_interest_rates[currency]
+                    calculation_requests.append(
+                        LoanCalculationRequest(
+                            start_date=start_date, end_date=end_date,
+                            loan_amount=loan_amount, currency=currency,
+                            annual_margin=annual_margin_in_percent / Decimal(100.0),
+                            base_interest_rate_index=base_interest_rate_index.between(
+                                start_date=start_date, end_date=end_date
+                            ),
+                            with_calculation_results=loan_repository.stores_calculation_results
+                        )
+                    )
+                    calculation_indexes.append(index)
+                except LOAN_INPUT_ERRORS + (BaseInterestRatesNotFoundError, BaseInterestRateNotFound) as error:
+                    results[index]["error"] = str(error)
+
+            created_indexes, create_loans_parameters = [], []
+            for index, calculation_request, calculation in zip(
+                    calculation_indexes, calculation_requests, calculate_loans(calculation_requests)
+            ):
+                if isinstance(calculation, Exception):
+                    results[index]["error"] = str(calculation)
+                    continue
+                created_indexes.append(index)
+                create_loans_parameters.append(
+                    CreateLoanSchema(
+                        start_date=calculation_request.start_date, end_date=calculation_request.end_date,
+                        amount=calculation_request.loan_amount, currency=calculation_request.currency,
+                        annual_margin=calculation_request.annual_margin,
+                        total_interest=calculation.totals.total_interest,
+                        base_interest_rate_version=base_interest_rates[calculation_request.currency][0],
+                        calculation_results=[
+                            CreateDailyLoanCalculationResultSchema(
+                                date=result.date,
+                                interest_accrual_amount=result.interest_accrual_amount,
+                                interest_accrual_amount_without_margin=result.interest_accrual_amount_without_margin,
+                                days_elapsed_since_loan_start_date=result.days_elapsed_since_loan_start_date
+                            ) for result in calculation.calculation_results
+                        ]
+                    )
+                )
+
+            new_loans = loan_repository.add_many(create_loans_parameters)
+            unit_of_work.commit()
+            for index, new_loan in zip(created_indexes, new_loans):
+                results[index]["id"] = new_loan.id
+            return {"results": results, "created": len(new_loans), "failed": len(results) - len(new_loans)}
+
+
+@api_blp.route("/loans/quote")
+class LoanQuote(MethodView):
+
+    @api_blp.arguments(QuoteLoanRequestSchema)
+    @api_blp.response(200, schema=LoanQuoteResponseSchema)
+    def post(self, quote_loan_params: Dict) -> Dict:
+        # calculates a loan without saving it, memoized per rate version so a rate change starts over
+        start_date, end_date = quote_loan_params["start_date"], quote_loan_params["end_date"]
+        loan_amount = Decimal(quote_loan_params["amount"])
+        annual_margin_in_percent = Decimal(quote_loan_params["annual_margin_in_percent"])
+        currency = quote_loan_params["currency"]
+        set_loan_length(start_date=start_date, end_date=end_date)
+        with stage("validate"):
             validate_loan_inputs(
                 start_date=start_date, end_date=end_date, loan_amount=loan_amount,
                 annual_margin_in_percent=annual_margin_in_percent, currency=currency
             )
+        annual_margin = annual_margin_in_percent / Decimal(100.0)
 
-            annual_margin = annual_margin_in_percent / Decimal(100.0)
+        with stage("rates"):
+            base_interest_rate_version, base_interest_rate_index = read_base_interest_rate_index(currency=currency)
 
-            base_interest_rates = base_interest_rates_repository.get(
-                start_date=start_date, end_date=end_date, currency=currency
-            )
-            loan_calculation_results = calculate_loan(
-                base_interest_rates={(bi.currency, bi.date): bi.interest_rate for bi in base_interest_rates},
+        def calculate_quote() -> Tuple[Decimal, List[LoanDailyCalculationResult]]:
+            total_interest = calculate_loan_totals(
+                start_date=start_date, end_date=end_date,
+                loan_amount=loan_amount, annual_margin=annual_margin,
+                base_interest_rate_index=base_interest_rate_index
+            ).total_interest
+            return total_interest, calculate_loan_with_engine(
+                base_interest_rates=base_interest_rate_index,
                 start_date=start_date, end_date=end_date,
                 loan_amount=loan_amount, currency=currency,
                 annual_margin=annual_margin
             )
 
-            new_loan = loan_repository.add(
-                CreateLoanSchema(
-                    start_date=start_date, end_date=end_date,
-                    amount=loan_amount, currency=currency,
-                    annual_margin=annual_margin,
-                    total_interest=sum([r.interest_accrual_amount for r in loan_calculation_results]),
-                    calculation_results=[
-                        CreateDailyLoanCalculationResultSchema(
-                            date=result.date,
-                            interest_accrual_amount=result.interest_accrual_amount,
-                            interest_accrual_amount_without_margin=result.interest_accrual_amount_without_margin,
-                            days_elapsed_since_loan_start_date=result.days_elapsed_since_loan_start_date
-                        ) for result in loan_calculation_results
-                    ]
-                )
+        with stage("calculate"):
+            total_interest, calculation_results = current_app.loan_quote_cache.get_or_compute(
+                (currency, start_date, end_date, loan_amount, annual_margin, base_interest_rate_version),
+                calculate_quote
+            )
+        with stage("serialize"):
+            return loan_json_response({
+                "amount": loan_amount,
+                "currency": currency,
+                "annual_margin_in_percent": annual_margin_in_percent,
+                "start_date": start_date,
+                "end_date": end_date,
+                "total_interest": total_interest,
+                "base_interest_rate_version": base_interest_rate_version,
+                "calculation_results": [
+                    {
+                        "date": result.date,
+                        "interest_accrual_amount": result.interest_accrual_amount,
+                        "interest_accrual_amount_without_margin": result.interest_accrual_amount_without_margin,
+                        "days_elapsed_since_loan_start_date": result.days_elapsed_since_loan_start_date,
+                    } for result in calculation_results
+                ]
+            })
+
+
+@api_blp.route("/loans/scenarios")
+class LoanScenarios(MethodView):
+
+    @api_blp.arguments(LoanScenariosRequestSchema)
+    @api_blp.response(200, schema=LoanScenariosResponseSchema)
+    def post(self, loan_scenarios_params: Dict) -> Dict:
+        # prices every amount with every margin for one date range and currency without saving anything
+        start_date, end_date = loan_scenarios_params["start_date"], loan_scenarios_params["end_date"]
+        currency = loan_scenarios_params["currency"]
+        loan_amounts = [Decimal(amount) for amount in loan_scenarios_params["amounts"]]
+        annual_margins_in_percent = [
+            Decimal(annual_margin_in_percent)
+            for annual_margin_in_percent in loan_scenarios_params["annual_margins_in_percent"]
+        ]
+        with_calculation_results = loan_scenarios_params["with_calculation_results"]
+        set_loan_length(start_date=start_date, end_date=end_date)
+        with stage("validate"):
+            validate_loan_scenarios_inputs(
+                start_date=start_date, end_date=end_date, currency=currency, loan_amounts=loan_amounts,
+                annual_margins_in_percent=annual_margins_in_percent, with_calculation_results=with_calculation_results
             )
-            unit_of_work.commit()
-            return {"id": new_loan.id}
 
-    @api_blp.response(200, schema=ListLoansResponseSchema)
-    def get(self) -> Dict[str, List]:
-        with UnitOfWork(current_app.db_connection) as unit_of_work:
-            loan_repository = LoanRepository(session=unit_of_work.session)
-            loans = [
-                {
-                    "id": loan.id,
-                    "amount": loan.amount,
-                    "currency": loan.currency,
-                    "annual_margin_in_percent": loan.annual_margin * Decimal(100.0),
-                    "start_date": loan.start_date,
-                    "end_date": loan.end_date,
-                    "total_interest": loan.total_interest,
-                } for loan in loan_repository.list()
-            ]
-            return {"loans": loans, "count": len(loans)}
+        with stage("rates"):
+            base_interest_rate_version, base_interest_rate_index = read_base_interest_rate_index(currency=currency)
+
+        with stage("calculate"):
+            grid = calculate_loan_grid(
+                start_date=start_date, end_date=end_date,
+                loan_amounts=loan_amounts,
+                annual_margins=[
+                    annual_margin_in_percent / Decimal(100.0) for annual_margin_in_percent in annual_margins_in_percent
+                ],
+                base_interest_rates=base_interest_rate_index.rates_between(start_date=start_date, end_date=end_date),
+                with_calculation_results=with_calculation_results
+            )
+        with stage("serialize"):
+            dates = grid.date_axis.tolist()
+            days_elapsed = range(len(dates))
+            scenarios = []
+            for amount_position, loan_amount in enumerate(loan_amounts):
+                for margin_position, annual_margin_in_percent in enumerate(annual_margins_in_percent):
+                    scenario = {
+                        "amount": loan_amount,
+                        "annual_margin_in_percent": annual_margin_in_percent,
+                        "total_interest": grid.total_interest[amount_position, margin_position],
+                        "total_interest_without_margin": grid.total_interest_without_margin[amount_position]
+                    }
+                    if with_calculation_results:
+                        scenario["calculation_results"] = [
+                            {
+                                "date": result_date,
+                                "interest_accrual_amount": interest_accrual_amount,
+                                "interest_accrual_amount_without_margin": interest_accrual_amount_without_margin,
+                                "days_elapsed_since_loan_start_date": days_elapsed_since_loan_start_date,
+                            } for (
+                                result_date, interest_accrual_amount, interest_accrual_amount_without_margin,
+                                days_elapsed_since_loan_start_date
+                            ) in zip(
+                                dates,
+                                grid.interest_accrual_amounts[amount_position, margin_position].tolist(),
+                                grid.interest_accrual_amounts_without_margin[amount_position].tolist(),
+                                days_elapsed
+                            )
+                        ]
+                    scenarios.append(scenario)
+            return loan_json_response({
+                "currency": currency,
+                "start_date": start_date,
+                "end_date": end_date,
+                "base_interest_rate_version": base_interest_rate_version,
+                "scenarios": scenarios
+            })
 
 
 @api_blp.route("/loan/<id>")
 class Loan(MethodView):
 
+    @api_blp.arguments(GetLoanRequestSchema, location="query")
     @api_blp.response(200, schema=LoanResponseSchema)
-    def get(self, id: int) -> Dict:
-        with UnitOfWork(current_app.db_connection) as unit_of_work:
+    def get(self, get_loan_params: Dict, id: int) -> Dict:
+        media_type = negotiate_loan_media_type(
+            requested_format=get_loan_params.get("format"), accept_mimetypes=request.accept_mimetypes
+        )
+        if media_type != JSON_MEDIA_TYPE:
+            return stream_loan(id=id, media_type=media_type)
+        with UnitOfWork(current_app.db_connection, read_only=True) as unit_of_work:
             loan_repository = LoanRepository(session=unit_of_work.session)
-            loan = loan_repository.get(id)
-            return {
+            with stage("read"):
+                loan = loan_repository.get(id)
+            total_interest, calculation_results = loan.total_interest, loan.calculation_results
+            if loan.schedule_storage == COMPUTED_SCHEDULE_STORAGE:
+                total_interest, calculation_results = compute_loan_schedule(session=unit_of_work.session, loan=loan)
+        set_loan_length(start_date=loan.start_date, end_date=loan.end_date)
+        with stage("serialize"):
+            return loan_json_response({
                 "id": loan.id,
                 "amount": loan.amount,
                 "currency": loan.currency,
                 "annual_margin_in_percent": loan.annual_margin * Decimal(100.0),
                 "start_date": loan.start_date,
                 "end_date": loan.end_date,
-                "total_interest": loan.total_interest,
+                "total_interest": total_interest,
                 "calculation_results": [
                     {
                         "date": result.date,
                         "interest_accrual_amount": result.interest_accrual_amount,
                         "interest_accrual_amount_without_margin": result.interest_accrual_amount_without_margin,
                         "days_elapsed_since_loan_start_date": result.days_elapsed_since_loan_start_date,
-                    } for result in loan.calculation_results
+                    } for result in calculation_results
                 ]
-            }
+            })
 
     @api_blp.response(200, schema=LoanResponseSchema)
     def delete(self, id: int) -> Dict[str, int]:
-        with UnitOfWork(current_app.db_connection) as unit_of_work:
+        with UnitOfWork(current_app.db_connection) as unit_of_work, stage("write"):
             loan_repository = LoanRepository(session=unit_of_work.session)
             loan_repository.delete(id)
             unit_of_work.commit()
@@ -157,47 +555,186 @@ class Loan(MethodView):
         with UnitOfWork(current_app.db_connection) as unit_of_work:
 
             loan_repository = LoanRepository(session=unit_of_work.session)
-            base_interest_rates_repository = BaseInterestRateRepository(session=unit_of_work.session)
+            with stage("read"):
+                loan = loan_repository.get(id, with_calculation_results=False)
 
             start_date, end_date = update_loan_parameters["start_date"], update_loan_parameters["end_date"]
             loan_amount = Decimal(update_loan_parameters["amount"])
             annual_margin_in_percent = Decimal(update_loan_parameters["annual_margin_in_percent"])
             currency = update_loan_parameters["currency"]
-            validate_loan_inputs(
-                start_date=start_date, end_date=end_date, loan_amount=loan_amount,
-                annual_margin_in_percent=annual_margin_in_percent, currency=currency
-            )
+            set_loan_length(start_date=start_date, end_date=end_date)
+            with stage("validate"):
+                validate_loan_inputs(
+                    start_date=start_date, end_date=end_date, loan_amount=loan_amount,
+                    annual_margin_in_percent=annual_margin_in_percent, currency=currency
+                )
 
             annual_margin = annual_margin_in_percent / Decimal(100.0)
 
-            base_interest_rates = base_interest_rates_repository.get(
-                start_date=start_date, end_date=end_date, currency=currency
-            )
-            loan_calculation_results = calculate_loan(
-                base_interest_rates={(bi.currency, bi.date): bi.interest_rate for bi in base_interest_rates},
+            with stage("rates"):
+                base_interest_rate_version, base_interest_rate_index = get_base_interest_rate_index(
+                    session=unit_of_work.session, currency=currency
+                )
+            with stage("calculate"):
+                loan_totals = calculate_loan_totals(
+                    start_date=start_date, end_date=end_date,
+                    loan_amount=loan_amount, annual_margin=annual_margin,
+                    base_interest_rate_index=base_interest_rate_index
+                )
+            loan_parameters = UpdateLoanSchema(
                 start_date=start_date, end_date=end_date,
-                loan_amount=loan_amount, currency=currency,
-                annual_margin=annual_margin
+                amount=loan_amount, currency=currency,
+                annual_margin=annual_margin,
+                total_interest=loan_totals.total_interest,
+                base_interest_rate_version=base_interest_rate_version,
+                calculation_results=[]
+            )
+            update_incrementally = loan_repository.can_update_incrementally(
+                loan=loan, update_loan_parameters=loan_parameters
             )
 
-            loan_repository.update(
-                id=id, update_loan_parameters=UpdateLoanSchema(
-                    start_date=start_date, end_date=end_date,
-                    amount=loan_amount, currency=currency,
-                    annual_margin=annual_margin,
-                    total_interest=sum([r.interest_accrual_amount for r in loan_calculation_results]),
-                    calculation_results=[
-                        CreateDailyLoanCalculationResultSchema(
-                            date=result.date,
-                            interest_accrual_amount=result.interest_accrual_amount,
-                            interest_accrual_amount_without_margin=result.interest_accrual_amount_without_margin,
-                            days_elapsed_since_loan_start_date=result.days_elapsed_since_loan_start_date
-                        ) for result in loan_calculation_results
-                    ]
-                )
+            # an incremental update only needs the days added after the current end date
+            calculation_start_date = loan.end_date + timedelta(days=1) if update_incrementally else start_date
+            loan_calculation_results = []
+            if loan_repository.stores_calculation_results and calculation_start_date <= end_date:
+                with stage("calculate"):
+                    loan_calculation_results = calculate_loan_with_engine(
+                        base_interest_rates=base_interest_rate_index,
+                        start_date=calculation_start_date, end_date=end_date,
+                        loan_amount=loan_amount, currency=currency,
+                        annual_margin=annual_margin
+                    )
+            days_elapsed_offset = (calculation_start_date - start_date).days
+            loan_parameters.calculation_results = [
+                CreateDailyLoanCalculationResultSchema(
+                    date=result.date,
+                    interest_accrual_amount=result.interest_accrual_amount,
+                    interest_accrual_amount_without_margin=result.interest_accrual_amount_without_margin,
+                    days_elapsed_since_loan_start_date=result.days_elapsed_since_loan_start_date + days_elapsed_offset
+                ) for result in loan_calculation_results
+            ]
+
+            with stage("write"):
+                if update_incrementally:
+                    loan_repository.update_incrementally(loan=loan, update_loan_parameters=loan_parameters)
+                else:
+                    loan_repository.update(id=id, update_loan_parameters=loan_parameters)
+                unit_of_work.commit()
+            return {"id": id}
+
+
+@api_blp.route("/base-interest-rates")
+class BaseInterestRates(MethodView):
+
+    @api_blp.arguments(ListBaseInterestRatesRequestSchema, location="query")
+    @api_blp.response(200, schema=ListBaseInterestRatesResponseSchema)
+    def get(self, list_rates_params: Dict) -> Dict:
+        limit = list_rates_params.get("limit", BASE_INTEREST_RATES_PAGE_SIZE_DEFAULT)
+        validate_list_base_interest_rates_inputs(limit=limit)
+        filters = BaseInterestRateFiltersSchema(
+            currency=list_rates_params.get("currency"),
+            date_from=list_rates_params.get("date_from"),
+            date_to=list_rates_params.get("date_to")
+        )
+        after = None
+        if "after_currency" in list_rates_params and "after_date" in list_rates_params:
+            after = list_rates_params["after_currency"], list_rates_params["after_date"]
+        with UnitOfWork(current_app.db_connection, read_only=True) as unit_of_work:
+            base_interest_rate_repository = BaseInterestRateRepository(session=unit_of_work.session)
+            rates = base_interest_rate_repository.list(filters=filters, after=after, limit=limit)
+            count = base_interest_rate_repository.count(filters=filters)
+        last_rate = rates[-1] if len(rates) == limit else None
+        return {
+            "rates": [rate.dict() for rate in rates],
+            "count": count,
+            "next_after_currency": last_rate.currency if last_rate else None,
+            "next_after_date": last_rate.date if last_rate else None
+        }
+
+    @api_blp.arguments(UpsertBaseInterestRatesRequestSchema)
+    @api_blp.response(200, schema=ChangedBaseInterestRatesResponseSchema)
+    def post(self, upsert_rates_params: Dict) -> Dict:
+        rates, ranges = upsert_rates_params["rates"], upsert_rates_params["ranges"]
+        for rate in rates:
+            validate_base_interest_rate_range_inputs(
+                currency=rate["currency"], date_from=rate["date"], date_to=rate["date"]
+            )
+        for rate_range in ranges:
+            validate_base_interest_rate_range_inputs(
+                currency=rate_range["currency"], date_from=rate_range["start_date"], date_to=rate_range["end_date"]
+            )
+        range_days = [(rate_range["end_date"] - rate_range["start_date"]).days + 1 for rate_range in ranges]
+        validate_base_interest_rates_batch_inputs(batch_size=len(rates) + sum(range_days), range_days=range_days)
+        # ranges are expanded to one rate per day, a day given twice keeps the last rate like a reloaded file
+        rates_by_key = {(rate["currency"], rate["date"]): rate["interest_rate"] for rate in rates}
+        for rate_range in ranges:
+            for i in range((rate_range["end_date"] - rate_range["start_date"]).days + 1):
+                rate_date = rate_range["start_date"] + timedelta(days=i)
+                rates_by_key[(rate_range["currency"], rate_date)] = rate_range["interest_rate"]
+        with UnitOfWork(current_app.db_connection) as unit_of_work:
+            base_interest_rate_repository = BaseInterestRateRepository(session=unit_of_work.session)
+            changed_ranges = base_interest_rate_repository.upsert(
+                CreateBaseInterestRateSchema(currency=currency, date=rate_date, interest_rate=interest_rate)
+                for (currency, rate_date), interest_rate in rates_by_key.items()
             )
+            versions = base_interest_rate_repository.record_changes(dict(sorted(changed_ranges.items())))
             unit_of_work.commit()
-            return {"id": id}
+        return {"changed": len(rates_by_key), "versions": versions}
+
+    @api_blp.arguments(DeleteBaseInterestRatesRequestSchema, location="query")
+    @api_blp.response(200, schema=ChangedBaseInterestRatesResponseSchema)
+    def delete(self, delete_rates_params: Dict) -> Dict:
+        currency, date_from, date_to = (
+            delete_rates_params["currency"], delete_rates_params["date_from"], delete_rates_params["date_to"]
+        )
+        validate_base_interest_rate_range_inputs(currency=currency, date_from=date_from, date_to=date_to)
+        with UnitOfWork(current_app.db_connection) as unit_of_work:
+            base_interest_rate_repository = BaseInterestRateRepository(session=unit_of_work.session)
+            deleted = base_interest_rate_repository.delete(currency=currency, date_from=date_from, date_to=date_to)
+            versions = {}
+            if deleted:
+                versions = base_interest_rate_repository.record_changes({currency: (date_from, date_to)})
+            unit_of_work.commit()
+        return {"changed": deleted, "versions": versions}
+
+
+@api_blp.route("/portfolio/interest")
+class PortfolioInterest(MethodView):
+
+    @api_blp.arguments(PortfolioInterestRequestSchema, location="query")
+    @api_blp.response(200, schema=PortfolioInterestResponseSchema)
+    def get(self, portfolio_interest_params: Dict) -> Dict:
+        currency, date_from, date_to = (
+            portfolio_interest_params.get("currency"),
+            portfolio_interest_params["date_from"], portfolio_interest_params["date_to"]
+        )
+        validate_portfolio_interest_inputs(currency=currency, date_from=date_from, date_to=date_to)
+        with UnitOfWork(current_app.db_connection, read_only=True) as unit_of_work, stage("read"):
+            portfolio = PortfolioRepository(session=unit_of_work.session).interest(
+                date_from=date_from, date_to=date_to, period=portfolio_interest_params["period"],
+                currency=currency,
+                # "computed" storage loans accrue on the current base interest rates
+                get_base_interest_rate_index=lambda loan_currency: get_base_interest_rate_index(
+                    session=unit_of_work.session, currency=loan_currency
+                )[1]
+            )
+        return {"currencies": [currency_portfolio.dict() for currency_portfolio in portfolio]}
+
+
+@api_blp.route("/stats")
+class Stats(MethodView):
+
+    @api_blp.response(200, schema=StatsResponseSchema)
+    def get(self) -> Dict:
+        replica_router = get_replica_router(current_app.db_connection)
+        return {
+            "worker_pid": os.getpid(),
+            "base_interest_rate_cache": current_app.base_interest_rate_cache.stats(),
+            "loan_schedule_cache": current_app.loan_schedule_cache.stats(),
+            "loan_quote_cache": current_app.loan_quote_cache.stats(),
+            "database_pool": get_pool_stats(current_app.db_connection),
+            "database_replicas": replica_router.stats() if replica_router is not None else None
+        }
 
 
 @api_blp.errorhandler(LoanNotFoundError)
@@ -255,6 +792,26 @@ def handle_loan_end_date_on_weekend_error(error):
     return {"error": str(error)}, 400
 
 
+@api_blp.errorhandler(IncorrectPageSizeError)
+def handle_incorrect_page_size_error(error):
+    return {"error": str(error)}, 400
+
+
+@api_blp.errorhandler(IncorrectBatchSizeError)
+def handle_incorrect_batch_size_error(error):
+    return {"error": str(error)}, 400
+
+
+@api_blp.errorhandler(CurrencyNotAllowedError)
+def handle_currency_not_allowed_error(error):
+    return {"error": str(error)}, 400
+
+
+@api_blp.errorhandler(InconsistentDateRangeError)
+def handle_inconsistent_date_range_error(error):
+    return {"error": str(error)}, 400
+
+
 @api_blp.errorhandler(Exception)
 def handle_general_exception(error):
     if isinstance(error, HTTPException):
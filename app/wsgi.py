@@ -0,0 +1,16 @@
+import os
+import time
+
+_load_started = time.perf_counter()
+
+from web_api.app import create_app
+
+app = create_app(
+    api_title=os.environ["API_TITLE"],
+    api_version=os.environ["API_VERSION"],
+    openapi_version=os.environ["OPENAPI_VERSION"],
+    db_connection_string=os.environ["DB_CONNECTION_STRING"]
+)
+# imports (holiday calendars included) and create_app (rate cache preload included), paid once in the
+# gunicorn master with preload_app and once per worker without it
+APP_LOAD_SECONDS = time.perf_counter() - _load_started